@@ -1,8 +1,10 @@
 from django.contrib import admin
 from .models import (
     Product, Warehouse, StockLocation, 
-    StockMovement, StockMovementLine, StockBalance, LotTracking
+    StockMovement, StockMovementLine, StockBalance, LotTracking, StockMovementApplication, StockSnapshot,
+    StockMovementJob, CurrencyRate, StockReservation, StockAlert, LotBalance, StockLedgerEntry
 )
+from .processing import bump_movement_versions
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
@@ -20,36 +22,82 @@ class StockLocationAdmin(admin.ModelAdmin):
     list_display = ('name', 'warehouse')
     list_filter = ('warehouse',)
     search_fields = ('name',)
+    list_select_related = ('warehouse',)
 
 @admin.register(StockMovement)
 class StockMovementAdmin(admin.ModelAdmin):
-    list_display = ('reference', 'date', 'movement_type', 'destination_location', 'performed_by')
-    list_filter = ('movement_type', 'date')
+    list_display = ('reference', 'date', 'movement_type', 'source_location', 'destination_location', 'performed_by', 'processing_status', 'processed_at')
+    list_filter = ('movement_type', 'processing_status', 'date')
     search_fields = ('reference', 'notes')
+    list_select_related = ('source_location__warehouse', 'destination_location__warehouse', 'performed_by')
+    
+    def save_model(self, request, obj, form, change):
+        # Historical stock changes both where the movement applied before and where it applies now
+        if change:
+            bump_movement_versions([obj.pk])
+        super().save_model(request, obj, form, change)
+        bump_movement_versions([obj.pk])
 
 @admin.register(StockMovementLine)
 class StockMovementLineAdmin(admin.ModelAdmin):
     list_display = ('movement', 'product', 'quantity', 'unit_cost', 'lot_tracking')
     list_filter = ('movement', 'product')
     search_fields = ('movement__reference', 'product__code')
+    list_select_related = ('movement', 'product', 'lot_tracking__product')
+    
+    def save_model(self, request, obj, form, change):
+        if change:
+            bump_movement_versions(list(StockMovementLine.objects.filter(pk=obj.pk).values_list('movement_id', flat=True)))
+        super().save_model(request, obj, form, change)
+        bump_movement_versions([obj.movement_id])
+    
+    def delete_model(self, request, obj):
+        bump_movement_versions([obj.movement_id])
+        super().delete_model(request, obj)
+    
+    def delete_queryset(self, request, queryset):
+        bump_movement_versions(list(queryset.values_list('movement_id', flat=True).distinct()))
+        super().delete_queryset(request, queryset)
+
+@admin.register(StockMovementApplication)
+class StockMovementApplicationAdmin(admin.ModelAdmin):
+    list_display = ('movement', 'product', 'location', 'effect', 'lot_tracking', 'quantity', 'shortfall')
+    list_filter = ('effect',)
+    search_fields = ('movement__reference', 'product__code')
+    list_select_related = ('movement', 'product', 'location__warehouse', 'lot_tracking__product')
+
+@admin.register(LotBalance)
+class LotBalanceAdmin(admin.ModelAdmin):
+    list_display = ('lot_tracking', 'location', 'quantity', 'received_on')
+    list_filter = ('location',)
+    search_fields = ('lot_tracking__lot_number', 'product__code')
+    list_select_related = ('lot_tracking__product', 'location__warehouse')
+
+@admin.register(StockMovementJob)
+class StockMovementJobAdmin(admin.ModelAdmin):
+    list_display = ('movement', 'status', 'attempts', 'available_at', 'started_at', 'finished_at')
+    list_filter = ('status',)
+    search_fields = ('movement__reference', 'error')
+    list_select_related = ('movement',)
 
 @admin.register(StockBalance)
 class StockBalanceAdmin(admin.ModelAdmin):
     list_display = ('product', 'location', 'initial_quantity', 'total_in_display', 'total_out_display', 'reserved_quantity', 'available_stock_display')
     list_filter = ('location', 'product')
     search_fields = ('product__code', 'location__name')
+    list_select_related = ('product', 'location__warehouse')
     
     def total_in_display(self, obj):
         """Display total in movements"""
         return f"{obj.total_in:.0f} units"
     total_in_display.short_description = 'Total In'
-    total_in_display.admin_order_field = 'initial_quantity'
+    total_in_display.admin_order_field = 'in_total'
     
     def total_out_display(self, obj):
         """Display total out movements"""
         return f"{obj.total_out:.0f} units"
     total_out_display.short_description = 'Total Out'
-    total_out_display.admin_order_field = 'initial_quantity'
+    total_out_display.admin_order_field = 'out_total'
     
     def available_stock_display(self, obj):
         """Display available stock in admin"""
@@ -57,8 +105,54 @@ class StockBalanceAdmin(admin.ModelAdmin):
     available_stock_display.short_description = 'Available Stock'
     available_stock_display.admin_order_field = 'initial_quantity'
 
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('balance', 'quantity', 'status', 'reference', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('reference', 'balance__product__code')
+    list_select_related = ('balance__product', 'balance__location__warehouse')
+
+@admin.register(StockLedgerEntry)
+class StockLedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'product', 'location', 'source', 'movement', 'initial_delta', 'reserved_delta', 'in_delta', 'out_delta', 'created_at')
+    list_filter = ('source',)
+    search_fields = ('product__code', 'movement__reference')
+    list_select_related = ('product', 'location__warehouse', 'movement')
+    raw_id_fields = ('product', 'location', 'movement', 'reservation')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(StockAlert)
+class StockAlertAdmin(admin.ModelAdmin):
+    list_display = ('product', 'kind', 'quantity', 'threshold', 'updated_at')
+    list_filter = ('kind',)
+    search_fields = ('product__code', 'product__name')
+    list_select_related = ('product',)
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('date', 'product', 'location', 'quantity', 'in_total', 'out_total')
+    list_filter = ('date', 'location')
+    search_fields = ('product__code', 'location__name')
+    list_select_related = ('product', 'location__warehouse')
+
+@admin.register(CurrencyRate)
+class CurrencyRateAdmin(admin.ModelAdmin):
+    list_display = ('currency', 'date', 'rate')
+    list_filter = ('currency',)
+    date_hierarchy = 'date'
+    list_select_related = ('currency',)
+
 @admin.register(LotTracking)
 class LotTrackingAdmin(admin.ModelAdmin):
     list_display = ('product', 'lot_number', 'notes')
     list_filter = ('product',)
     search_fields = ('product__code', 'lot_number')
+    list_select_related = ('product',)
@@ -0,0 +1,67 @@
+from functools import partial
+from django.db import transaction
+from django.utils import timezone
+from inventory.models import Product, StockAlert
+
+ALERT_BATCH_SIZE = 1000
+
+
+def desired_alerts(product_ids):
+    """{(product_id, kind): (quantity, threshold)} from the products' current stock totals"""
+    alerts = {}
+    products = Product.objects.filter(pk__in=product_ids).with_stock_totals().values_list(
+        'id', 'min_stock', 'max_stock', 'total_quantity'
+    )
+    for product_id, min_stock, max_stock, quantity in products.order_by():
+        if min_stock > 0 and quantity < min_stock:
+            alerts[(product_id, 'below_min')] = (quantity, min_stock)
+        if max_stock > 0 and quantity > max_stock:
+            alerts[(product_id, 'above_max')] = (quantity, max_stock)
+    return alerts
+
+
+def refresh_alerts(product_ids):
+    """
+    Bring the StockAlert rows of these products in line with their stock, writing only what changed.
+    Costs a fixed number of queries however many products are passed. Returns (created, updated, removed).
+    """
+    product_ids = sorted(set(product_ids))
+    if not product_ids:
+        return 0, 0, 0
+
+    with transaction.atomic():
+        # Refreshes of the same product queue up on its row, so each one reads the totals committed
+        # before it and the last write reflects the latest stock
+        list(Product.objects.select_for_update().filter(pk__in=product_ids).order_by('pk').values_list('pk', flat=True))
+        desired = desired_alerts(product_ids)
+        existing = {(alert.product_id, alert.kind): alert for alert in StockAlert.objects.filter(product_id__in=product_ids)}
+
+        # Rows are written in product order so concurrent refreshes of overlapping products cannot deadlock
+        removed = sorted(alert.pk for key, alert in existing.items() if key not in desired)
+        created, updated = [], []
+        now = timezone.now()
+        for (product_id, kind), (quantity, threshold) in sorted(desired.items()):
+            alert = existing.get((product_id, kind))
+            if alert is None:
+                created.append(StockAlert(product_id=product_id, kind=kind, quantity=quantity, threshold=threshold))
+            elif alert.quantity != quantity or alert.threshold != threshold:
+                alert.quantity, alert.threshold, alert.updated_at = quantity, threshold, now
+                updated.append(alert)
+
+        if removed:
+            StockAlert.objects.filter(pk__in=removed).delete()
+        # A concurrent refresh of the same product may insert its alert first; the newer values win
+        StockAlert.objects.bulk_create(
+            created, batch_size=ALERT_BATCH_SIZE, update_conflicts=True, unique_fields=['product', 'kind'],
+            update_fields=['quantity', 'threshold', 'updated_at']
+        )
+        StockAlert.objects.bulk_update(updated, ['quantity', 'threshold', 'updated_at'], batch_size=ALERT_BATCH_SIZE)
+    return len(created), len(updated), len(removed)
+
+
+def refresh_alerts_on_commit(product_ids):
+    """
+    Refresh the alerts of these products once the current transaction commits, so they are computed
+    from committed totals rather than from stock other transactions are still changing
+    """
+    transaction.on_commit(partial(refresh_alerts, set(product_ids)))
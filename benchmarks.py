@@ -0,0 +1,209 @@
+import math
+import random
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib import admin
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+from core.models.models import Company, Currency
+from hr.models import Employee
+from inventory.models import Product, Warehouse, StockLocation, StockMovement, StockMovementLine, StockBalance
+from inventory.processing import process_movements
+from inventory.views import ProductViewSet, StockBalanceViewSet, StockMovementViewSet
+
+BENCH_PREFIX = 'BENCH-'
+SEED_BATCH_SIZE = 500
+PERCENTILES = [50, 90, 95, 99]
+
+
+def bench_products():
+    return Product.objects.filter(code__startswith=BENCH_PREFIX)
+
+
+def seed_dataset(products, locations, lines, lines_per_movement, seed=0, log=None):
+    """
+    Create the BENCH- dataset: products, locations in one warehouse and roughly `lines` movement lines
+    spread over the last year, processed into balances like any other movements. The same arguments
+    always produce the same data. Company, currency and employee are the first existing ones.
+    """
+    company, currency, employee = Company.objects.first(), Currency.objects.first(), Employee.objects.first()
+    if company is None or currency is None or employee is None:
+        raise ValueError('Seeding needs at least one company, currency and employee')
+
+    rng = random.Random(seed)
+    product_ids = [
+        product.pk for product in Product.objects.bulk_create([
+            Product(code=f'{BENCH_PREFIX}{index:06d}', name=f'Benchmark product {index}', company=company,
+                    min_stock=Decimal(rng.randint(0, 50)))
+            for index in range(products)
+        ], batch_size=SEED_BATCH_SIZE)
+    ]
+    warehouse = Warehouse.objects.create(name=f'{BENCH_PREFIX}warehouse')
+    location_ids = [
+        location.pk for location in StockLocation.objects.bulk_create([
+            StockLocation(name=f'{BENCH_PREFIX}{index:04d}', warehouse=warehouse) for index in range(locations)
+        ])
+    ]
+
+    movements = max(lines // lines_per_movement, 1)
+    start = date.today() - timedelta(days=365)
+    for first in range(0, movements, SEED_BATCH_SIZE):
+        count = min(SEED_BATCH_SIZE, movements - first)
+        with transaction.atomic():
+            batch = StockMovement.objects.bulk_create([
+                StockMovement(
+                    reference=f'{BENCH_PREFIX}M{index:09d}',
+                    # Receipts only for the first tenth so issues mostly find stock
+                    movement_type='in' if index < movements // 10 or rng.random() < 0.6 else 'out',
+                    date=start + timedelta(days=365 * index // movements),
+                    destination_location_id=rng.choice(location_ids),
+                    performed_by=employee,
+                )
+                for index in range(first, first + count)
+            ])
+            StockMovementLine.objects.bulk_create([
+                StockMovementLine(
+                    movement=movement,
+                    product_id=product_id,
+                    quantity=Decimal(rng.randint(10, 100) if movement.movement_type == 'in' else rng.randint(1, 10)),
+                    unit_cost=Decimal(rng.randint(100, 10000)) / 100,
+                    currency=currency,
+                )
+                for movement in batch
+                for product_id in rng.sample(product_ids, min(lines_per_movement, len(product_ids)))
+            ], batch_size=SEED_BATCH_SIZE * 4)
+            process_movements(batch)
+        if log:
+            log(f'Seeded {first + count}/{movements} movements')
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an ascending list"""
+    return sorted_values[max(math.ceil(percent / 100 * len(sorted_values)) - 1, 0)]
+
+
+@contextmanager
+def rolled_back():
+    """Transaction that is always rolled back, so a benchmark call that writes leaves nothing behind"""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def measure(run, iterations, warmup, prepare=None, rollback=False):
+    """
+    Latency percentiles (ms) of run() over iterations calls after warmup untimed calls, plus the
+    query count of one extra call (counted separately so capturing does not skew the timings).
+    With prepare, every call is run(prepare()) and only run is timed and counted. With rollback,
+    every call and its prepare() run in a transaction that is rolled back afterwards; run's own
+    transactions become savepoints, which the query count includes.
+    """
+    step = run if prepare else (lambda _: run())
+    prepare = prepare or (lambda: None)
+    scope = rolled_back if rollback else nullcontext
+
+    def call():
+        with scope():
+            argument = prepare()
+            started = time.perf_counter()
+            step(argument)
+            return (time.perf_counter() - started) * 1000
+
+    for _ in range(warmup):
+        call()
+    timings = sorted(call() for _ in range(iterations))
+    with scope():
+        argument = prepare()
+        with CaptureQueriesContext(connection) as queries:
+            step(argument)
+
+    result = {'iterations': iterations, 'queries': len(queries)}
+    result.update({f'p{percent}_ms': round(percentile(timings, percent), 3) for percent in PERCENTILES})
+    result.update({
+        'min_ms': round(timings[0], 3),
+        'max_ms': round(timings[-1], 3),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+    })
+    return result
+
+
+def api_call(user, view, path, **kwargs):
+    """Callable that requests path from a viewset view as user and renders the response"""
+    factory = APIRequestFactory()
+
+    def run():
+        request = factory.get(path)
+        force_authenticate(request, user=user)
+        response = view(request, **kwargs)
+        response.render()
+        if response.status_code != 200:
+            raise ValueError(f'{path} returned {response.status_code}')
+    return run
+
+
+def changelist_call(user, model):
+    """Callable that renders model's admin changelist as user"""
+    factory = APIRequestFactory()
+    model_admin = admin.site._registry[model]
+
+    def run():
+        request = factory.get(f'/admin/inventory/{model._meta.model_name}/')
+        request.user = user
+        response = model_admin.changelist_view(request)
+        response.render()
+        if response.status_code != 200:
+            raise ValueError(f'{model._meta.model_name} changelist returned {response.status_code}')
+    return run
+
+
+def new_movement(lines_per_movement, seed=0):
+    """Callable creating a BENCH- movement of lines_per_movement lines to process (measure with rollback)"""
+    rng = random.Random(seed)
+    product_ids = list(bench_products().values_list('id', flat=True))
+    location_ids = list(StockLocation.objects.filter(name__startswith=BENCH_PREFIX).values_list('id', flat=True))
+    currency, employee = Currency.objects.first(), Employee.objects.first()
+    stamp = time.strftime('%Y%m%d%H%M%S')
+    counter = iter(range(10 ** 9))
+
+    def prepare():
+        movement = StockMovement.objects.create(
+            reference=f'{BENCH_PREFIX}P{stamp}-{next(counter)}', movement_type=rng.choice(['in', 'out']),
+            date=date.today(), destination_location_id=rng.choice(location_ids), performed_by=employee
+        )
+        StockMovementLine.objects.bulk_create([
+            StockMovementLine(movement=movement, product_id=product_id, quantity=Decimal(1), unit_cost=Decimal(1), currency=currency)
+            for product_id in rng.sample(product_ids, min(lines_per_movement, len(product_ids)))
+        ])
+        return movement
+    return prepare
+
+
+def run_benchmarks(user, iterations, warmup, lines_per_movement, seed=0):
+    """{benchmark name: measure() result} for the inventory hot paths"""
+    product_ids = list(bench_products().order_by('code').values_list('id', flat=True)[:100])
+    if not product_ids:
+        raise ValueError('No benchmark dataset found; seed one first')
+    products = iter(product_ids * (iterations + warmup + 1))
+    stock_status = ProductViewSet.as_view({'get': 'stock_status'})
+
+    def stock_status_call(product_id):
+        api_call(user, stock_status, f'/api/inventory/products/{product_id}/stock_status/', pk=product_id)()
+
+    return {
+        'process_movement': measure(
+            StockMovementViewSet().process_movement_automatically, iterations, warmup,
+            prepare=new_movement(lines_per_movement, seed), rollback=True
+        ),
+        'balances_list': measure(
+            api_call(user, StockBalanceViewSet.as_view({'get': 'list'}), '/api/inventory/balances/'), iterations, warmup
+        ),
+        'products_list': measure(
+            api_call(user, ProductViewSet.as_view({'get': 'list'}), '/api/inventory/products/'), iterations, warmup
+        ),
+        'stock_status': measure(stock_status_call, iterations, warmup, prepare=lambda: next(products)),
+        'admin_balance_changelist': measure(changelist_call(user, StockBalance), iterations, warmup),
+        'admin_movement_changelist': measure(changelist_call(user, StockMovement), iterations, warmup),
+    }
@@ -0,0 +1,117 @@
+import time
+from django.conf import settings
+from django.core.cache import caches
+
+CACHE_PREFIX = 'inventory'
+DEFAULT_TIMEOUT = 60 * 60
+
+
+def get_cache():
+    """
+    Cache for inventory reference data, named by settings.INVENTORY_CACHE_ALIAS ('default' if unset):
+    local memory in development and tests, a Redis-compatible backend in production
+    """
+    return caches[getattr(settings, 'INVENTORY_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'INVENTORY_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def generation_key(model):
+    return f'{CACHE_PREFIX}:{model._meta.model_name}:generation'
+
+
+def get_generation(model):
+    """
+    Current generation of a model's cached entries. Generations are timestamps rather than counters,
+    so an evicted generation key can never come back with a value older entries were stored under.
+    """
+    cache = get_cache()
+    key = generation_key(model)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(model):
+    """Invalidate every cached object of a model at once"""
+    get_cache().set(generation_key(model), time.time_ns(), None)
+
+
+def reference_key(model, pk):
+    return f'{CACHE_PREFIX}:{model._meta.model_name}:{get_generation(model)}:{pk}'
+
+
+def get_reference(model, pk):
+    """Model instance by primary key, read through the cache; None if it does not exist"""
+    if pk is None:
+        return None
+    cache = get_cache()
+    key = reference_key(model, pk)
+    instance = cache.get(key)
+    if instance is None:
+        instance = model.objects.filter(pk=pk).first()
+        if instance is None:
+            return None
+        cache.set(key, instance, get_timeout())
+    return instance
+
+
+def get_serialized_reference(serializer_class, pk, expand=()):
+    """
+    serializer_class(instance).data for the instance with this primary key, read through the cache.
+    expand is the set of nested ?expand= paths relative to the serialized object.
+    """
+    if pk is None:
+        return None
+    cache = get_cache()
+    key = f"{reference_key(serializer_class.Meta.model, pk)}:{serializer_class.__name__}:{','.join(sorted(expand))}"
+    data = cache.get(key)
+    if data is None:
+        instance = get_reference(serializer_class.Meta.model, pk)
+        if instance is None:
+            return None
+        data = dict(serializer_class(instance, context={'expand': set(expand)}).data)
+        cache.set(key, data, get_timeout())
+    return data
+
+
+def stock_version_keys(product_ids=(), location_ids=(), all_balances=False):
+    keys = [f'{CACHE_PREFIX}:stock:product:{pk}' for pk in product_ids]
+    keys += [f'{CACHE_PREFIX}:stock:location:{pk}' for pk in location_ids]
+    if all_balances:
+        keys.append(f'{CACHE_PREFIX}:stock:all')
+    return keys
+
+
+def bump_stock_versions(product_ids=(), location_ids=()):
+    """Mark the stock of these products and locations (and all balances) as changed"""
+    now = time.time_ns()
+    keys = stock_version_keys(product_ids, location_ids, all_balances=True)
+    get_cache().set_many({key: now for key in keys}, None)
+
+
+def get_stock_version(product_ids=(), location_ids=(), all_balances=False):
+    """
+    Return (token, last_modified_ns) for the stock of these products/locations (or all balances)
+    together with the reference data embedded in stock responses. The token changes whenever
+    any of them does; last_modified_ns is the time of the latest change.
+    """
+    from inventory.models import Product, StockLocation, Warehouse
+
+    cache = get_cache()
+    keys = stock_version_keys(product_ids, location_ids, all_balances)
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        now = time.time_ns()
+        for key in missing:
+            cache.add(key, now, None)
+        versions.update(cache.get_many(missing))
+
+    stamps = [versions[key] for key in keys if key in versions]
+    stamps += [get_generation(model) for model in (Product, StockLocation, Warehouse)]
+    return ':'.join(str(stamp) for stamp in stamps), max(stamps)
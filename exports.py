@@ -0,0 +1,160 @@
+import csv
+from django.http import StreamingHttpResponse
+from inventory.models import StockMovementLine
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+DEFAULT_EXPORT_CHUNK_SIZE = 2000
+MAX_EXPORT_CHUNK_SIZE = 20000
+EXPORT_FORMATS = ['csv', 'parquet']
+
+# (column, lookup, kind) in export order
+BALANCE_EXPORT_COLUMNS = [
+    ('id', 'id', 'int'),
+    ('product', 'product_id', 'int'),
+    ('product_code', 'product__code', 'str'),
+    ('location', 'location_id', 'int'),
+    ('location_name', 'location__name', 'str'),
+    ('warehouse', 'location__warehouse_id', 'int'),
+    ('quantity', 'initial_quantity', 'quantity'),
+    ('reserved_quantity', 'reserved_quantity', 'quantity'),
+    ('total_in', 'in_total', 'quantity'),
+    ('total_out', 'out_total', 'quantity'),
+    ('updated_at', 'updated_at', 'datetime'),
+]
+
+MOVEMENT_EXPORT_COLUMNS = [
+    ('movement', 'movement_id', 'int'),
+    ('reference', 'movement__reference', 'str'),
+    ('movement_type', 'movement__movement_type', 'str'),
+    ('date', 'movement__date', 'date'),
+    ('location', 'movement__destination_location_id', 'int'),
+    ('source_location', 'movement__source_location_id', 'int'),
+    ('line', 'id', 'int'),
+    ('product', 'product_id', 'int'),
+    ('product_code', 'product__code', 'str'),
+    ('quantity', 'quantity', 'quantity'),
+    ('unit_cost', 'unit_cost', 'cost'),
+    ('currency', 'currency_id', 'int'),
+    ('lot_number', 'lot_tracking__lot_number', 'str'),
+]
+
+
+def balance_export_rows(balances):
+    """Value tuples for the balances queryset, in BALANCE_EXPORT_COLUMNS order"""
+    if not balances.ordered:
+        balances = balances.order_by('product__code', 'location_id')
+    return balances.values_list(*(lookup for _, lookup, _ in BALANCE_EXPORT_COLUMNS))
+
+
+def movement_export_rows(movements):
+    """Value tuples for every line of the movements queryset, in MOVEMENT_EXPORT_COLUMNS order"""
+    lines = StockMovementLine.objects.filter(movement__in=movements.prefetch_related(None).values('pk'))
+    return lines.order_by('movement__date', 'movement_id', 'id').values_list(
+        *(lookup for _, lookup, _ in MOVEMENT_EXPORT_COLUMNS)
+    )
+
+
+def chunked(rows, chunk_size):
+    """Lists of up to chunk_size rows, read from the database through a server-side cursor"""
+    chunk = []
+    for row in rows.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Echo:
+    """Write-only file object that hands back whatever is written to it"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(columns, rows, chunk_size):
+    writer = csv.writer(Echo())
+    yield writer.writerow([column for column, _, _ in columns])
+    for chunk in chunked(rows, chunk_size):
+        yield ''.join(writer.writerow(row) for row in chunk)
+
+
+class ParquetSink:
+    """Write-only file object that buffers Parquet output until the next row group is drained"""
+
+    def __init__(self):
+        self.buffer = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.buffer.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.buffer)
+        self.buffer = []
+        return data
+
+
+def arrow_type(kind):
+    return {
+        'int': pyarrow.int64(),
+        'str': pyarrow.string(),
+        'quantity': pyarrow.decimal128(15, 3),
+        'cost': pyarrow.decimal128(15, 2),
+        'date': pyarrow.date32(),
+        'datetime': pyarrow.timestamp('us', tz='UTC'),
+    }[kind]
+
+
+def stream_parquet(columns, rows, chunk_size):
+    """One Parquet row group per chunk, each sent as soon as it is written"""
+    schema = pyarrow.schema([(column, arrow_type(kind)) for column, _, kind in columns])
+    sink = ParquetSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    for chunk in chunked(rows, chunk_size):
+        arrays = [
+            pyarrow.array([row[index] for row in chunk], type=field.type)
+            for index, field in enumerate(schema)
+        ]
+        writer.write_batch(pyarrow.RecordBatch.from_arrays(arrays, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def export_response(columns, rows, export_format, filename, chunk_size=DEFAULT_EXPORT_CHUNK_SIZE):
+    """
+    StreamingHttpResponse writing rows (a values_list queryset) as CSV or Parquet chunk by chunk,
+    so memory use does not grow with the size of the export
+    """
+    if export_format == 'parquet':
+        if pyarrow is None:
+            raise ValueError('Parquet export requires pyarrow to be installed')
+        content = stream_parquet(columns, rows, chunk_size)
+        content_type = 'application/vnd.apache.parquet'
+    else:
+        content = stream_csv(columns, rows, chunk_size)
+        content_type = 'text/csv; charset=utf-8'
+
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
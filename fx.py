@@ -0,0 +1,111 @@
+from bisect import bisect_right
+from datetime import date
+from collections import OrderedDict
+from django.conf import settings
+from inventory.cache import get_generation
+from inventory.models import CurrencyRate
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DEFAULT_MAX_CURRENCIES = 64
+
+
+class MissingRateError(ValueError):
+    pass
+
+
+def get_base_currency_id():
+    """Currency valuations are reported in (settings.INVENTORY_BASE_CURRENCY_ID); None disables conversion"""
+    return getattr(settings, 'INVENTORY_BASE_CURRENCY_ID', None)
+
+
+class RateTable:
+    """
+    In-memory CurrencyRate history. Each currency's rates are loaded with one query the first time
+    it is needed and kept as parallel lists of date ordinals and rates, so a lookup is a bisect
+    instead of a query. The least recently used currency is dropped beyond max_currencies.
+    """
+
+    def __init__(self, base_currency_id, max_currencies=DEFAULT_MAX_CURRENCIES):
+        self.base_currency_id = base_currency_id
+        self.max_currencies = max_currencies
+        self.series = OrderedDict()
+        self.generation = get_generation(CurrencyRate)
+
+    def load(self, currency_ids):
+        """Load the rates of every currency in currency_ids not already held, in one query"""
+        missing = {currency_id for currency_id in currency_ids if currency_id not in self.series}
+        missing.discard(self.base_currency_id)
+        if not missing:
+            return
+        loaded = {currency_id: ([], []) for currency_id in missing}
+        rates = CurrencyRate.objects.filter(currency_id__in=missing).order_by('currency_id', 'date')
+        for currency_id, day, rate in rates.values_list('currency_id', 'date', 'rate').iterator():
+            dates, values = loaded[currency_id]
+            dates.append(day.toordinal())
+            values.append(float(rate))
+        for currency_id, series in loaded.items():
+            self.series[currency_id] = series
+        while len(self.series) > self.max_currencies:
+            self.series.popitem(last=False)
+
+    def get_series(self, currency_id):
+        if currency_id not in self.series:
+            self.load([currency_id])
+        self.series.move_to_end(currency_id)
+        return self.series[currency_id]
+
+    def rate(self, currency_id, day):
+        """Base currency value of one unit of currency_id on day"""
+        if currency_id == self.base_currency_id:
+            return 1.0
+        dates, values = self.get_series(currency_id)
+        index = bisect_right(dates, day.toordinal()) - 1
+        if index < 0:
+            raise MissingRateError(f'No rate for currency {currency_id} on or before {day}')
+        return values[index]
+
+    def rates(self, currency_ids, days):
+        """
+        Vectorized rate(): numpy arrays of currency ids and date ordinals in, an array of rates out,
+        with one searchsorted per distinct currency
+        """
+        result = numpy.ones(len(currency_ids), dtype=numpy.float64)
+        currencies = numpy.unique(currency_ids).tolist()
+        self.load(currencies)
+        for currency_id in currencies:
+            if currency_id == self.base_currency_id:
+                continue
+            mask = currency_ids == currency_id
+            dates, values = self.get_series(currency_id)
+            indexes = numpy.searchsorted(numpy.asarray(dates, dtype=numpy.int64), days[mask], side='right') - 1
+            missing = days[mask][indexes < 0]
+            if missing.size:
+                day = date.fromordinal(int(missing.min()))
+                raise MissingRateError(f'No rate for currency {currency_id} on or before {day}')
+            result[mask] = numpy.asarray(values, dtype=numpy.float64)[indexes]
+        return result
+
+
+_rate_table = None
+
+
+def get_rate_table():
+    """
+    Process-wide RateTable for the base currency, or None if conversion is not configured.
+    It is rebuilt when CurrencyRate rows change (tracked by the reference cache generation).
+    """
+    global _rate_table
+    base_currency_id = get_base_currency_id()
+    if base_currency_id is None:
+        return None
+    if (
+        _rate_table is None
+        or _rate_table.base_currency_id != base_currency_id
+        or _rate_table.generation != get_generation(CurrencyRate)
+    ):
+        _rate_table = RateTable(base_currency_id)
+    return _rate_table
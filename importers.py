@@ -0,0 +1,225 @@
+import csv
+import json
+from django.db import DatabaseError, transaction
+from core.models.models import Currency
+from inventory.models import LotTracking, Product, StockLocation, StockMovement, StockMovementLine
+from inventory.processing import bump_movement_versions, process_movements
+from inventory.serializers import StockMovementImportSerializer
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_CHUNK_SIZE = 10000
+
+CSV_MOVEMENT_FIELDS = ['reference', 'movement_type', 'date', 'source_location', 'destination_location', 'notes']
+CSV_LINE_FIELDS = ['product', 'quantity', 'unit_cost', 'currency', 'lot_tracking']
+
+LINE_RELATIONS = {
+    'product': Product,
+    'currency': Currency,
+    'lot_tracking': LotTracking,
+}
+
+
+def read_ndjson(stream):
+    """
+    Yield (row_number, payload, error) for every non-blank line of an NDJSON byte stream
+    """
+    for row_number, raw in enumerate(stream, start=1):
+        try:
+            text = raw.decode('utf-8-sig').strip()
+        except UnicodeDecodeError as exc:
+            yield row_number, None, {'non_field_errors': [f'Invalid UTF-8: {exc}']}
+            continue
+        if not text:
+            continue
+        try:
+            payload = json.loads(text)
+        except ValueError as exc:
+            yield row_number, None, {'non_field_errors': [f'Invalid JSON: {exc}']}
+            continue
+        if not isinstance(payload, dict):
+            yield row_number, None, {'non_field_errors': ['Expected a JSON object']}
+            continue
+        yield row_number, payload, None
+
+
+def read_csv(stream):
+    """
+    Yield (row_number, payload, error) from a CSV byte stream with one movement line per row.
+    Consecutive rows with the same reference are grouped into one movement. Lines that are not
+    valid UTF-8 or not valid CSV are reported as row errors and skipped.
+    """
+    decode_errors = []
+    last_line = 0
+
+    def decoded_lines():
+        nonlocal last_line
+        for line_number, raw in enumerate(stream, start=1):
+            last_line = line_number
+            try:
+                yield raw.decode('utf-8-sig')
+            except UnicodeDecodeError as exc:
+                decode_errors.append((line_number, {'non_field_errors': [f'Invalid UTF-8: {exc}']}))
+                # A blank line is skipped by the reader but keeps its line numbers in step
+                yield '\n'
+
+    reader = csv.DictReader(decoded_lines())
+    try:
+        header = reader.fieldnames
+    except csv.Error as exc:
+        header, decode_errors[:] = None, [(last_line, {'non_field_errors': [f'Invalid CSV: {exc}']})]
+    if decode_errors or not header:
+        # Without a readable header no row can be read
+        yield 1, None, decode_errors[0][1] if decode_errors else {'non_field_errors': ['Missing CSV header']}
+        return
+    current_row, current = None, None
+    while True:
+        try:
+            row = next(reader, None)
+        except csv.Error as exc:
+            decode_errors.append((last_line, {'non_field_errors': [f'Invalid CSV: {exc}']}))
+            row = False
+        while decode_errors:
+            line_number, error = decode_errors.pop(0)
+            yield line_number, None, error
+        if row is None:
+            break
+        if not row:
+            continue
+        reference = (row.get('reference') or '').strip()
+        if current is None or reference != current['reference']:
+            if current is not None:
+                yield current_row, current, None
+            current_row = reader.line_num
+            current = {field: row.get(field) or None for field in CSV_MOVEMENT_FIELDS}
+            current['reference'] = reference
+            current['lines'] = []
+        current['lines'].append({field: row.get(field) or None for field in CSV_LINE_FIELDS})
+    if current is not None:
+        yield current_row, current, None
+
+
+def existing_ids(model, ids):
+    return set(model.objects.filter(id__in=ids).values_list('id', flat=True)) if ids else set()
+
+
+def missing_pk_error(pk):
+    return [f'Invalid pk "{pk}" - object does not exist.']
+
+
+def import_chunk(chunk, performed_by, summary):
+    """
+    Validate a chunk of rows, bulk-insert the valid movements with their lines and process
+    their balances in one transaction. Invalid rows are appended to summary['errors'].
+    """
+    errors = summary['errors']
+    valid = []
+    for row_number, payload, error in chunk:
+        if error is None:
+            serializer = StockMovementImportSerializer(data=payload)
+            if serializer.is_valid():
+                valid.append((row_number, serializer.validated_data))
+                continue
+            error = serializer.errors
+        errors.append({'row': row_number, 'reference': (payload or {}).get('reference'), 'errors': error})
+
+    # Resolve every referenced id with one query per relation instead of one per row
+    references = {data['reference'] for _, data in valid}
+    taken = set(StockMovement.objects.filter(reference__in=references).values_list('reference', flat=True))
+    locations = existing_ids(StockLocation, {
+        location for _, data in valid for location in (data['destination_location'], data.get('source_location'))
+        if location is not None
+    })
+    known = {
+        field: existing_ids(model, {
+            line[field] for _, data in valid for line in data.get('lines', []) if line.get(field) is not None
+        })
+        for field, model in LINE_RELATIONS.items()
+    }
+
+    accepted = []
+    for row_number, data in valid:
+        row_errors = {}
+        if data['reference'] in taken:
+            row_errors['reference'] = ['stock movement with this reference already exists.']
+        if data['destination_location'] not in locations:
+            row_errors['destination_location'] = missing_pk_error(data['destination_location'])
+        if data.get('source_location') is not None and data['source_location'] not in locations:
+            row_errors['source_location'] = missing_pk_error(data['source_location'])
+
+        line_errors = []
+        for line in data.get('lines', []):
+            line_errors.append({
+                field: missing_pk_error(line[field])
+                for field in LINE_RELATIONS
+                if line.get(field) is not None and line[field] not in known[field]
+            })
+        if any(line_errors):
+            row_errors['lines'] = line_errors
+
+        if row_errors:
+            errors.append({'row': row_number, 'reference': data['reference'], 'errors': row_errors})
+            continue
+        taken.add(data['reference'])
+        accepted.append((row_number, data))
+
+    if not accepted:
+        return
+
+    try:
+        with transaction.atomic():
+            movements = StockMovement.objects.bulk_create([
+                StockMovement(
+                    reference=data['reference'],
+                    movement_type=data['movement_type'],
+                    date=data['date'],
+                    source_location_id=data.get('source_location'),
+                    destination_location_id=data['destination_location'],
+                    notes=data.get('notes'),
+                    performed_by=performed_by,
+                )
+                for _, data in accepted
+            ])
+            lines = [
+                StockMovementLine(
+                    movement=movement,
+                    product_id=line['product'],
+                    quantity=line['quantity'],
+                    unit_cost=line['unit_cost'],
+                    currency_id=line['currency'],
+                    lot_tracking_id=line.get('lot_tracking'),
+                )
+                for movement, (_, data) in zip(movements, accepted)
+                for line in data.get('lines', [])
+            ]
+            StockMovementLine.objects.bulk_create(lines, batch_size=DEFAULT_CHUNK_SIZE)
+            bump_movement_versions([movement.pk for movement in movements])
+            process_movements(movements)
+    except DatabaseError as exc:
+        # The chunk was rolled back as a whole, so report every row in it
+        for row_number, data in accepted:
+            errors.append({'row': row_number, 'reference': data['reference'], 'errors': {'non_field_errors': [str(exc)]}})
+        return
+
+    summary['movements'] += len(movements)
+    summary['lines'] += len(lines)
+
+
+def import_movements(records, performed_by, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Import (row_number, payload, error) records as produced by read_ndjson/read_csv,
+    in chunks of roughly chunk_size movement lines. Returns a summary with per-row errors.
+    """
+    summary = {'movements': 0, 'lines': 0, 'errors': []}
+    chunk, chunk_lines = [], 0
+    for record in records:
+        chunk.append(record)
+        payload = record[1]
+        lines = payload.get('lines') if payload else None
+        chunk_lines += max(len(lines), 1) if isinstance(lines, list) else 1
+        if chunk_lines >= chunk_size:
+            import_chunk(chunk, performed_by, summary)
+            chunk, chunk_lines = [], 0
+    if chunk:
+        import_chunk(chunk, performed_by, summary)
+    summary['errors'].sort(key=lambda error: error['row'])
+    return summary
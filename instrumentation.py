@@ -0,0 +1,196 @@
+import hmac
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template.response import SimpleTemplateResponse
+
+# Seconds; upper bounds of the request duration histogram
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+current_stats = ContextVar('inventory_request_stats', default=None)
+
+
+def instrumentation_enabled():
+    """Whether inventory viewsets record timings (settings.INVENTORY_INSTRUMENTATION, on by default)"""
+    return getattr(settings, 'INVENTORY_INSTRUMENTATION', True)
+
+
+class RequestStats:
+    """Query count and time spent in the database, serializers and rendering during one request"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.render_time = 0.0
+        self.serialize_depth = 0
+
+    def record_query(self, execute, sql, params, many, context):
+        """connection.execute_wrapper() hook"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+    @contextmanager
+    def serializing(self):
+        # Cached references are serialized inside the response's serialization, so only the outermost call is timed
+        self.serialize_depth += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.serialize_depth -= 1
+            if not self.serialize_depth:
+                self.serialize_time += time.perf_counter() - started
+
+    def server_timing(self, total):
+        """Server-Timing header value, durations in milliseconds"""
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.queries} queries"',
+            f'serialize;dur={self.serialize_time * 1000:.2f}',
+            f'render;dur={self.render_time * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+
+
+def timed_serialization():
+    """Context manager adding the time spent inside it to the current request's serialization time"""
+    stats = current_stats.get()
+    if stats is None:
+        return nullcontext()
+    return stats.serializing()
+
+
+class MetricsRegistry:
+    """
+    Per-process totals per (view, action), rendered in the Prometheus text format. Each worker
+    process of the server keeps its own registry, so scrapes see the worker that answers them.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def observe(self, view, action, status, duration, stats):
+        with self.lock:
+            series = self.series.setdefault((view, action), {
+                'statuses': {},
+                'buckets': [0] * len(DURATION_BUCKETS),
+                'count': 0,
+                'duration': 0.0,
+                'queries': 0,
+                'db': 0.0,
+                'serialize': 0.0,
+                'render': 0.0,
+            })
+            series['statuses'][status] = series['statuses'].get(status, 0) + 1
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    series['buckets'][index] += 1
+            series['count'] += 1
+            series['duration'] += duration
+            series['queries'] += stats.queries
+            series['db'] += stats.db_time
+            series['serialize'] += stats.serialize_time
+            series['render'] += stats.render_time
+
+    def reset(self):
+        with self.lock:
+            self.series = {}
+
+    def render(self):
+        with self.lock:
+            series = {key: dict(value, statuses=dict(value['statuses'])) for key, value in sorted(self.series.items())}
+
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for suffix, labels, value in samples:
+                label_text = ','.join(f'{key}="{escape_label(value)}"' for key, value in labels)
+                lines.append(f'{name}{suffix}{{{label_text}}} {value}')
+
+        metric('inventory_requests_total', 'counter', 'Requests handled per viewset action and status code', [
+            ('', [('view', view), ('action', action), ('status', status)], count)
+            for (view, action), values in series.items()
+            for status, count in sorted(values['statuses'].items())
+        ])
+        duration_samples = []
+        for (view, action), values in series.items():
+            labels = [('view', view), ('action', action)]
+            for bound, count in zip(DURATION_BUCKETS, values['buckets']):
+                duration_samples.append(('_bucket', labels + [('le', f'{bound:g}')], count))
+            duration_samples.append(('_bucket', labels + [('le', '+Inf')], values['count']))
+            duration_samples.append(('_sum', labels, f"{values['duration']:.6f}"))
+            duration_samples.append(('_count', labels, values['count']))
+        metric('inventory_request_duration_seconds', 'histogram', 'Time to handle and render a request', duration_samples)
+        for name, key, help_text in [
+            ('inventory_db_queries_total', 'queries', 'Database queries run by requests'),
+            ('inventory_db_duration_seconds_total', 'db', 'Time requests spent in database queries'),
+            ('inventory_serialization_duration_seconds_total', 'serialize', 'Time requests spent in serializers'),
+            ('inventory_render_duration_seconds_total', 'render', 'Time spent rendering responses'),
+        ]:
+            metric(name, 'counter', help_text, [
+                ('', [('view', view), ('action', action)], values[key] if key == 'queries' else f'{values[key]:.6f}')
+                for (view, action), values in series.items()
+            ])
+        return '\n'.join(lines) + '\n'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metrics = MetricsRegistry()
+
+
+class InstrumentedViewSetMixin:
+    """
+    Record query count and database, serialization and rendering time of every request to the
+    viewset: returned in a Server-Timing header and added to the metrics registry per action.
+    The response is rendered inside the view so rendering is included; streamed content is not.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if not instrumentation_enabled():
+            return super().dispatch(request, *args, **kwargs)
+
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(stats.record_query):
+                response = super().dispatch(request, *args, **kwargs)
+                if isinstance(response, SimpleTemplateResponse) and not response.is_rendered:
+                    render_started = time.perf_counter()
+                    response.render()
+                    stats.render_time = time.perf_counter() - render_started
+        finally:
+            current_stats.reset(token)
+        duration = time.perf_counter() - started
+
+        response['Server-Timing'] = stats.server_timing(duration)
+        action = getattr(self, 'action', None) or request.method.lower()
+        metrics.observe(type(self).__name__, action, response.status_code, duration, stats)
+        return response
+
+
+def metrics_view(request):
+    """
+    Prometheus metrics of the inventory viewsets. Scrapers authenticate with
+    'Authorization: Bearer <settings.INVENTORY_METRICS_TOKEN>'; staff users may always read them.
+    """
+    token = getattr(settings, 'INVENTORY_METRICS_TOKEN', None)
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    authorized = bool(token) and hmac.compare_digest(supplied, token)
+    if not authorized and not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponseForbidden('Metrics require the metrics token or a staff user')
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,91 @@
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from inventory.models import StockMovement, StockMovementJob
+from inventory.processing import process_movements
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+RETRY_DELAY = timedelta(seconds=30)
+
+
+def async_processing_enabled():
+    """Whether created/updated movements are queued for the worker (settings.INVENTORY_ASYNC_PROCESSING)"""
+    return getattr(settings, 'INVENTORY_ASYNC_PROCESSING', False)
+
+
+def enqueue_movement(movement):
+    """
+    Queue a movement for processing by the worker. The job becomes visible when the caller's
+    transaction commits; a movement that already has a pending job is not queued twice.
+    """
+    with transaction.atomic():
+        StockMovement.objects.filter(pk=movement.pk).update(processing_status='queued')
+        movement.processing_status = 'queued'
+        job = StockMovementJob.objects.filter(movement=movement, status='pending').first()
+        if job is None:
+            job = StockMovementJob.objects.create(movement=movement)
+    return job
+
+
+def claim_jobs(limit=1):
+    """
+    Mark up to limit due jobs as running and return them. Rows locked by other workers are
+    skipped rather than waited on, so any number of workers can poll the same table.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            StockMovementJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='pending', available_at__lte=now)
+            .order_by('available_at', 'id')[:limit]
+        )
+        if not jobs:
+            return []
+        ids = [job.pk for job in jobs]
+        for job in jobs:
+            job.status = 'running'
+            job.attempts += 1
+            job.started_at = now
+        StockMovementJob.objects.bulk_update(jobs, ['status', 'attempts', 'started_at'])
+        StockMovement.objects.filter(jobs__in=ids).update(processing_status='processing')
+    return jobs
+
+
+def run_job(job):
+    """Process the job's movement, then mark it done or schedule a retry; returns True on success"""
+    try:
+        process_movements([job.movement])
+    except Exception as exc:
+        logger.exception('Processing movement %s failed (attempt %s)', job.movement_id, job.attempts)
+        now = timezone.now()
+        job.error = str(exc)
+        job.finished_at = now
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = 'failed'
+            StockMovement.objects.filter(pk=job.movement_id).update(processing_status='failed')
+        else:
+            job.status = 'pending'
+            job.available_at = now + RETRY_DELAY * job.attempts
+            StockMovement.objects.filter(pk=job.movement_id).update(processing_status='queued')
+        job.save(update_fields=['status', 'error', 'finished_at', 'available_at', 'updated_at'])
+        return False
+
+    job.status = 'done'
+    job.error = None
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at', 'updated_at'])
+    return True
+
+
+def requeue_stale_jobs(older_than):
+    """Return jobs left running by a worker that died more than older_than (a timedelta) ago to the queue"""
+    with transaction.atomic():
+        stale = StockMovementJob.objects.filter(status='running', started_at__lt=timezone.now() - older_than)
+        ids = list(stale.values_list('pk', flat=True))
+        StockMovement.objects.filter(jobs__in=ids).update(processing_status='queued')
+        return StockMovementJob.objects.filter(pk__in=ids).update(status='pending', available_at=timezone.now())
@@ -0,0 +1,70 @@
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from inventory.alerts import refresh_alerts_on_commit
+from inventory.cache import bump_stock_versions
+from inventory.models import StockBalance, StockLedgerEntry
+
+REPLAY_CHUNK_SIZE = 1000
+BALANCE_FIELDS = list(StockLedgerEntry.DELTA_FIELDS)
+
+
+def ledger_totals(location_id, chunk_size=REPLAY_CHUNK_SIZE):
+    """
+    Yield (product_id, {balance field: total}) for every product with ledger entries at the location,
+    summed by the database and read in chunks of chunk_size products
+    """
+    totals = (
+        StockLedgerEntry.objects
+        .filter(location_id=location_id)
+        .values('product_id')
+        .annotate(**{field: Sum(delta) for field, delta in StockLedgerEntry.DELTA_FIELDS.items()})
+        .order_by('product_id')
+    )
+    for row in totals.iterator(chunk_size=chunk_size):
+        yield row.pop('product_id'), row
+
+
+def replay_location(location_id, dry_run=False, chunk_size=REPLAY_CHUNK_SIZE):
+    """
+    Rebuild the StockBalance rows of one location from the stock ledger: balances that differ from
+    the sum of their entries are corrected, missing ones created and ones without entries zeroed.
+    The location's balances stay locked until the rebuild commits. Returns (checked, corrected, created).
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        balances = {
+            balance.product_id: balance
+            for balance in StockBalance.objects.select_for_update().filter(location_id=location_id).only(
+                'id', 'product_id', 'location_id', *BALANCE_FIELDS
+            )
+        }
+        zero = {field: Decimal(0) for field in BALANCE_FIELDS}
+        replayed = dict(ledger_totals(location_id, chunk_size))
+
+        corrected, created = [], []
+        for product_id in balances.keys() | replayed.keys():
+            totals = replayed.get(product_id, zero)
+            balance = balances.get(product_id)
+            if balance is None:
+                if any(totals.values()):
+                    created.append(StockBalance(product_id=product_id, location_id=location_id, **totals))
+                continue
+            if all(getattr(balance, field) == total for field, total in totals.items()):
+                continue
+            for field, total in totals.items():
+                setattr(balance, field, total)
+            balance.updated_at = now
+            corrected.append(balance)
+
+        if not dry_run:
+            # bulk writes bypass StockBalance.save, so the rebuild adds nothing to the ledger it replays
+            StockBalance.objects.bulk_update(corrected, BALANCE_FIELDS + ['updated_at'], batch_size=chunk_size)
+            StockBalance.objects.bulk_create(created, batch_size=chunk_size)
+            products = {balance.product_id for balance in corrected + created}
+            if products:
+                refresh_alerts_on_commit(products)
+                transaction.on_commit(lambda: bump_stock_versions(products, [location_id]))
+
+    return len(balances), len(corrected), len(created)
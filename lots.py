@@ -0,0 +1,31 @@
+from django.db.models import F
+from inventory.models import LotBalance
+
+
+def pick_lots(product_id, quantity, location_id=None):
+    """
+    Allocate quantity of a product across its lots in FIFO order (earliest received first) from
+    LotBalance rows with stock, reading them in index order (inv_lot_balance_fifo_idx at one location,
+    inv_lot_balance_prod_fifo_idx across locations) only until the quantity is covered.
+    Returns (picks, shortfall); nothing is reserved or moved.
+    """
+    balances = LotBalance.objects.filter(product_id=product_id, quantity__gt=0)
+    if location_id is not None:
+        balances = balances.filter(location_id=location_id)
+    balances = balances.select_related('lot_tracking').order_by(F('received_on').asc(nulls_last=True), 'id')
+
+    picks = []
+    remaining = quantity
+    for balance in balances.iterator(chunk_size=100):
+        if remaining <= 0:
+            break
+        take = min(balance.quantity, remaining)
+        picks.append({
+            'lot': balance.lot_tracking_id,
+            'lot_number': balance.lot_tracking.lot_number,
+            'location': balance.location_id,
+            'received_on': balance.received_on,
+            'quantity': take,
+        })
+        remaining -= take
+    return picks, max(remaining, 0)
@@ -0,0 +1,82 @@
+import json
+import platform
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from inventory.benchmarks import BENCH_PREFIX, bench_products, run_benchmarks, seed_dataset
+from inventory.models import StockBalance, StockLocation, StockMovementLine
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the inventory hot paths (movement processing, balance/product list pages, stock_status and the '
+        'admin changelists) against a synthetic BENCH- dataset and write latency percentiles and query counts '
+        'as JSON. The dataset is seeded into the configured default database on the first run and left there '
+        'for later runs to reuse, so run it against a scratch database, never production. Processed movements '
+        'are rolled back, so repeated runs on the same database compare like for like.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000, help='Products to seed')
+        parser.add_argument('--locations', type=int, default=20, help='Locations to seed')
+        parser.add_argument('--lines', type=int, default=100000, help='Movement lines to seed')
+        parser.add_argument('--lines-per-movement', type=int, default=20, help='Lines per seeded and processed movement')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the dataset and the processed movements')
+        parser.add_argument('--iterations', type=int, default=50, help='Timed calls per benchmark')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed calls before each benchmark')
+        parser.add_argument('--username', help='User the requests are made as (default: the first superuser)')
+        parser.add_argument('--seed-only', action='store_true', help='Seed the dataset and exit')
+        parser.add_argument('--output', help='JSON file to write (default: stdout)')
+
+    def handle(self, *args, **options):
+        sizes = ['products', 'locations', 'lines', 'lines_per_movement', 'iterations']
+        if min(options[size] for size in sizes) < 1 or options['warmup'] < 0:
+            raise CommandError('Dataset sizes and --iterations must be at least 1 and --warmup not negative')
+
+        users = get_user_model().objects.order_by('pk')
+        if options['username']:
+            user = users.filter(username=options['username']).first()
+        else:
+            user = users.filter(is_superuser=True).first()
+        if user is None and not options['seed_only']:
+            raise CommandError('No user to run the benchmarks as; create a superuser or pass --username')
+
+        try:
+            if not bench_products().exists():
+                seed_dataset(
+                    options['products'], options['locations'], options['lines'], options['lines_per_movement'],
+                    options['seed'], log=self.stderr.write if options['verbosity'] > 1 else None
+                )
+            if options['seed_only']:
+                return
+            results = run_benchmarks(user, options['iterations'], options['warmup'], options['lines_per_movement'], options['seed'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        report = {
+            'environment': {
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'dataset': {
+                'products': bench_products().count(),
+                'locations': StockLocation.objects.filter(name__startswith=BENCH_PREFIX).count(),
+                'movement_lines': StockMovementLine.objects.filter(movement__reference__startswith=f'{BENCH_PREFIX}M').count(),
+                'balances': StockBalance.objects.filter(product__code__startswith=BENCH_PREFIX).count(),
+            },
+            'options': {
+                'iterations': options['iterations'],
+                'warmup': options['warmup'],
+                'lines_per_movement': options['lines_per_movement'],
+                'seed': options['seed'],
+            },
+            'results': results,
+        }
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as stream:
+                stream.write(output + '\n')
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,51 @@
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from inventory.snapshots import build_snapshot
+
+
+def period_end(day, period):
+    """Last day of the day/month period containing day"""
+    if period == 'day':
+        return day
+    next_month = (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+class Command(BaseCommand):
+    help = (
+        'Build StockSnapshot rows at the end of each day or month. Snapshots are incremental: each one '
+        'starts from the previous snapshot, so rebuild from the earliest affected period (--since) after '
+        'back-dated movements are recorded.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', choices=['day', 'month'], default='day')
+        parser.add_argument('--date', help='Snapshot the period containing this date (default: the last complete period)')
+        parser.add_argument('--since', help='Also (re)build every period from this date up to --date')
+
+    def parse(self, value, option):
+        parsed = parse_date(value)
+        if parsed is None:
+            raise CommandError(f'{option} must be a date in YYYY-MM-DD format')
+        return parsed
+
+    def handle(self, *args, **options):
+        period = options['period']
+        if options['date']:
+            last = period_end(self.parse(options['date'], '--date'), period)
+        elif period == 'day':
+            last = date.today() - timedelta(days=1)
+        else:
+            last = date.today().replace(day=1) - timedelta(days=1)
+
+        current = period_end(self.parse(options['since'], '--since'), period) if options['since'] else last
+        if current > last:
+            raise CommandError('--since must not be after --date')
+
+        while current <= last:
+            rows = build_snapshot(current)
+            self.stdout.write(f'{current}: {rows} snapshot rows')
+            current = period_end(current + timedelta(days=1), period)
+
+        self.stdout.write(self.style.SUCCESS('Snapshots built'))
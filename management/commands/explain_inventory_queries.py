@@ -0,0 +1,44 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+from inventory.models import StockBalance, StockMovement, StockMovementLine
+
+
+class Command(BaseCommand):
+    help = (
+        'Print the query plans of the movement-line hot paths. Run it before and after applying '
+        'index migrations against a production-sized database to compare plans.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--analyze', action='store_true', help='Execute the queries and report actual timings (PostgreSQL)')
+
+    def hot_queries(self, balance):
+        product, location = balance.product_id, balance.location_id
+        return {
+            'movement list page (-date, -id)': StockMovement.objects.order_by('-date', '-id')[:100],
+            'movements by type/location/date': StockMovement.objects.filter(
+                movement_type='in', destination_location_id=location, date__lte=date.today()
+            ),
+            'in total for product/location': StockMovementLine.objects.filter(
+                movement__movement_type='in', product_id=product, movement__destination_location_id=location
+            ).values('product_id').annotate(total=Sum('quantity')).order_by(),
+            'lines for product': StockMovementLine.objects.filter(product_id=product).values_list('movement_id', 'quantity'),
+            'totals rebuild aggregate': StockMovementLine.objects.filter(
+                movement__movement_type__in=['in', 'out']
+            ).values('product_id', 'movement__destination_location_id', 'movement__movement_type').annotate(
+                total=Sum('quantity')
+            ).order_by(),
+        }
+
+    def handle(self, *args, **options):
+        balance = StockBalance.objects.order_by('id').first()
+        if balance is None:
+            raise CommandError('No stock balances found to build sample queries from')
+
+        explain_options = {'analyze': True} if options['analyze'] and connection.vendor == 'postgresql' else {}
+        for label, queryset in self.hot_queries(balance).items():
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write('')
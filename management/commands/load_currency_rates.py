@@ -0,0 +1,54 @@
+import csv
+from decimal import Decimal, InvalidOperation
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_date
+from core.models.models import Currency
+from inventory.cache import bump_generation
+from inventory.models import CurrencyRate
+
+
+class Command(BaseCommand):
+    help = (
+        'Load CurrencyRate rows from a CSV file with currency (id or code), date (YYYY-MM-DD) and rate columns, '
+        'where rate is the base currency value of one unit. Existing rates for the same currency and date are replaced.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--replace', action='store_true', help='Delete all existing rates first')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with open(options['path'], newline='', encoding='utf-8-sig') as stream:
+            rows = list(csv.DictReader(stream))
+
+        currencies = {str(pk): pk for pk in Currency.objects.values_list('pk', flat=True)}
+        currencies.update({code: pk for pk, code in Currency.objects.values_list('pk', 'code')})
+
+        rates = {}
+        for line_number, row in enumerate(rows, start=2):
+            currency_id = currencies.get((row.get('currency') or '').strip())
+            day = parse_date((row.get('date') or '').strip())
+            try:
+                rate = Decimal((row.get('rate') or '').strip())
+            except InvalidOperation:
+                rate = None
+            if currency_id is None or day is None or rate is None or rate < 0:
+                raise CommandError(f'Line {line_number}: expected a known currency, a YYYY-MM-DD date and a non-negative rate')
+            rates[(currency_id, day)] = CurrencyRate(currency_id=currency_id, date=day, rate=rate)
+
+        with transaction.atomic():
+            if options['replace']:
+                CurrencyRate.objects.all().delete()
+            CurrencyRate.objects.bulk_create(
+                rates.values(),
+                batch_size=options['batch_size'],
+                update_conflicts=True,
+                unique_fields=['currency', 'date'],
+                update_fields=['rate', 'updated_at']
+            )
+        # bulk_create sends no signals; drop in-memory rate tables explicitly
+        bump_generation(CurrencyRate)
+
+        self.stdout.write(self.style.SUCCESS(f'Loaded {len(rates)} currency rates'))
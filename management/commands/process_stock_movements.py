@@ -0,0 +1,62 @@
+import threading
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from inventory.jobs import claim_jobs, run_job, requeue_stale_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        'Worker that applies queued StockMovementJob rows (settings.INVENTORY_ASYNC_PROCESSING). '
+        'Each thread claims jobs with SELECT ... FOR UPDATE SKIP LOCKED, so several workers can run side by side.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help='Worker threads')
+        parser.add_argument('--batch-size', type=int, default=10, help='Jobs claimed per poll')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--stale-after', type=int, default=600, help='Requeue jobs left running this many seconds')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is drained')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--concurrency and --batch-size must be at least 1')
+
+        requeued = requeue_stale_jobs(timedelta(seconds=options['stale_after']))
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} stale jobs')
+
+        stop = threading.Event()
+        counts = {'done': 0, 'failed': 0}
+        lock = threading.Lock()
+
+        def work():
+            try:
+                while not stop.is_set():
+                    jobs = claim_jobs(options['batch_size'])
+                    if not jobs:
+                        if options['once']:
+                            return
+                        stop.wait(options['poll_interval'])
+                        continue
+                    for job in jobs:
+                        succeeded = run_job(job)
+                        with lock:
+                            counts['done' if succeeded else 'failed'] += 1
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=work, daemon=True) for _ in range(options['concurrency'])]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                while worker.is_alive():
+                    worker.join(0.5)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping after the current jobs...')
+            stop.set()
+            for worker in workers:
+                worker.join()
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {counts['done']} jobs, {counts['failed']} failed attempts"))
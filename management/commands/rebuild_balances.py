@@ -0,0 +1,60 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from inventory.ledger import REPLAY_CHUNK_SIZE, replay_location
+from inventory.models import StockLedgerEntry, StockLocation
+
+
+class Command(BaseCommand):
+    help = (
+        'Regenerate StockBalance quantities by replaying the StockLedgerEntry table. Locations are '
+        'rebuilt in parallel, each in its own transaction, with the ledger summed in chunks of products.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--location', type=int, action='append', help='Only rebuild these location ids')
+        parser.add_argument('--processes', type=int, default=os.cpu_count(), help='Worker processes (1 rebuilds in-process)')
+        parser.add_argument('--chunk-size', type=int, default=REPLAY_CHUNK_SIZE, help='Products read and written per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Only report drift, do not write balances')
+
+    def handle(self, *args, **options):
+        if options['processes'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('--processes and --chunk-size must be at least 1')
+
+        locations = StockLocation.objects.order_by('id')
+        if options['location']:
+            locations = locations.filter(pk__in=options['location'])
+        location_ids = list(locations.values_list('id', flat=True))
+        if not StockLedgerEntry.objects.exists():
+            raise CommandError('The stock ledger is empty; refusing to zero every balance')
+
+        replay = partial(replay_location, dry_run=options['dry_run'], chunk_size=options['chunk_size'])
+        processes = min(options['processes'], len(location_ids))
+        if processes <= 1:
+            results = [replay(location_id) for location_id in location_ids]
+        else:
+            # Close the parent's connections before forking so every worker opens its own
+            connections.close_all()
+            start_method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+            with ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context(start_method),
+                initializer=django.setup
+            ) as executor:
+                results = list(executor.map(replay, location_ids))
+
+        checked, corrected, created = (sum(counts) for counts in zip(*results)) if results else (0, 0, 0)
+        if options['verbosity'] > 1:
+            for location_id, counts in zip(location_ids, results):
+                if counts[1] or counts[2]:
+                    self.stdout.write(f'Location {location_id}: {counts[1]} corrected, {counts[2]} created')
+
+        action = 'found' if options['dry_run'] else 'rebuilt'
+        self.stdout.write(self.style.SUCCESS(
+            f'Replayed {len(location_ids)} locations: checked {checked} balances, '
+            f'{action} {corrected} drifted and {created} missing'
+        ))
@@ -0,0 +1,73 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from inventory.cache import bump_stock_versions
+from inventory.models import StockBalance, StockMovementApplication, StockLedgerEntry
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the in/out totals on StockBalance from the applied movement quantities and report drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report drift, do not write corrected totals')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def movement_totals(self):
+        """
+        Sum the in/out quantities processing has applied per (product, location) in a single grouped
+        query. StockMovementApplication holds exactly what was applied, so queued and unprocessed
+        movements do not count and transfers are already split into their out and in legs.
+        """
+        totals = {}
+        rows = (
+            StockMovementApplication.objects
+            .filter(lot_tracking__isnull=True, effect__in=['in', 'out'])
+            .values('product_id', 'location_id', 'effect')
+            .annotate(total=Sum('quantity'))
+            .order_by()
+        )
+        for row in rows.iterator():
+            totals.setdefault((row['product_id'], row['location_id']), {})[row['effect']] = row['total']
+        return totals
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        totals = self.movement_totals()
+
+        checked = 0
+        drifted, entries = [], []
+        balances = StockBalance.objects.only('id', 'product_id', 'location_id', 'in_total', 'out_total').order_by('id')
+        for balance in balances.iterator(chunk_size=batch_size):
+            checked += 1
+            movement_totals = totals.get((balance.product_id, balance.location_id), {})
+            in_total = movement_totals.get('in') or Decimal(0)
+            out_total = movement_totals.get('out') or Decimal(0)
+            if balance.in_total == in_total and balance.out_total == out_total:
+                continue
+
+            if options['verbosity'] > 1:
+                self.stdout.write(
+                    f"Balance {balance.id} (product {balance.product_id}, location {balance.location_id}): "
+                    f"in {balance.in_total} -> {in_total}, out {balance.out_total} -> {out_total}"
+                )
+            before = {'in_total': balance.in_total, 'out_total': balance.out_total}
+            balance.in_total = in_total
+            balance.out_total = out_total
+            drifted.append(balance)
+            entries.append(StockLedgerEntry.between(
+                balance.product_id, balance.location_id, before,
+                {'in_total': in_total, 'out_total': out_total}, 'correction'
+            ))
+
+        if drifted and not options['dry_run']:
+            with transaction.atomic():
+                StockBalance.objects.bulk_update(drifted, ['in_total', 'out_total'], batch_size=batch_size)
+                StockLedgerEntry.objects.bulk_create(entries, batch_size=batch_size)
+            bump_stock_versions(
+                {balance.product_id for balance in drifted},
+                {balance.location_id for balance in drifted}
+            )
+
+        action = 'found' if options['dry_run'] else 'corrected'
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} balances, {action} drift on {len(drifted)}"))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from inventory.alerts import refresh_alerts
+from inventory.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Re-evaluate StockAlert rows for the whole catalog in batches. Processing keeps alerts current '
+        'incrementally; run this once after deploying and whenever thresholds are changed in bulk.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        product_ids = list(Product.objects.order_by('id').values_list('id', flat=True))
+        totals = [0, 0, 0]
+        for index in range(0, len(product_ids), batch_size):
+            with transaction.atomic():
+                counts = refresh_alerts(product_ids[index:index + batch_size])
+            totals = [total + count for total, count in zip(totals, counts)]
+
+        created, updated, removed = totals
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {len(product_ids)} products: {created} alerts raised, {updated} updated, {removed} cleared'
+        ))
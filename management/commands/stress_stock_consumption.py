@@ -0,0 +1,88 @@
+import threading
+import uuid
+from datetime import date
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from core.models.models import Company, Currency
+from hr.models import Employee
+from inventory.models import (
+    Product, Warehouse, StockLocation, StockMovement, StockMovementLine, StockBalance, StockLedgerEntry
+)
+from inventory.processing import process_movements
+
+
+class Command(BaseCommand):
+    help = (
+        'Run concurrent outbound movements against one product/location and verify that no balance '
+        'update is lost. Use a database with row locking (PostgreSQL); the data is removed afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--iterations', type=int, default=50, help='Outbound movements per thread')
+        parser.add_argument('--quantity', type=Decimal, default=Decimal('1'), help='Quantity per outbound line')
+
+    def handle(self, *args, **options):
+        company, currency, employee = Company.objects.first(), Currency.objects.first(), Employee.objects.first()
+        if not (company and currency and employee):
+            raise CommandError('At least one company, currency and employee are required')
+
+        threads, iterations, quantity = options['threads'], options['iterations'], options['quantity']
+        run = uuid.uuid4().hex[:8]
+        expected_out = quantity * threads * iterations
+        opening = expected_out * 2
+
+        warehouse = Warehouse.objects.create(name=f'STRESS-{run}')
+        location = StockLocation.objects.create(name=f'STRESS-{run}', warehouse=warehouse)
+        product = Product.objects.create(name=f'Stress {run}', code=f'STRESS-{run}', company=company)
+
+        def create_movement(reference, movement_type, line_quantity):
+            with transaction.atomic():
+                movement = StockMovement.objects.create(
+                    reference=reference, movement_type=movement_type, date=date.today(),
+                    destination_location=location, performed_by=employee
+                )
+                StockMovementLine.objects.create(
+                    movement=movement, product=product, quantity=line_quantity, unit_cost=0, currency=currency
+                )
+            return movement
+
+        errors = []
+
+        def worker(index):
+            try:
+                for iteration in range(iterations):
+                    process_movements([create_movement(f'STRESS-{run}-{index}-{iteration}', 'out', quantity)])
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        try:
+            process_movements([create_movement(f'STRESS-{run}-opening', 'in', opening)])
+
+            workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            if errors:
+                raise CommandError(f'{len(errors)} worker(s) failed, first error: {errors[0]!r}')
+
+            balance = StockBalance.objects.get(product=product, location=location)
+            self.stdout.write(
+                f"initial_quantity={balance.initial_quantity} (expected {opening - expected_out}), "
+                f"in_total={balance.in_total} (expected {opening}), out_total={balance.out_total} (expected {expected_out})"
+            )
+            if balance.out_total != expected_out or balance.initial_quantity != opening - expected_out:
+                raise CommandError('Lost updates detected')
+            self.stdout.write(self.style.SUCCESS(f'No lost updates across {threads * iterations} concurrent movements'))
+        finally:
+            StockMovement.objects.filter(reference__startswith=f'STRESS-{run}-').delete()
+            StockBalance.objects.filter(product=product).delete()
+            # The run's ledger entries protect its product and location from deletion
+            StockLedgerEntry.objects.filter(product=product).delete()
+            product.delete()
+            location.delete()
+            warehouse.delete()
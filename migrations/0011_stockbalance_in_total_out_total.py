@@ -0,0 +1,50 @@
+# Generated by Django 5.2.4 on 2026-10-17 09:12
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def populate_totals(apps, schema_editor):
+    StockBalance = apps.get_model('inventory', 'StockBalance')
+    StockMovementLine = apps.get_model('inventory', 'StockMovementLine')
+
+    totals = {}
+    rows = (
+        StockMovementLine.objects
+        .filter(movement__movement_type__in=['in', 'out'])
+        .values('product_id', 'movement__destination_location_id', 'movement__movement_type')
+        .annotate(total=Sum('quantity'))
+        .order_by()
+    )
+    for row in rows:
+        key = (row['product_id'], row['movement__destination_location_id'])
+        totals.setdefault(key, {})[row['movement__movement_type']] = row['total']
+
+    balances = []
+    for balance in StockBalance.objects.all():
+        movement_totals = totals.get((balance.product_id, balance.location_id), {})
+        balance.in_total = movement_totals.get('in') or 0
+        balance.out_total = movement_totals.get('out') or 0
+        balances.append(balance)
+    StockBalance.objects.bulk_update(balances, ['in_total', 'out_total'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_remove_sale_price_column'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockbalance',
+            name='in_total',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=15),
+        ),
+        migrations.AddField(
+            model_name='stockbalance',
+            name='out_total',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=15),
+        ),
+        migrations.RunPython(populate_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.4 on 2026-10-17 10:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def record_applied_movements(apps, schema_editor):
+    # Movements created through the API were processed when saved, so record what they applied
+    # to keep a later reprocess from counting them again
+    StockMovement = apps.get_model('inventory', 'StockMovement')
+    StockMovementLine = apps.get_model('inventory', 'StockMovementLine')
+    StockMovementApplication = apps.get_model('inventory', 'StockMovementApplication')
+
+    applications = {}
+    totals = (
+        StockMovementLine.objects
+        .filter(movement__movement_type__in=['in', 'out'])
+        .values('movement_id', 'product_id', 'movement__destination_location_id', 'movement__movement_type')
+        .annotate(total=Sum('quantity'))
+        .order_by()
+    )
+    for row in totals.iterator():
+        key = (row['movement_id'], row['product_id'], row['movement__destination_location_id'], row['movement__movement_type'])
+        applications[key] = row['total']
+
+    adjustments = (
+        StockMovementLine.objects
+        .filter(movement__movement_type='adjustment')
+        .order_by('movement_id', 'id')
+        .values_list('movement_id', 'product_id', 'movement__destination_location_id', 'quantity')
+    )
+    for movement_id, product_id, location_id, quantity in adjustments.iterator():
+        applications[(movement_id, product_id, location_id, 'adjustment')] = quantity
+
+    StockMovementApplication.objects.bulk_create(
+        (
+            StockMovementApplication(movement_id=movement_id, product_id=product_id, location_id=location_id, effect=effect, quantity=quantity)
+            for (movement_id, product_id, location_id, effect), quantity in applications.items()
+        ),
+        batch_size=1000
+    )
+    StockMovement.objects.update(processed_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_stockbalance_in_total_out_total'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockmovement',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='StockMovementApplication',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('effect', models.CharField(choices=[('in', 'Stock In'), ('out', 'Stock Out'), ('adjustment', 'Stock Adjustment')], max_length=20)),
+                ('quantity', models.DecimalField(decimal_places=3, max_digits=15)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='inventory.stocklocation')),
+                ('movement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='applications', to='inventory.stockmovement')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='inventory.product')),
+            ],
+            options={
+                'unique_together': {('movement', 'product', 'location', 'effect')},
+            },
+        ),
+        migrations.RunPython(record_applied_movements, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-17 10:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_stockmovement_processing_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField()),
+                ('quantity', models.DecimalField(decimal_places=3, default=0, max_digits=15)),
+                ('in_total', models.DecimalField(decimal_places=3, default=0, max_digits=15)),
+                ('out_total', models.DecimalField(decimal_places=3, default=0, max_digits=15)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='inventory.stocklocation')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='inventory.product')),
+            ],
+            options={
+                'ordering': ['-date', 'product', 'location'],
+                'unique_together': {('date', 'product', 'location')},
+            },
+        ),
+    ]
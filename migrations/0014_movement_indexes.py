@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-17 10:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_stocksnapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['-date', '-id'], name='inv_movement_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['movement_type', 'destination_location', 'date'], name='inv_movement_type_loc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovementline',
+            index=models.Index(fields=['product', 'movement'], include=('quantity',), name='inv_line_product_movement_idx'),
+        ),
+    ]
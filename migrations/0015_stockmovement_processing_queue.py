@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-17 11:24
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def mark_processed_movements(apps, schema_editor):
+    StockMovement = apps.get_model('inventory', 'StockMovement')
+    StockMovement.objects.filter(processed_at__isnull=False).update(processing_status='processed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0014_movement_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockmovement',
+            name='processing_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('queued', 'Queued'), ('processing', 'Processing'), ('processed', 'Processed'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.RunPython(mark_processed_movements, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='StockMovementJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('movement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='inventory.stockmovement')),
+            ],
+            options={
+                'ordering': ['available_at', 'id'],
+                'indexes': [models.Index(fields=['status', 'available_at'], name='inv_job_status_available_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:15
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0016_currencyrate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('quantity', models.DecimalField(decimal_places=3, max_digits=15, validators=[django.core.validators.MinValueValidator(0)])),
+                ('status', models.CharField(choices=[('active', 'Active'), ('released', 'Released'), ('committed', 'Committed')], default='active', max_length=20)),
+                ('reference', models.CharField(blank=True, max_length=100, null=True)),
+                ('balance', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='reservations', to='inventory.stockbalance')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['balance', 'status'], name='inv_reservation_balance_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0017_stockreservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('kind', models.CharField(choices=[('below_min', 'Below Minimum'), ('above_max', 'Above Maximum')], max_length=20)),
+                ('quantity', models.DecimalField(decimal_places=3, max_digits=15)),
+                ('threshold', models.DecimalField(decimal_places=3, max_digits=15)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alerts', to='inventory.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'product'], name='inv_alert_kind_product_idx')],
+                'unique_together': {('product', 'kind')},
+            },
+        ),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_lot_balances(apps, schema_editor):
+    # Replay the lot-carrying lines of processed movements into lot-level applications and balances
+    StockMovementLine = apps.get_model('inventory', 'StockMovementLine')
+    StockMovementApplication = apps.get_model('inventory', 'StockMovementApplication')
+    LotBalance = apps.get_model('inventory', 'LotBalance')
+
+    applications = {}
+    balances = {}
+    lines = (
+        StockMovementLine.objects
+        .filter(lot_tracking__isnull=False, movement__processed_at__isnull=False, movement__movement_type__in=['in', 'out', 'adjustment'])
+        .order_by('movement__date', 'movement_id', 'id')
+        .values_list('movement_id', 'movement__date', 'movement__movement_type', 'movement__destination_location_id', 'product_id', 'lot_tracking_id', 'quantity')
+    )
+    for movement_id, day, effect, location_id, product_id, lot_id, quantity in lines.iterator():
+        key = (movement_id, product_id, location_id, effect, lot_id)
+        balance = balances.setdefault((lot_id, location_id), LotBalance(lot_tracking_id=lot_id, location_id=location_id, product_id=product_id))
+        if effect == 'adjustment':
+            applications[key] = quantity
+            balance.quantity = quantity
+        elif effect == 'in':
+            applications[key] = applications.get(key, 0) + quantity
+            balance.quantity += quantity
+            balance.in_total += quantity
+            if balance.received_on is None:
+                balance.received_on = day
+        else:
+            applications[key] = applications.get(key, 0) + quantity
+            balance.quantity -= quantity
+            balance.out_total += quantity
+
+    StockMovementApplication.objects.bulk_create(
+        (
+            StockMovementApplication(movement_id=movement_id, product_id=product_id, location_id=location_id, effect=effect, lot_tracking_id=lot_id, quantity=quantity)
+            for (movement_id, product_id, location_id, effect, lot_id), quantity in applications.items()
+        ),
+        batch_size=1000
+    )
+    LotBalance.objects.bulk_create(balances.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0018_stockalert'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LotBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('quantity', models.DecimalField(decimal_places=3, default=0, max_digits=15)),
+                ('in_total', models.DecimalField(decimal_places=3, default=0, max_digits=15)),
+                ('out_total', models.DecimalField(decimal_places=3, default=0, max_digits=15)),
+                ('received_on', models.DateField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='stockmovementapplication',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='stockmovementapplication',
+            name='lot_tracking',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='inventory.lottracking'),
+        ),
+        migrations.AddConstraint(
+            model_name='stockmovementapplication',
+            constraint=models.UniqueConstraint(condition=models.Q(('lot_tracking__isnull', True)), fields=('movement', 'product', 'location', 'effect'), name='inv_application_balance_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='stockmovementapplication',
+            constraint=models.UniqueConstraint(condition=models.Q(('lot_tracking__isnull', False)), fields=('movement', 'lot_tracking', 'location', 'effect'), name='inv_application_lot_uniq'),
+        ),
+        migrations.AddField(
+            model_name='lotbalance',
+            name='location',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='inventory.stocklocation'),
+        ),
+        migrations.AddField(
+            model_name='lotbalance',
+            name='lot_tracking',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='balances', to='inventory.lottracking'),
+        ),
+        migrations.AddField(
+            model_name='lotbalance',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='inventory.product'),
+        ),
+        migrations.AddIndex(
+            model_name='lotbalance',
+            index=models.Index(fields=['product', 'location', 'received_on', 'id'], name='inv_lot_balance_fifo_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='lotbalance',
+            unique_together={('lot_tracking', 'location')},
+        ),
+        migrations.RunPython(backfill_lot_balances, migrations.RunPython.noop),
+    ]
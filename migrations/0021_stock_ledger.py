@@ -0,0 +1,60 @@
+# Generated by Django 5.2.4 on 2026-10-17 13:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def create_opening_entries(apps, schema_editor):
+    # One opening entry per existing balance, so replaying the ledger reproduces today's balances
+    StockBalance = apps.get_model('inventory', 'StockBalance')
+    StockLedgerEntry = apps.get_model('inventory', 'StockLedgerEntry')
+
+    balances = (
+        StockBalance.objects
+        .exclude(Q(initial_quantity=0) & Q(reserved_quantity=0) & Q(in_total=0) & Q(out_total=0))
+        .order_by('id')
+        .values_list('product_id', 'location_id', 'initial_quantity', 'reserved_quantity', 'in_total', 'out_total')
+    )
+    StockLedgerEntry.objects.bulk_create(
+        (
+            StockLedgerEntry(
+                product_id=product_id, location_id=location_id, source='opening', initial_delta=initial_quantity,
+                reserved_delta=reserved_quantity, in_delta=in_total, out_delta=out_total
+            )
+            for product_id, location_id, initial_quantity, reserved_quantity, in_total, out_total in balances.iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0020_stockmovement_source_location'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('source', models.CharField(choices=[('opening', 'Opening Balance'), ('movement', 'Stock Movement'), ('reservation', 'Reservation'), ('manual', 'Manual Change'), ('correction', 'Correction')], max_length=20)),
+                ('initial_delta', models.DecimalField(decimal_places=3, default=0, max_digits=15)),
+                ('reserved_delta', models.DecimalField(decimal_places=3, default=0, max_digits=15)),
+                ('in_delta', models.DecimalField(decimal_places=3, default=0, max_digits=15)),
+                ('out_delta', models.DecimalField(decimal_places=3, default=0, max_digits=15)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='inventory.stocklocation')),
+                ('movement', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='inventory.stockmovement')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='inventory.product')),
+                ('reservation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='inventory.stockreservation')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['location', 'product'], include=('initial_delta', 'reserved_delta', 'in_delta', 'out_delta'), name='inv_ledger_location_idx')],
+            },
+        ),
+        migrations.RunPython(create_opening_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0021_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockmovementapplication',
+            name='shortfall',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=15),
+        ),
+    ]
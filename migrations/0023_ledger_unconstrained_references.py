@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-17 14:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0022_stockmovementapplication_shortfall'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockledgerentry',
+            name='movement',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='ledger_entries', to='inventory.stockmovement'),
+        ),
+        migrations.AlterField(
+            model_name='stockledgerentry',
+            name='reservation',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='ledger_entries', to='inventory.stockreservation'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-17 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0023_ledger_unconstrained_references'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lotbalance',
+            index=models.Index(fields=['product', 'received_on', 'id'], name='inv_lot_balance_prod_fifo_idx'),
+        ),
+    ]
@@ -1,9 +1,29 @@
-from django.db import models
+from django.db import models, transaction
 from core.models.base import BaseModel
 from core.models.models import Company, UnitOfMeasure, Currency
 from finance.models import Journal
 from hr.models import Employee
 from django.core.validators import MinValueValidator
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from inventory.cache import get_reference
+
+class ProductQuerySet(models.QuerySet):
+    def with_stock_totals(self):
+        """
+        Annotate total_quantity and total_reserved across all locations, each computed by a
+        grouped subquery on StockBalance instead of a query per product
+        """
+        balances = StockBalance.objects.filter(product=models.OuterRef('pk')).order_by().values('product')
+
+        def total(field):
+            return Coalesce(
+                models.Subquery(balances.annotate(total=models.Sum(field)).values('total')),
+                models.Value(0),
+                output_field=models.DecimalField(max_digits=15, decimal_places=3)
+            )
+
+        return self.annotate(total_quantity=total('initial_quantity'), total_reserved=total('reserved_quantity'))
 
 class Product(BaseModel):
     CATEGORY_CHOICES = [
@@ -22,6 +42,8 @@ class Product(BaseModel):
     max_stock = models.DecimalField(max_digits=15, decimal_places=3, default=0)
     company = models.ForeignKey(Company, on_delete=models.PROTECT)
     
+    objects = ProductQuerySet.as_manager()
+    
     class Meta:
         ordering = ['code']
     
@@ -45,7 +67,12 @@ class StockLocation(BaseModel):
         ordering = ['warehouse', 'name']
     
     def __str__(self):
-        return f"{self.warehouse.name} - {self.name}"
+        # Read the warehouse through the reference cache unless it was loaded with select_related
+        if StockLocation.warehouse.is_cached(self):
+            warehouse = self.warehouse
+        else:
+            warehouse = get_reference(Warehouse, self.warehouse_id)
+        return f"{warehouse.name} - {self.name}"
 
 class StockMovement(BaseModel):
     MOVEMENT_TYPES = [
@@ -54,20 +81,102 @@ class StockMovement(BaseModel):
         ('transfer', 'Internal Transfer'),
         ('adjustment', 'Stock Adjustment'),
     ]
+    PROCESSING_STATUSES = [
+        ('pending', 'Pending'),
+        ('queued', 'Queued'),
+        ('processing', 'Processing'),
+        ('processed', 'Processed'),
+        ('failed', 'Failed'),
+    ]
     
     reference = models.CharField(max_length=50, unique=True)
     movement_type = models.CharField(max_length=20, choices=MOVEMENT_TYPES)
     date = models.DateField()
     destination_location = models.ForeignKey(StockLocation, on_delete=models.PROTECT, related_name='destination_movements')
+    source_location = models.ForeignKey(StockLocation, on_delete=models.PROTECT, null=True, blank=True, related_name='source_movements')
     notes = models.TextField(null=True, blank=True)
     performed_by = models.ForeignKey(Employee, on_delete=models.PROTECT)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    processing_status = models.CharField(max_length=20, choices=PROCESSING_STATUSES, default='pending')
     
     class Meta:
         ordering = ['-date', '-id']
+        indexes = [
+            models.Index(fields=['-date', '-id'], name='inv_movement_date_id_idx'),
+            models.Index(fields=['movement_type', 'destination_location', 'date'], name='inv_movement_type_loc_idx'),
+        ]
     
     def __str__(self):
         return f"{self.reference} ({self.get_movement_type_display()})"
 
+class StockMovementApplication(BaseModel):
+    """
+    Net quantity of a movement currently applied to one balance. Reprocessing a movement only
+    applies the difference between its lines and these rows, so repeated calls are no-ops.
+    Rows without a lot apply to a StockBalance, rows with a lot to that lot's LotBalance.
+    shortfall is the part of the quantity that could not be taken from stock, so reversing
+    the movement only puts back what it actually consumed.
+    """
+    EFFECTS = [
+        ('in', 'Stock In'),
+        ('out', 'Stock Out'),
+        ('adjustment', 'Stock Adjustment'),
+    ]
+    
+    movement = models.ForeignKey(StockMovement, on_delete=models.CASCADE, related_name='applications')
+    product = models.ForeignKey(Product, on_delete=models.PROTECT)
+    location = models.ForeignKey(StockLocation, on_delete=models.PROTECT)
+    effect = models.CharField(max_length=20, choices=EFFECTS)
+    quantity = models.DecimalField(max_digits=15, decimal_places=3)
+    shortfall = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+    lot_tracking = models.ForeignKey('LotTracking', on_delete=models.PROTECT, null=True, blank=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['movement', 'product', 'location', 'effect'],
+                condition=models.Q(lot_tracking__isnull=True),
+                name='inv_application_balance_uniq'
+            ),
+            models.UniqueConstraint(
+                fields=['movement', 'lot_tracking', 'location', 'effect'],
+                condition=models.Q(lot_tracking__isnull=False),
+                name='inv_application_lot_uniq'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.movement_id}: {self.effect} {self.quantity} of product {self.product_id} @ location {self.location_id}"
+
+class StockMovementJob(BaseModel):
+    """
+    Queued request to process a movement's balances, claimed and run by the process_stock_movements
+    worker when settings.INVENTORY_ASYNC_PROCESSING is on. Failed attempts are retried with backoff.
+    """
+    STATUSES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    movement = models.ForeignKey(StockMovement, on_delete=models.CASCADE, related_name='jobs')
+    status = models.CharField(max_length=20, choices=STATUSES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['available_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='inv_job_status_available_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Job {self.id} for movement {self.movement_id} ({self.status})"
+
 class StockMovementLine(BaseModel):
     movement = models.ForeignKey(StockMovement, on_delete=models.CASCADE, related_name='lines')
     product = models.ForeignKey(Product, on_delete=models.PROTECT)
@@ -78,6 +187,10 @@ class StockMovementLine(BaseModel):
     
     class Meta:
         ordering = ['id']
+        indexes = [
+            # Covering index (on PostgreSQL) for per-product quantity aggregates over movement lines
+            models.Index(fields=['product', 'movement'], include=['quantity'], name='inv_line_product_movement_idx'),
+        ]
     
     def __str__(self):
         return f"{self.movement.reference} - {self.product.code}"
@@ -87,6 +200,8 @@ class StockBalance(BaseModel):
     location = models.ForeignKey(StockLocation, on_delete=models.PROTECT)
     initial_quantity = models.DecimalField(max_digits=15, decimal_places=3, default=0)  # Renamed from quantity
     reserved_quantity = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+    in_total = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+    out_total = models.DecimalField(max_digits=15, decimal_places=3, default=0)
     
     class Meta:
         unique_together = ['product', 'location']
@@ -96,87 +211,289 @@ class StockBalance(BaseModel):
     
     @property
     def total_in(self):
-        """Calculate total in movements for this product and location"""
-        return StockMovementLine.objects.filter(
-            movement__movement_type='in',
-            product=self.product,
-            movement__destination_location=self.location
-        ).aggregate(total=models.Sum('quantity'))['total'] or 0
+        """Total of processed in movements for this product and location"""
+        return self.in_total
     
     @property
     def total_out(self):
-        """Calculate total out movements for this product and location"""
-        return StockMovementLine.objects.filter(
-            movement__movement_type='out',
-            product=self.product,
-            movement__destination_location=self.location
-        ).aggregate(total=models.Sum('quantity'))['total'] or 0
+        """Total of processed out movements for this product and location"""
+        return self.out_total
     
     @property
     def available_stock(self):
         """
-        Calculate available stock based on the new formula:
-        available stock = initial_quantity + total_in - total_out - reserved_quantity
+        On-hand stock not held by reservations, the quantity reserve() accepts:
+        available stock = initial_quantity - reserved_quantity
+        (initial_quantity already includes processed in and out movements)
         """
-        available = self.initial_quantity + self.total_in - self.total_out - self.reserved_quantity
+        available = self.initial_quantity - self.reserved_quantity
         return max(available, 0)  # Ensure it's never negative
     
-    def consume_stock(self, quantity_needed):
+    def clamp_reserved(self):
+        """Keep reserved_quantity within on-hand stock after on-hand stock went down"""
+        self.reserved_quantity = max(min(self.reserved_quantity, self.initial_quantity), 0)
+    
+    def ledger_state(self):
+        """{field: value} of the quantities the stock ledger records changes of"""
+        return {field: getattr(self, field) for field in StockLedgerEntry.DELTA_FIELDS}
+    
+    def save(self, *args, **kwargs):
+        """Save and record the change of the ledger quantities as a 'manual' StockLedgerEntry"""
+        update_fields = kwargs.get('update_fields')
+        with transaction.atomic():
+            before = {}
+            if self.pk is not None:
+                before = StockBalance.objects.select_for_update().filter(pk=self.pk).values(
+                    *StockLedgerEntry.DELTA_FIELDS
+                ).first() or {}
+            super().save(*args, **kwargs)
+            after = {
+                field: value for field, value in self.ledger_state().items()
+                if update_fields is None or field in update_fields
+            }
+            entry = StockLedgerEntry.between(self.product_id, self.location_id, before, after, 'manual')
+            if entry is not None:
+                entry.save()
+    
+    def delete(self, *args, **kwargs):
+        """Delete and record the removal of the remaining quantities in the stock ledger"""
+        with transaction.atomic():
+            before = StockBalance.objects.select_for_update().filter(pk=self.pk).values(
+                *StockLedgerEntry.DELTA_FIELDS
+            ).first() or {}
+            result = super().delete(*args, **kwargs)
+            after = {field: 0 for field in StockLedgerEntry.DELTA_FIELDS}
+            entry = StockLedgerEntry.between(self.product_id, self.location_id, before, after, 'manual')
+            if entry is not None:
+                entry.save()
+        return result
+    
+    def lock(self):
         """
-        Consume stock following the priority: initial_quantity first, then reserved_quantity
+        Re-read this balance under a row lock. Call inside a transaction before a read-modify-write
+        so concurrent writers cannot overwrite each other's changes.
         """
-        remaining_to_consume = quantity_needed
-        
-        # First, consume from initial_quantity
-        if self.initial_quantity > 0:
-            if self.initial_quantity >= remaining_to_consume:
-                self.initial_quantity -= remaining_to_consume
-                remaining_to_consume = 0
-            else:
-                remaining_to_consume -= self.initial_quantity
-                self.initial_quantity = 0
-        
-        # Then, consume from reserved_quantity if needed
-        if remaining_to_consume > 0 and self.reserved_quantity > 0:
-            if self.reserved_quantity >= remaining_to_consume:
-                self.reserved_quantity -= remaining_to_consume
-                remaining_to_consume = 0
-            else:
-                remaining_to_consume -= self.reserved_quantity
-                self.reserved_quantity = 0
-        
-        self.save()
-        return remaining_to_consume  # Return any remaining quantity that couldn't be consumed
+        self.refresh_from_db(from_queryset=StockBalance.objects.select_for_update())
     
-    def add_stock(self, quantity_to_add, original_reserved_quantity=None):
+    def consume_stock(self, quantity_needed, commit=True):
         """
-        Add stock following the priority: fill reserved_quantity first, then initial_quantity
+        Consume on-hand stock (initial_quantity) and return the quantity that could not be consumed.
+        reserved_quantity is the part of initial_quantity held for reservations, not a separate
+        source: it is clamped to what is left on hand, and reservations it no longer covers fail to
+        commit. With commit=True the row is locked and re-read first; pass commit=False to only apply
+        the change in memory on an already locked balance (batch processing saves in bulk).
         """
-        if original_reserved_quantity is None:
-            # If no original reserved quantity specified, use current as target
-            target_reserved = self.reserved_quantity
-        else:
-            # Use the original reserved quantity as target
-            target_reserved = original_reserved_quantity
+        if commit:
+            with transaction.atomic():
+                self.lock()
+                remaining = self.consume_stock(quantity_needed, commit=False)
+                self.save()
+            return remaining
         
-        remaining_to_add = quantity_to_add
+        consumed = min(max(self.initial_quantity, 0), quantity_needed)
+        self.initial_quantity -= consumed
+        self.clamp_reserved()
         
-        # First, fill reserved_quantity up to target
-        if self.reserved_quantity < target_reserved:
-            needed_for_reserved = target_reserved - self.reserved_quantity
-            if remaining_to_add >= needed_for_reserved:
-                self.reserved_quantity = target_reserved
-                remaining_to_add -= needed_for_reserved
-            else:
-                self.reserved_quantity += remaining_to_add
-                remaining_to_add = 0
+        return quantity_needed - consumed  # Return any remaining quantity that couldn't be consumed
+    
+    def add_stock(self, quantity_to_add, original_reserved_quantity=None, commit=True):
+        """
+        Add stock to initial_quantity and, if original_reserved_quantity is given, hold up to that
+        much of the on-hand stock for reservations again.
+        With commit=True the row is locked and re-read first; pass commit=False to only apply
+        the change in memory on an already locked balance (batch processing saves in bulk).
+        """
+        if commit:
+            with transaction.atomic():
+                self.lock()
+                remaining = self.add_stock(quantity_to_add, original_reserved_quantity, commit=False)
+                self.save()
+            return remaining
         
-        # Then, add remaining to initial_quantity
-        if remaining_to_add > 0:
-            self.initial_quantity += remaining_to_add
+        self.initial_quantity += quantity_to_add
+        if original_reserved_quantity is not None and self.reserved_quantity < original_reserved_quantity:
+            self.reserved_quantity = min(original_reserved_quantity, self.initial_quantity)
         
-        self.save()
-        return remaining_to_add  # Return any remaining quantity that couldn't be added
+        return 0  # All of it is on hand now
+
+class LotBalance(BaseModel):
+    """
+    Stock of one lot at one location, maintained by movement processing from lines that carry a lot.
+    received_on is the date of the lot's first receipt at the location and orders FIFO picking.
+    """
+    lot_tracking = models.ForeignKey('LotTracking', on_delete=models.PROTECT, related_name='balances')
+    product = models.ForeignKey(Product, on_delete=models.PROTECT)
+    location = models.ForeignKey(StockLocation, on_delete=models.PROTECT)
+    quantity = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+    in_total = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+    out_total = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+    received_on = models.DateField(null=True, blank=True)
+    
+    class Meta:
+        unique_together = ['lot_tracking', 'location']
+        indexes = [
+            models.Index(fields=['product', 'location', 'received_on', 'id'], name='inv_lot_balance_fifo_idx'),
+            models.Index(fields=['product', 'received_on', 'id'], name='inv_lot_balance_prod_fifo_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Lot {self.lot_tracking_id} @ location {self.location_id}: {self.quantity}"
+
+class StockReservation(BaseModel):
+    """
+    Stock held on a balance for an order. Active reservations are counted in the balance's
+    reserved_quantity; releasing returns them to available stock and committing consumes them.
+    """
+    STATUSES = [
+        ('active', 'Active'),
+        ('released', 'Released'),
+        ('committed', 'Committed'),
+    ]
+    
+    balance = models.ForeignKey(StockBalance, on_delete=models.PROTECT, related_name='reservations')
+    quantity = models.DecimalField(max_digits=15, decimal_places=3, validators=[MinValueValidator(0)])
+    status = models.CharField(max_length=20, choices=STATUSES, default='active')
+    reference = models.CharField(max_length=100, null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['balance', 'status'], name='inv_reservation_balance_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.quantity} on balance {self.balance_id} ({self.status})"
+
+class StockLedgerEntry(BaseModel):
+    """
+    Append-only change of a StockBalance's quantities. The deltas of all entries for a product and
+    location sum to its balance, so balances can be audited and rebuilt from the ledger
+    (manage.py rebuild_balances). Entries are written in bulk and never updated, so the movement
+    and reservation an entry came from are plain references without a database constraint: deleting
+    them leaves the entry and its reference as they were.
+    """
+    SOURCES = [
+        ('opening', 'Opening Balance'),
+        ('movement', 'Stock Movement'),
+        ('reservation', 'Reservation'),
+        ('manual', 'Manual Change'),
+        ('correction', 'Correction'),
+    ]
+    # StockBalance field -> delta field
+    DELTA_FIELDS = {
+        'initial_quantity': 'initial_delta',
+        'reserved_quantity': 'reserved_delta',
+        'in_total': 'in_delta',
+        'out_total': 'out_delta',
+    }
+    
+    product = models.ForeignKey(Product, on_delete=models.PROTECT)
+    location = models.ForeignKey(StockLocation, on_delete=models.PROTECT)
+    source = models.CharField(max_length=20, choices=SOURCES)
+    movement = models.ForeignKey(
+        StockMovement, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='ledger_entries'
+    )
+    reservation = models.ForeignKey(
+        StockReservation, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True,
+        related_name='ledger_entries'
+    )
+    initial_delta = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+    reserved_delta = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+    in_delta = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+    out_delta = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Covering index (on PostgreSQL) so a location's replay is an index-only scan
+            models.Index(
+                fields=['location', 'product'],
+                include=['initial_delta', 'reserved_delta', 'in_delta', 'out_delta'],
+                name='inv_ledger_location_idx'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_source_display()} for product {self.product_id} @ location {self.location_id}"
+    
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError('Stock ledger entries cannot be changed')
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def between(cls, product_id, location_id, before, after, source, **references):
+        """
+        Unsaved entry for a balance going from before to after ({balance field: value}; fields missing
+        from before count as 0, fields missing from after did not change), or None if nothing changed
+        """
+        deltas = {
+            cls.DELTA_FIELDS[field]: value - before.get(field, 0)
+            for field, value in after.items()
+        }
+        if not any(deltas.values()):
+            return None
+        return cls(product_id=product_id, location_id=location_id, source=source, **references, **deltas)
+
+class StockAlert(BaseModel):
+    """
+    A product whose total stock is below its min_stock or above its max_stock (thresholds of 0 are
+    unset). Maintained by inventory.alerts for the products each processing run touches.
+    """
+    KINDS = [
+        ('below_min', 'Below Minimum'),
+        ('above_max', 'Above Maximum'),
+    ]
+    
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_alerts')
+    kind = models.CharField(max_length=20, choices=KINDS)
+    quantity = models.DecimalField(max_digits=15, decimal_places=3)
+    threshold = models.DecimalField(max_digits=15, decimal_places=3)
+    
+    class Meta:
+        unique_together = ['product', 'kind']
+        indexes = [
+            models.Index(fields=['kind', 'product'], name='inv_alert_kind_product_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id}: {self.get_kind_display()} ({self.quantity} vs {self.threshold})"
+
+class StockSnapshot(BaseModel):
+    """
+    Stock of a product at a location at the end of a day, built periodically so historical balances
+    only need the movements after the nearest snapshot. quantity is the net of in/out lines with
+    adjustments setting it directly; in_total/out_total are cumulative.
+    """
+    product = models.ForeignKey(Product, on_delete=models.PROTECT)
+    location = models.ForeignKey(StockLocation, on_delete=models.PROTECT)
+    date = models.DateField()
+    quantity = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+    in_total = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+    out_total = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+    
+    class Meta:
+        unique_together = ['date', 'product', 'location']
+        ordering = ['-date', 'product', 'location']
+    
+    def __str__(self):
+        return f"{self.product_id} @ {self.location_id} on {self.date}: {self.quantity}"
+
+class CurrencyRate(BaseModel):
+    """
+    Value of one unit of a currency in the base currency (settings.INVENTORY_BASE_CURRENCY_ID)
+    from date until the next rate of that currency
+    """
+    currency = models.ForeignKey(Currency, on_delete=models.PROTECT, related_name='inventory_rates')
+    date = models.DateField()
+    rate = models.DecimalField(max_digits=18, decimal_places=8, validators=[MinValueValidator(0)])
+    
+    class Meta:
+        unique_together = ['currency', 'date']
+        ordering = ['currency', '-date']
+    
+    def __str__(self):
+        return f"{self.currency_id} on {self.date}: {self.rate}"
 
 class LotTracking(BaseModel):
     product = models.ForeignKey(Product, on_delete=models.PROTECT)
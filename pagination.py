@@ -0,0 +1,109 @@
+import json
+from django.db.models import Q
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+from rest_framework.settings import api_settings
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Cursor pagination that seeks on the whole ordering key instead of skipping earlier rows,
+    so every page costs the same however deep the client walks. The cursor position holds
+    the value of every ordering field and pages continue after it with a composite keyset
+    filter, so the ordering must end in a unique field (e.g. id) and rows sharing the
+    leading value never need an OFFSET. Ordering fields may span relations
+    (e.g. product__code); those relations should be select_related.
+    """
+    page_size = api_settings.PAGE_SIZE or 50
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if current_position is not None:
+            queryset = queryset.filter(self.seek(current_position, reverse))
+
+        # Positions are unique, so offset is only non-zero for cursors issued before composite positions
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def seek(self, position, reverse):
+        """
+        Q for the rows after position in the ordering (before it for a reverse cursor):
+        for ('-date', '-id') that is date < d OR (date = d AND id < i)
+        """
+        try:
+            values = json.loads(position)
+        except ValueError:
+            values = None
+        if not isinstance(values, list):
+            # A cursor issued before positions held every ordering field only has the leading value
+            values = [position]
+        seek = Q()
+        for index, (order, value) in enumerate(zip(self.ordering, values)):
+            attr = order.lstrip('-')
+            lookup = 'lt' if order.startswith('-') != reverse else 'gt'
+            earlier = {field.lstrip('-'): earlier_value for field, earlier_value in zip(self.ordering, values[:index])}
+            seek |= Q(**earlier, **{f'{attr}__{lookup}': value})
+        return seek
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            value = instance
+            for attr in order.lstrip('-').split('__'):
+                value = value[attr] if isinstance(value, dict) else getattr(value, attr)
+            values.append(str(value))
+        return json.dumps(values, separators=(',', ':'))
+
+
+class StockMovementCursorPagination(KeysetCursorPagination):
+    ordering = ('-date', '-id')
+
+
+class StockBalanceCursorPagination(KeysetCursorPagination):
+    ordering = ('product__code', 'location_id')
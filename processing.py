@@ -0,0 +1,386 @@
+import logging
+from collections import defaultdict
+from functools import partial
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from inventory.alerts import refresh_alerts_on_commit
+from inventory.cache import bump_stock_versions
+from inventory.models import (
+    Product, StockBalance, StockMovement, StockMovementLine, StockMovementApplication, LotBalance, StockLedgerEntry
+)
+
+BALANCE_FIELDS = ['initial_quantity', 'reserved_quantity', 'in_total', 'out_total', 'updated_at']
+LOT_BALANCE_FIELDS = ['quantity', 'in_total', 'out_total', 'received_on', 'updated_at']
+BULK_BATCH_SIZE = 500
+# Products (or lots) per locking query; each adds one OR branch to its WHERE clause
+LOCK_CHUNK_SIZE = 200
+
+logger = logging.getLogger(__name__)
+
+
+def pair_conditions(pairs, first, second):
+    """
+    Yield Q objects that together match exactly the given (first, second) value pairs, e.g.
+    product_id=1 AND location_id IN (2, 3) OR product_id=4 AND location_id IN (2), covering
+    LOCK_CHUNK_SIZE first values each in ascending order
+    """
+    grouped = defaultdict(set)
+    for first_value, second_value in pairs:
+        grouped[first_value].add(second_value)
+    first_values = sorted(grouped)
+    for start in range(0, len(first_values), LOCK_CHUNK_SIZE):
+        condition = Q()
+        for first_value in first_values[start:start + LOCK_CHUNK_SIZE]:
+            condition |= Q(**{first: first_value, f'{second}__in': sorted(grouped[first_value])})
+        yield condition
+
+
+def lock_balances(keys):
+    """
+    Lock the StockBalance rows for exactly the given (product_id, location_id) keys with
+    SELECT ... FOR UPDATE, creating any missing rows first. Must run inside a transaction.
+    """
+    if not keys:
+        return {}
+
+    conditions = list(pair_conditions(keys, 'product_id', 'location_id'))
+    existing = set()
+    for condition in conditions:
+        existing.update(StockBalance.objects.filter(condition).values_list('product_id', 'location_id'))
+    missing = [
+        StockBalance(product_id=product_id, location_id=location_id, initial_quantity=0, reserved_quantity=0)
+        for product_id, location_id in sorted(keys - existing)
+    ]
+    if missing:
+        # Rows inserted concurrently by another transaction are picked up by the locking read below
+        StockBalance.objects.bulk_create(missing, batch_size=BULK_BATCH_SIZE, ignore_conflicts=True)
+
+    # Always lock in (product, location) order, chunk after chunk, so concurrent batches cannot deadlock
+    locked = {}
+    for condition in conditions:
+        for balance in StockBalance.objects.filter(condition).select_for_update().order_by('product_id', 'location_id'):
+            locked[(balance.product_id, balance.location_id)] = balance
+    return locked
+
+
+def lock_lot_balances(keys):
+    """
+    Lock the LotBalance rows for the given (lot_id, location_id, product_id) keys like lock_balances
+    """
+    if not keys:
+        return {}
+
+    conditions = list(pair_conditions(
+        {(lot_id, location_id) for lot_id, location_id, _ in keys}, 'lot_tracking_id', 'location_id'
+    ))
+    existing = set()
+    for condition in conditions:
+        existing.update(LotBalance.objects.filter(condition).values_list('lot_tracking_id', 'location_id'))
+    missing = [
+        LotBalance(lot_tracking_id=lot_id, location_id=location_id, product_id=product_id)
+        for lot_id, location_id, product_id in sorted(keys)
+        if (lot_id, location_id) not in existing
+    ]
+    if missing:
+        LotBalance.objects.bulk_create(missing, batch_size=BULK_BATCH_SIZE, ignore_conflicts=True)
+
+    locked = {}
+    for condition in conditions:
+        for balance in LotBalance.objects.filter(condition).select_for_update().order_by('lot_tracking_id', 'location_id'):
+            locked[(balance.lot_tracking_id, balance.location_id)] = balance
+    return locked
+
+
+def movement_stock_keys(movement_ids):
+    """(product_ids, location_ids) whose stock the lines of these movements touch"""
+    product_ids = set(
+        StockMovementLine.objects.filter(movement_id__in=movement_ids).values_list('product_id', flat=True).distinct()
+    )
+    location_ids = set()
+    for destination_id, source_id in StockMovement.objects.filter(pk__in=movement_ids).values_list(
+        'destination_location_id', 'source_location_id'
+    ):
+        location_ids.add(destination_id)
+        if source_id is not None:
+            location_ids.add(source_id)
+    return product_ids, location_ids
+
+
+def bump_movement_versions(movement_ids):
+    """
+    Mark the stock of the products and locations these movements touch as changed once the transaction
+    commits. Historical (as_of) stock is read from movement lines, so writing a movement or its lines
+    changes it even when no balance changes (a new date, an unprocessed or queued movement).
+    """
+    product_ids, location_ids = movement_stock_keys(movement_ids)
+    if product_ids or location_ids:
+        transaction.on_commit(partial(bump_stock_versions, product_ids, location_ids))
+
+
+def movement_legs(movement_type, destination_location_id, source_location_id=None):
+    """
+    [(location_id, effect)] every line of a movement applies: a transfer is an out at its source and
+    an in at its destination; transfers recorded without a source (before source_location) apply nothing
+    """
+    if movement_type == 'transfer':
+        if source_location_id is None:
+            return []
+        return [(source_location_id, 'out'), (destination_location_id, 'in')]
+    if movement_type in ('in', 'out', 'adjustment'):
+        return [(destination_location_id, movement_type)]
+    return []
+
+
+def adjustment_level(counts, lot_id, quantity):
+    """
+    Record one adjustment line's count in counts ({lot_id: quantity}, lot_id None for stock without a
+    lot) and return the product quantity the adjustment sets so far. Adjustments set quantities
+    directly, so the last count of each lot wins and a product's quantity is the sum over its lots.
+    """
+    counts[lot_id] = quantity
+    return sum(counts.values())
+
+
+def movement_effects(movement, lines):
+    """
+    Return {(product_id, location_id, effect, lot_id): quantity} that the movement's lines should have
+    applied. Every line applies to its product's balance (lot_id None) and, if it carries a lot, also
+    to that lot's balance.
+    """
+    effects = {}
+    adjusted = defaultdict(dict)
+    legs = movement_legs(movement.movement_type, movement.destination_location_id, movement.source_location_id)
+    for product_id, quantity, lot_id in lines:
+        for location_id, effect in legs:
+            if effect == 'adjustment':
+                level = adjustment_level(adjusted[(product_id, location_id)], lot_id, quantity)
+                effects[(product_id, location_id, effect, None)] = level
+                if lot_id is not None:
+                    effects[(product_id, location_id, effect, lot_id)] = quantity
+                continue
+            for lot in (None, lot_id) if lot_id is not None else (None,):
+                key = (product_id, location_id, effect, lot)
+                effects[key] = effects.get(key, 0) + quantity
+    return effects
+
+
+def apply_effect(balance, effect, quantity, shortfall=0):
+    """
+    Apply a (possibly negative) change of an in/out effect to a balance in memory and return the
+    effect's new shortfall: how much of the stock it should have taken was never there to consume.
+
+    The totals always move by the full change. Stock moves by what can actually be consumed, and a
+    later increase (a reduced issue, a removed line) first cancels the shortfall so it only puts back
+    stock that was really taken.
+    """
+    if effect == 'in':
+        # Inbound movements add on-hand stock; a reduced receipt takes it back out
+        balance.in_total += quantity
+        stock_change = quantity
+    elif effect == 'out':
+        # Outbound movements consume on-hand stock (never beyond it); a reduced issue puts it back
+        balance.out_total += quantity
+        stock_change = -quantity
+    else:
+        return shortfall
+
+    if stock_change < 0:
+        return shortfall + balance.consume_stock(-stock_change, commit=False)
+    restored = min(stock_change, shortfall)
+    if stock_change > restored:
+        balance.add_stock(stock_change - restored, commit=False)
+    return shortfall - restored
+
+
+def apply_lot_effect(balance, effect, quantity, day):
+    """Apply a (possibly negative) change of an effect to a lot balance in memory"""
+    if effect == 'adjustment':
+        balance.quantity = quantity
+    elif effect == 'in':
+        balance.quantity += quantity
+        balance.in_total += quantity
+        if quantity > 0 and (balance.received_on is None or day < balance.received_on):
+            balance.received_on = day
+    elif effect == 'out':
+        balance.quantity -= quantity
+        balance.out_total += quantity
+
+
+def process_movements(movements):
+    """
+    Bring stock balances in line with the current lines of the given movements as one set-based batch.
+
+    Only the difference between each movement's lines and what its StockMovementApplication rows say
+    was already applied is written, so reprocessing an unchanged movement is a cheap no-op and an
+    edited movement replays just its delta. A transfer's destination is credited with what its source
+    leg actually consumed, so a source short of stock cannot create stock. Every affected balance is loaded with one locking query,
+    updated in memory in movement order and written back with bulk_update, and each change is recorded
+    as a StockLedgerEntry with one bulk insert. Returns the updated balances.
+    """
+    requested = list(movements)
+    movement_ids = [movement.pk for movement in requested]
+    if not movement_ids:
+        return []
+
+    with transaction.atomic():
+        # Lock the movements first so concurrent retries of the same movement wait for each other
+        locked = StockMovement.objects.select_for_update().filter(pk__in=movement_ids).order_by('pk')
+        locked = {movement.pk: movement for movement in locked}
+        movements = [locked[movement_id] for movement_id in dict.fromkeys(movement_ids) if movement_id in locked]
+
+        lines_by_movement = defaultdict(list)
+        lines = (
+            StockMovementLine.objects
+            .filter(movement__in=movements)
+            .order_by('movement_id', 'id')
+            .values_list('movement_id', 'product_id', 'quantity', 'lot_tracking_id')
+        )
+        for movement_id, product_id, quantity, lot_id in lines:
+            lines_by_movement[movement_id].append((product_id, quantity, lot_id))
+
+        applied_by_movement = defaultdict(dict)
+        for application in StockMovementApplication.objects.filter(movement__in=movements):
+            key = (application.product_id, application.location_id, application.effect, application.lot_tracking_id)
+            applied_by_movement[application.movement_id][key] = application
+
+        changes, lot_changes, created, updated, removed = [], [], [], [], []
+        changed_movements = set()
+        for movement in movements:
+            desired = movement_effects(movement, lines_by_movement[movement.pk])
+            applied = applied_by_movement[movement.pk]
+            # A transfer's in leg credits only what its out leg took from the source, so it follows that leg
+            credited = [
+                key for key in desired
+                if movement.movement_type == 'transfer' and key[2] == 'in' and key[3] is None
+            ]
+            sources, changed_sources = {}, set()
+            for key in list(desired) + [key for key in applied if key not in desired]:
+                if key in credited:
+                    continue
+                product_id, location_id, effect, lot_id = key
+                application = applied.get(key)
+                is_source = movement.movement_type == 'transfer' and effect == 'out' and lot_id is None and key in desired
+                if is_source:
+                    sources[product_id] = application
+                old = application.quantity if application else 0
+                new = desired.get(key, 0)
+                if key in desired and application is not None and old == new:
+                    continue
+                changed_movements.add(movement.pk)
+
+                if key not in desired:
+                    removed.append(application.pk)
+                elif application is None:
+                    application = StockMovementApplication(
+                        movement=movement, product_id=product_id, location_id=location_id, effect=effect,
+                        lot_tracking_id=lot_id, quantity=new
+                    )
+                    created.append(application)
+                else:
+                    application.quantity = new
+                    updated.append(application)
+                if is_source:
+                    sources[product_id] = application
+                    changed_sources.add(product_id)
+
+                if effect == 'adjustment':
+                    # A removed adjustment cannot restore the quantity it replaced, so it is only forgotten
+                    change = new if key in desired else None
+                else:
+                    change = new - old
+                if change is not None and lot_id is None:
+                    changes.append((application, change, None))
+                elif change is not None:
+                    lot_changes.append((product_id, lot_id, location_id, effect, change, movement.date))
+
+            for key in credited:
+                product_id, location_id, effect, lot_id = key
+                application = applied.get(key)
+                if application is not None and product_id not in changed_sources:
+                    continue
+                changed_movements.add(movement.pk)
+                if application is None:
+                    application = StockMovementApplication(
+                        movement=movement, product_id=product_id, location_id=location_id, effect=effect, quantity=0
+                    )
+                    created.append(application)
+                else:
+                    updated.append(application)
+                # The change is known once the out leg has been applied
+                changes.append((application, None, sources[product_id]))
+
+        # Both legs of every transfer are locked by this one ordered query, so no batch can deadlock another
+        balances = lock_balances({(application.product_id, application.location_id) for application, *_ in changes})
+
+        shortfalls, entries = [], []
+        for application, quantity, source in changes:
+            product_id, location_id = application.product_id, application.location_id
+            balance = balances[(product_id, location_id)]
+            before = balance.ledger_state()
+            if source is not None:
+                consumed = source.quantity - source.shortfall
+                quantity = consumed - application.quantity
+                application.quantity = consumed
+            if application.effect == 'adjustment':
+                # For adjustments, set the initial_quantity directly
+                balance.initial_quantity = quantity
+                balance.clamp_reserved()
+            else:
+                shortfall = apply_effect(balance, application.effect, quantity, application.shortfall)
+                if shortfall > application.shortfall:
+                    shortfalls.append((product_id, shortfall - application.shortfall))
+                application.shortfall = shortfall
+            entry = StockLedgerEntry.between(
+                product_id, location_id, before, balance.ledger_state(), 'movement', movement_id=application.movement_id
+            )
+            if entry is not None:
+                entries.append(entry)
+
+        lot_balances = lock_lot_balances({(lot_id, location_id, product_id) for product_id, lot_id, location_id, *_ in lot_changes})
+        for product_id, lot_id, location_id, effect, quantity, day in lot_changes:
+            apply_lot_effect(lot_balances[(lot_id, location_id)], effect, quantity, day)
+
+        now = timezone.now()
+        for balance in balances.values():
+            balance.updated_at = now
+        StockBalance.objects.bulk_update(balances.values(), BALANCE_FIELDS, batch_size=BULK_BATCH_SIZE)
+        StockLedgerEntry.objects.bulk_create(entries, batch_size=BULK_BATCH_SIZE)
+        for balance in lot_balances.values():
+            balance.updated_at = now
+        LotBalance.objects.bulk_update(lot_balances.values(), LOT_BALANCE_FIELDS, batch_size=BULK_BATCH_SIZE)
+        if balances:
+            refresh_alerts_on_commit({product_id for product_id, _ in balances})
+            # Conditional GETs on balance views see the change once it is committed
+            transaction.on_commit(partial(
+                bump_stock_versions,
+                {product_id for product_id, _ in balances},
+                {location_id for _, location_id in balances}
+            ))
+
+        StockMovementApplication.objects.filter(pk__in=removed).delete()
+        StockMovementApplication.objects.bulk_create(created, batch_size=BULK_BATCH_SIZE)
+        for application in updated:
+            application.updated_at = now
+        StockMovementApplication.objects.bulk_update(updated, ['quantity', 'shortfall', 'updated_at'], batch_size=BULK_BATCH_SIZE)
+
+        processed = {movement.pk for movement in movements if movement.pk in changed_movements or movement.processed_at is None}
+        StockMovement.objects.filter(pk__in=processed).update(processed_at=now, processing_status='processed')
+        settled = {movement.pk for movement in movements if movement.processing_status != 'processed'} - processed
+        if settled:
+            StockMovement.objects.filter(pk__in=settled).update(processing_status='processed')
+        for movement in requested:
+            if movement.pk in processed:
+                movement.processed_at = now
+            if movement.pk in processed or movement.pk in settled:
+                movement.processing_status = 'processed'
+
+    if shortfalls and logger.isEnabledFor(logging.WARNING):
+        codes = dict(Product.objects.filter(id__in={product_id for product_id, _ in shortfalls}).values_list('id', 'code'))
+        for product_id, remaining in shortfalls:
+            logger.warning(
+                'Could not fulfill %s units for %s', remaining, codes[product_id],
+                extra={'product': product_id, 'shortfall': remaining}
+            )
+
+    return list(balances.values())
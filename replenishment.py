@@ -0,0 +1,50 @@
+from datetime import timedelta
+from decimal import Decimal, ROUND_CEILING
+from django.db.models import Sum
+from inventory.models import Product, StockBalance, StockMovementLine
+
+QUANTITY = Decimal('0.001')
+PLAN_FIELDS = [
+    'warehouse', 'product', 'product_code', 'on_hand', 'reserved', 'daily_outbound',
+    'reorder_point', 'target', 'suggested_quantity'
+]
+
+
+def plan_warehouse(warehouse_id, as_of, days, lead_time):
+    """
+    Suggested inbound quantities for one warehouse, sorted by product code.
+
+    Outbound velocity is the out-movement quantity of the last `days` days up to as_of per day. A
+    product is reordered when its unreserved stock falls to its reorder point (min_stock plus the
+    expected outbound over `lead_time` days), up to max_stock or the reorder point if that is higher.
+    """
+    stock = {
+        row['product_id']: (row['on_hand'], row['reserved'])
+        for row in StockBalance.objects.filter(location__warehouse_id=warehouse_id)
+        .values('product_id').annotate(on_hand=Sum('initial_quantity'), reserved=Sum('reserved_quantity')).order_by()
+    }
+    outbound = dict(
+        StockMovementLine.objects.filter(
+            movement__movement_type='out',
+            movement__destination_location__warehouse_id=warehouse_id,
+            movement__date__gt=as_of - timedelta(days=days),
+            movement__date__lte=as_of,
+        ).values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total').order_by()
+    )
+
+    rows = []
+    products = Product.objects.filter(pk__in=set(stock) | set(outbound)).values_list('id', 'code', 'min_stock', 'max_stock')
+    for product_id, code, min_stock, max_stock in products.order_by('code'):
+        on_hand, reserved = stock.get(product_id, (Decimal(0), Decimal(0)))
+        daily = (outbound.get(product_id, Decimal(0)) / days).quantize(QUANTITY)
+        reorder_point = min_stock + daily * lead_time
+        available = on_hand - reserved
+        if reorder_point <= 0 or available > reorder_point:
+            continue
+        target = max(max_stock, reorder_point)
+        rows.append([
+            warehouse_id, product_id, code, on_hand.quantize(QUANTITY), reserved.quantize(QUANTITY), daily,
+            reorder_point.quantize(QUANTITY), target.quantize(QUANTITY),
+            (target - available).quantize(QUANTITY, rounding=ROUND_CEILING)
+        ])
+    return rows
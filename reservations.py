@@ -0,0 +1,86 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from inventory.alerts import refresh_alerts_on_commit
+from inventory.cache import bump_stock_versions
+from inventory.models import StockBalance, StockReservation, StockLedgerEntry
+
+
+class InsufficientStockError(ValueError):
+    pass
+
+
+class ReservationStateError(ValueError):
+    pass
+
+
+def reserve(balance, quantity, reference=None):
+    """
+    Hold quantity of a balance's available stock and return the new StockReservation.
+
+    The availability check and the increment are one conditional UPDATE (on-hand stock not already
+    reserved must cover the quantity), so concurrent reservations can never oversell and none of them
+    reads the row first. initial_quantity already includes processed movements, so in_total and
+    out_total do not enter the check. Raises InsufficientStockError if it does not fit.
+    """
+    with transaction.atomic():
+        reserved = StockBalance.objects.filter(
+            pk=balance.pk, initial_quantity__gte=F('reserved_quantity') + quantity
+        ).update(reserved_quantity=F('reserved_quantity') + quantity, updated_at=timezone.now())
+        if not reserved:
+            raise InsufficientStockError(f'Not enough available stock to reserve {quantity}')
+        reservation = StockReservation.objects.create(balance=balance, quantity=quantity, reference=reference)
+        record_change(reservation, balance, {'reserved_quantity': quantity})
+        stock_changed(balance)
+    return reservation
+
+
+def release(reservation):
+    """Return an active reservation's quantity to available stock"""
+    return settle(reservation, 'released', reserved_quantity=-reservation.quantity)
+
+
+def commit(reservation):
+    """Consume an active reservation: the held quantity leaves both reserved and on-hand stock"""
+    return settle(reservation, 'committed', reserved_quantity=-reservation.quantity, initial_quantity=-reservation.quantity)
+
+
+def settle(reservation, status, **deltas):
+    """
+    Move an active reservation to status and add deltas ({field: change}) to its balance. The status
+    change is conditional on the reservation still being active, so a reservation can only be
+    released or committed once however many requests race for it. The balance update is conditional
+    on every decreased field still covering its decrease, so settling never drives a quantity negative:
+    if outbound movements consumed the held stock meanwhile, InsufficientStockError is raised and the
+    reservation stays active.
+    """
+    with transaction.atomic():
+        settled = StockReservation.objects.filter(pk=reservation.pk, status='active').update(
+            status=status, updated_at=timezone.now()
+        )
+        if not settled:
+            raise ReservationStateError(f'Reservation {reservation.pk} is no longer active')
+        covered = {f'{field}__gte': -delta for field, delta in deltas.items() if delta < 0}
+        updated = StockBalance.objects.filter(pk=reservation.balance_id, **covered).update(
+            updated_at=timezone.now(), **{field: F(field) + delta for field, delta in deltas.items()}
+        )
+        if not updated:
+            raise InsufficientStockError(f'Stock held by reservation {reservation.pk} is no longer on hand')
+        record_change(reservation, reservation.balance, deltas)
+        if 'initial_quantity' in deltas:
+            refresh_alerts_on_commit([reservation.balance.product_id])
+        stock_changed(reservation.balance)
+    reservation.status = status
+    return reservation
+
+
+def record_change(reservation, balance, deltas):
+    """Write the balance change a reservation made to the stock ledger"""
+    StockLedgerEntry.objects.create(
+        product_id=balance.product_id, location_id=balance.location_id, source='reservation', reservation=reservation,
+        **{StockLedgerEntry.DELTA_FIELDS[field]: delta for field, delta in deltas.items()}
+    )
+
+
+def stock_changed(balance):
+    transaction.on_commit(lambda: bump_stock_versions([balance.product_id], [balance.location_id]))
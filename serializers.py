@@ -1,101 +1,314 @@
+import logging
+from decimal import Decimal
 from rest_framework import serializers
 from inventory.models import (
     Product, Warehouse, StockLocation,
-    StockMovement, StockMovementLine, StockBalance, LotTracking
+    StockMovement, StockMovementLine, StockBalance, LotTracking, StockReservation, LotBalance
 )
 from core.serializers import UnitOfMeasureSerializer, CurrencySerializer, CompanySerializer
 from hr.serializers import EmployeeSerializer
 from finance.serializers import JournalSerializer
+from inventory.cache import get_serialized_reference
+from inventory.instrumentation import timed_serialization
+from inventory.processing import bump_movement_versions
 
-class ProductSerializer(serializers.ModelSerializer):
+logger = logging.getLogger(__name__)
+
+DETAILS_SUFFIX = '_details'
+
+
+def expand_paths(request):
+    """
+    Dotted paths requested with ?expand=, e.g. ?expand=lines.product,destination_location.
+    The _details suffix is optional and every parent of a requested path is included.
+    """
+    if request is None:
+        return set()
+    expand = set()
+    for path in request.query_params.get('expand', '').split(','):
+        parts = [part.strip().removesuffix(DETAILS_SUFFIX) for part in path.split('.') if part.strip()]
+        expand.update('.'.join(parts[:depth]) for depth in range(1, len(parts) + 1))
+    return expand
+
+
+def is_expanded(request, path):
+    """Whether ?expand= asks for path (or anything nested below it)"""
+    expand = expand_paths(request)
+    return '*' in expand or path in expand
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    """List serializer timing the serialization of the whole list once, when its .data is read"""
+    
+    @property
+    def data(self):
+        with timed_serialization():
+            return super().data
+
+
+class ExpandableFieldsMixin:
+    """
+    Serializers return flat ids by default: nested *_details fields are only included when
+    requested with ?expand= as dotted paths from the top-level serializer (?expand=lines.product,
+    ?expand=* for everything). ?fields= limits the top-level output to the listed fields.
+    """
+    
+    def get_expand(self):
+        if 'expand' in self.context:
+            return set(self.context['expand'])
+        return expand_paths(self.context.get('request'))
+    
+    def get_expand_prefix(self):
+        names = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                names.append(node.field_name.removesuffix(DETAILS_SUFFIX))
+            node = node.parent
+        return ''.join(f'{name}.' for name in reversed(names))
+    
+    def is_root(self):
+        return self.parent is None or (isinstance(self.parent, serializers.ListSerializer) and self.parent.parent is None)
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        expand = self.get_expand()
+        if '*' in expand:
+            return fields
+        prefix = self.get_expand_prefix()
+        for name in [name for name in fields if name.endswith(DETAILS_SUFFIX)]:
+            if prefix + name.removesuffix(DETAILS_SUFFIX) not in expand:
+                del fields[name]
+        return fields
+    
+    @property
+    def data(self):
+        # Serialization is timed once per response; nested and listed objects run inside this
+        # (or TimedListSerializer.data), so they are not timed one by one
+        with timed_serialization():
+            return super().data
+    
+    @property
+    def _readable_fields(self):
+        request = self.context.get('request')
+        value = request.query_params.get('fields') if request is not None and self.is_root() else None
+        only = {name.strip() for name in value.split(',')} if value else None
+        for field in super()._readable_fields:
+            if only is None or field.field_name in only:
+                yield field
+
+class CachedReferenceField(serializers.Field):
+    """
+    Read-only nested representation of a reference object served by primary key from the inventory
+    cache, so list rows neither load nor re-serialize the same warehouse or location
+    """
+    
+    def __init__(self, serializer_class, **kwargs):
+        self.serializer_class = serializer_class
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+    
+    def to_representation(self, pk):
+        path = self.parent.get_expand_prefix() + self.field_name.removesuffix(DETAILS_SUFFIX)
+        expand = self.parent.get_expand()
+        if '*' in expand:
+            nested = {'*'}
+        else:
+            nested = {requested[len(path) + 1:] for requested in expand if requested.startswith(path + '.')}
+        return get_serialized_reference(self.serializer_class, pk, nested)
+
+class ProductSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     company_details = CompanySerializer(source='company', read_only=True)
     stock_balance = serializers.SerializerMethodField()
     category_display = serializers.CharField(source='get_category_display', read_only=True)
     
     class Meta:
+        list_serializer_class = TimedListSerializer
         model = Product
         fields = '__all__'
     
     def get_stock_balance(self, obj):
-        balances = StockBalance.objects.filter(product=obj)
+        if hasattr(obj, 'total_quantity'):
+            # Annotated by Product.objects.with_stock_totals() on ProductViewSet querysets
+            return {
+                'total_quantity': obj.total_quantity,
+                'total_reserved': obj.total_reserved
+            }
+        # Nested and single-object use: served from the prefetch cache when the queryset prefetches stockbalance_set
+        balances = obj.stockbalance_set.all()
         return {
             'total_quantity': sum(b.initial_quantity for b in balances),
             'total_reserved': sum(b.reserved_quantity for b in balances)
         }
 
-class WarehouseSerializer(serializers.ModelSerializer):
+class WarehouseSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     class Meta:
+        list_serializer_class = TimedListSerializer
         model = Warehouse
         fields = ['id', 'name', 'created_at', 'updated_at']
 
-class StockLocationSerializer(serializers.ModelSerializer):
-    warehouse_details = WarehouseSerializer(source='warehouse', read_only=True)
+class StockLocationSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    warehouse_details = CachedReferenceField(WarehouseSerializer, source='warehouse_id')
     
     class Meta:
+        list_serializer_class = TimedListSerializer
         model = StockLocation
         fields = '__all__'
 
-class LotTrackingSerializer(serializers.ModelSerializer):
+class LotTrackingSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     product_details = ProductSerializer(source='product', read_only=True)
     
     class Meta:
+        list_serializer_class = TimedListSerializer
         model = LotTracking
         fields = '__all__'
 
-class StockMovementLineSerializer(serializers.ModelSerializer):
+class LotBalanceSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    location_details = CachedReferenceField(StockLocationSerializer, source='location_id')
+    
+    class Meta:
+        list_serializer_class = TimedListSerializer
+        model = LotBalance
+        fields = '__all__'
+
+class LotPickRequestSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.DecimalField(max_digits=15, decimal_places=3, min_value=Decimal('0.001'))
+    location = serializers.IntegerField(required=False)
+
+def transfer_location_errors(movement_type, source_location, destination_location):
+    """Field errors for the source location of a movement; only transfers have one, and it must differ from the destination"""
+    if movement_type != 'transfer':
+        if source_location is not None:
+            return {'source_location': ['Only transfers have a source location.']}
+        return {}
+    if source_location is None:
+        return {'source_location': ['A transfer requires a source location.']}
+    if source_location == destination_location:
+        return {'source_location': ['The source and destination locations must differ.']}
+    return {}
+
+class StockMovementLineSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     product_details = ProductSerializer(source='product', read_only=True)
     currency_details = CurrencySerializer(source='currency', read_only=True)
     lot_tracking_details = LotTrackingSerializer(source='lot_tracking', read_only=True)
     
     class Meta:
+        list_serializer_class = TimedListSerializer
         model = StockMovementLine
         fields = ['id', 'product', 'quantity', 'unit_cost', 'currency', 'lot_tracking', 'product_details', 'currency_details', 'lot_tracking_details', 'created_at', 'updated_at']
 
-class StockMovementSerializer(serializers.ModelSerializer):
+class StockMovementSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     lines = StockMovementLineSerializer(many=True, required=False)
-    destination_location_details = StockLocationSerializer(source='destination_location', read_only=True)
+    destination_location_details = CachedReferenceField(StockLocationSerializer, source='destination_location_id')
+    source_location_details = CachedReferenceField(StockLocationSerializer, source='source_location_id')
     performed_by_details = EmployeeSerializer(source='performed_by', read_only=True)
     
     class Meta:
+        list_serializer_class = TimedListSerializer
         model = StockMovement
-        fields = ['id', 'reference', 'movement_type', 'date', 'destination_location', 'notes', 'lines', 'destination_location_details', 'performed_by_details', 'created_at', 'updated_at']
+        fields = ['id', 'reference', 'movement_type', 'date', 'source_location', 'destination_location', 'notes', 'lines', 'source_location_details', 'destination_location_details', 'performed_by_details', 'processing_status', 'processed_at', 'created_at', 'updated_at']
+        read_only_fields = ['processing_status', 'processed_at']
+    
+    def validate(self, attrs):
+        instance = self.instance
+        movement_type = attrs.get('movement_type', instance.movement_type if instance else None)
+        source = attrs.get('source_location', instance.source_location if instance else None)
+        destination = attrs.get('destination_location', instance.destination_location if instance else None)
+        errors = transfer_location_errors(movement_type, source, destination)
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
     
     def create(self, validated_data):
-        print(f"Creating movement with data: {validated_data}")
         lines_data = validated_data.pop('lines', [])
-        print(f"Lines data for create: {lines_data}")
+        logger.debug(
+            'Creating movement %s with %d lines', validated_data.get('reference'), len(lines_data),
+            extra={'movement_data': validated_data, 'lines_data': lines_data}
+        )
         
         movement = StockMovement.objects.create(**validated_data)
         
+        lines = []
         for line_data in lines_data:
-            print(f"Creating line with data: {line_data}")
-            StockMovementLine.objects.create(movement=movement, **line_data)
+            lines.append(StockMovementLine(movement=movement, **line_data))
+        StockMovementLine.objects.bulk_create(lines)
+        bump_movement_versions([movement.pk])
         
         return movement
     
     def update(self, instance, validated_data):
-        print(f"Updating movement {instance.id} with data: {validated_data}")
-        lines_data = validated_data.pop('lines', [])
-        print(f"Lines data: {lines_data}")
+        # A partial update without lines keeps the movement's lines as they are
+        lines_data = validated_data.pop('lines', None)
+        logger.debug(
+            'Updating movement %s with %s lines', instance.id, 'unchanged' if lines_data is None else len(lines_data),
+            extra={'movement': instance.id, 'movement_data': validated_data, 'lines_data': lines_data}
+        )
         
+        # Historical stock changes both where the movement applied before and where it applies now
+        bump_movement_versions([instance.pk])
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
         
-        instance.lines.all().delete()
-        for line_data in lines_data:
-            print(f"Creating line with data: {line_data}")
-            StockMovementLine.objects.create(movement=instance, **line_data)
+        if lines_data is not None:
+            instance.lines.all().delete()
+            lines = []
+            for line_data in lines_data:
+                lines.append(StockMovementLine(movement=instance, **line_data))
+            StockMovementLine.objects.bulk_create(lines)
+        bump_movement_versions([instance.pk])
         
         return instance
 
-class StockBalanceSerializer(serializers.ModelSerializer):
+class StockMovementImportLineSerializer(serializers.Serializer):
+    """Line of a bulk import row; related objects are plain ids checked per chunk by the importer"""
+    product = serializers.IntegerField()
+    quantity = serializers.DecimalField(max_digits=15, decimal_places=3, min_value=0)
+    unit_cost = serializers.DecimalField(max_digits=15, decimal_places=2, min_value=0)
+    currency = serializers.IntegerField()
+    lot_tracking = serializers.IntegerField(required=False, allow_null=True)
+
+class StockMovementImportSerializer(serializers.Serializer):
+    """Movement row of a bulk import, validated without per-row database lookups"""
+    reference = serializers.CharField(max_length=50)
+    movement_type = serializers.ChoiceField(choices=StockMovement.MOVEMENT_TYPES)
+    date = serializers.DateField()
+    source_location = serializers.IntegerField(required=False, allow_null=True)
+    destination_location = serializers.IntegerField()
+    notes = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+    lines = StockMovementImportLineSerializer(many=True, required=False)
+
+    def validate(self, attrs):
+        errors = transfer_location_errors(
+            attrs['movement_type'], attrs.get('source_location'), attrs['destination_location']
+        )
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
+
+class StockBalanceSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     product_details = ProductSerializer(source='product', read_only=True)
-    location_details = StockLocationSerializer(source='location', read_only=True)
+    location_details = CachedReferenceField(StockLocationSerializer, source='location_id')
     available_stock = serializers.ReadOnlyField()
     total_in = serializers.ReadOnlyField()
     total_out = serializers.ReadOnlyField()
     
     class Meta:
+        list_serializer_class = TimedListSerializer
         model = StockBalance
         fields = '__all__'
+
+class StockReservationSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        list_serializer_class = TimedListSerializer
+        model = StockReservation
+        fields = ['id', 'balance', 'quantity', 'status', 'reference', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+class StockReservationRequestSerializer(serializers.Serializer):
+    quantity = serializers.DecimalField(max_digits=15, decimal_places=3, min_value=Decimal('0.001'))
+    reference = serializers.CharField(max_length=100, required=False, allow_null=True, allow_blank=True)
+
+class StockReservationActionSerializer(serializers.Serializer):
+    reservation = serializers.IntegerField()
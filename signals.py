@@ -0,0 +1,40 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from inventory.alerts import refresh_alerts, refresh_alerts_on_commit
+from inventory.cache import bump_generation, bump_stock_versions
+from inventory.models import Product, Warehouse, StockLocation, StockBalance, StockMovement, CurrencyRate
+from inventory.processing import bump_movement_versions
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=StockLocation)
+@receiver([post_save, post_delete], sender=CurrencyRate)
+def invalidate_reference_cache(sender, **kwargs):
+    bump_generation(sender)
+
+
+@receiver([post_save, post_delete], sender=Warehouse)
+def invalidate_warehouse_cache(sender, **kwargs):
+    # Locations embed their warehouse in both __str__ and their serialized form
+    bump_generation(Warehouse)
+    bump_generation(StockLocation)
+
+
+@receiver([post_save, post_delete], sender=StockBalance)
+def invalidate_stock_versions(sender, instance, **kwargs):
+    # Balances written in bulk by movement processing bump their versions explicitly
+    transaction.on_commit(lambda: bump_stock_versions([instance.product_id], [instance.location_id]))
+    refresh_alerts_on_commit([instance.product_id])
+
+
+@receiver(pre_delete, sender=StockMovement)
+def invalidate_movement_stock_versions(sender, instance, **kwargs):
+    # Historical stock is read from movement lines, which are still there before the delete
+    bump_movement_versions([instance.pk])
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_alerts(sender, instance, **kwargs):
+    # min_stock/max_stock may have changed
+    refresh_alerts([instance.pk])
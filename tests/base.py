@@ -0,0 +1,70 @@
+from datetime import date
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+from core.models.models import Company, Currency
+from hr.models import Employee
+from inventory.cache import get_cache
+from inventory.models import Product, Warehouse, StockLocation, StockMovement, StockMovementLine, StockBalance
+
+
+class InventoryTestCase(TestCase):
+    """Company, currency, employee, a superuser, one warehouse with two locations and three products"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Test company')
+        cls.currency = Currency.objects.create(code='EUR')
+        cls.employee = Employee.objects.create(employee_code='tester')
+        cls.user = get_user_model().objects.create_superuser('tester', 'tester@example.com', 'secret')
+        cls.warehouse = Warehouse.objects.create(name='Main')
+        cls.location = StockLocation.objects.create(name='A1', warehouse=cls.warehouse)
+        cls.other_location = StockLocation.objects.create(name='B1', warehouse=cls.warehouse)
+        cls.products = [
+            Product.objects.create(name=f'Product {index}', code=f'P{index}', company=cls.company)
+            for index in range(3)
+        ]
+        cls.product = cls.products[0]
+
+    def setUp(self):
+        # Reference data and stock versions live in the cache, which outlives each test's transaction
+        get_cache().clear()
+        self.references = 0
+
+    def movement(self, movement_type, lines, location=None, day=date(2026, 1, 1), **kwargs):
+        """Unprocessed movement with (product, quantity) or (product, quantity, lot) lines"""
+        self.references += 1
+        movement = StockMovement.objects.create(
+            reference=f'M{self.references}', movement_type=movement_type, date=day,
+            destination_location=location or self.location, performed_by=self.employee, **kwargs
+        )
+        for product, quantity, *lot in lines:
+            StockMovementLine.objects.create(
+                movement=movement, product=product, quantity=Decimal(quantity), unit_cost=Decimal('2'),
+                currency=self.currency, lot_tracking=lot[0] if lot else None
+            )
+        return movement
+
+    def balance(self, product=None, location=None):
+        return StockBalance.objects.get(product=product or self.product, location=location or self.location)
+
+    def get(self, view, path, **kwargs):
+        """Rendered response of a viewset view for a GET of path as the superuser"""
+        return self.request(view, APIRequestFactory().get(path), **kwargs)
+
+    def post(self, view, path, data, **kwargs):
+        """Rendered response of a viewset view for a JSON POST of data to path as the superuser"""
+        return self.request(view, APIRequestFactory().post(path, data, format='json'), **kwargs)
+
+    def patch(self, view, path, data, **kwargs):
+        """Rendered response of a viewset view for a JSON PATCH of data to path as the superuser"""
+        return self.request(view, APIRequestFactory().patch(path, data, format='json'), **kwargs)
+
+    def request(self, view, request, **kwargs):
+        force_authenticate(request, user=self.user)
+        response = view(request, **kwargs)
+        if hasattr(response, 'render'):
+            # 304 Not Modified answers are plain Django responses
+            response.render()
+        return response
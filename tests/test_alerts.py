@@ -0,0 +1,45 @@
+from decimal import Decimal
+from unittest import mock
+from inventory import alerts
+from inventory.models import Product, StockAlert
+from inventory.processing import process_movements
+from inventory.tests.base import InventoryTestCase
+
+
+class RefreshAlertsTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        Product.objects.filter(pk=self.product.pk).update(min_stock=5)
+
+    def test_creates_alert_below_minimum(self):
+        self.assertEqual(alerts.refresh_alerts([self.product.pk]), (1, 0, 0))
+
+        alert = StockAlert.objects.get()
+        self.assertEqual((alert.kind, alert.quantity, alert.threshold), ('below_min', 0, Decimal('5')))
+
+    def test_alert_inserted_concurrently_is_overwritten(self):
+        desired_alerts = alerts.desired_alerts
+
+        def racing_desired_alerts(product_ids):
+            # Another refresh inserts the alert after this one has looked for existing rows
+            desired = desired_alerts(product_ids)
+            StockAlert.objects.create(product=self.product, kind='below_min', quantity=1, threshold=1)
+            return desired
+
+        unseen = StockAlert.objects.none()
+        with mock.patch.object(alerts, 'desired_alerts', racing_desired_alerts), \
+                mock.patch.object(StockAlert.objects, 'filter', return_value=unseen):
+            alerts.refresh_alerts([self.product.pk])
+
+        alert = StockAlert.objects.get()
+        self.assertEqual((alert.quantity, alert.threshold), (0, Decimal('5')))
+
+    def test_processing_refreshes_alerts_after_commit(self):
+        alerts.refresh_alerts([self.product.pk])
+        with self.captureOnCommitCallbacks() as callbacks:
+            process_movements([self.movement('in', [(self.product, 3)])])
+        self.assertEqual(StockAlert.objects.get().quantity, 0)
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(StockAlert.objects.get().quantity, 3)
@@ -0,0 +1,90 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from inventory.models import StockBalance, StockMovement
+from inventory.processing import process_movements
+from inventory.tests.base import InventoryTestCase
+from inventory.views import ProductViewSet, StockBalanceViewSet, StockMovementViewSet
+
+
+class ListQueryCountTests(InventoryTestCase):
+    """List pages cost a fixed number of queries however many rows they show"""
+
+    products_list = staticmethod(ProductViewSet.as_view({'get': 'list'}))
+    balances_list = staticmethod(StockBalanceViewSet.as_view({'get': 'list'}))
+    movements_list = staticmethod(StockMovementViewSet.as_view({'get': 'list'}))
+    stock_status = staticmethod(ProductViewSet.as_view({'get': 'stock_status'}))
+
+    def add_stock(self, count):
+        process_movements([
+            self.movement('in', [(product, 5) for product in self.products], location=location)
+            for location in [self.location, self.other_location] * count
+        ])
+
+    def assert_list_queries(self, queries, view, path):
+        self.add_stock(1)
+        # Expanded warehouses and locations come from the reference cache once it is warm
+        self.get(view, path)
+        with self.assertNumQueries(queries):
+            self.assertEqual(self.get(view, path).status_code, 200)
+        self.add_stock(3)
+        with self.assertNumQueries(queries):
+            self.assertEqual(self.get(view, path).status_code, 200)
+
+    def test_products_list(self):
+        self.assert_list_queries(2, self.products_list, '/products/')
+
+    def test_products_list_expanded(self):
+        self.assert_list_queries(2, self.products_list, '/products/?expand=*')
+
+    def test_balances_list(self):
+        self.assert_list_queries(1, self.balances_list, '/balances/')
+
+    def test_balances_list_expanded(self):
+        self.assert_list_queries(2, self.balances_list, '/balances/?expand=*')
+
+    def test_movements_list(self):
+        self.assert_list_queries(2, self.movements_list, '/movements/')
+
+    def test_movements_list_expanded(self):
+        self.assert_list_queries(3, self.movements_list, '/movements/?expand=*')
+
+    def test_stock_status(self):
+        self.add_stock(2)
+        with self.assertNumQueries(3):
+            response = self.get(self.stock_status, f'/products/{self.product.pk}/stock_status/', pk=self.product.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['locations']), 2)
+
+    def test_movements_list_pages_through_every_movement(self):
+        self.add_stock(30)
+        seen, path = [], '/movements/?page_size=7'
+        while path:
+            response = self.get(self.movements_list, path)
+            seen += [movement['id'] for movement in response.data['results']]
+            path = response.data['next']
+        self.assertEqual(seen, list(StockMovement.objects.order_by('-date', '-id').values_list('id', flat=True)))
+
+    def test_movement_pages_seek_past_rows_sharing_a_date(self):
+        self.add_stock(10)
+        first = self.get(self.movements_list, '/movements/?page_size=7')
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.get(self.movements_list, first.data['next'])
+        self.assertNotIn('OFFSET', queries[0]['sql'])
+
+        back = self.get(self.movements_list, second.data['previous'])
+        self.assertEqual(
+            [movement['id'] for movement in back.data['results']],
+            [movement['id'] for movement in first.data['results']]
+        )
+
+    def test_balance_pages_walk_every_balance(self):
+        self.add_stock(1)
+        seen, path = [], '/balances/?page_size=2'
+        while path:
+            response = self.get(self.balances_list, path)
+            seen += [balance['id'] for balance in response.data['results']]
+            path = response.data['next']
+        self.assertEqual(seen, list(
+            StockBalance.objects.order_by('product__code', 'location_id').values_list('id', flat=True)
+        ))
@@ -0,0 +1,42 @@
+from inventory.cache import get_reference, get_serialized_reference
+from inventory.models import StockLocation, Warehouse
+from inventory.serializers import StockLocationSerializer
+from inventory.tests.base import InventoryTestCase
+
+
+class ReferenceCacheTests(InventoryTestCase):
+    """Reference data is read through the cache and invalidated per model when it is written"""
+
+    def test_references_are_read_once(self):
+        self.assertEqual(get_reference(StockLocation, self.location.pk).name, 'A1')
+        self.assertEqual(str(StockLocation(name='X', warehouse_id=self.warehouse.pk)), 'Main - X')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_reference(StockLocation, self.location.pk).name, 'A1')
+            self.assertEqual(str(StockLocation(name='Y', warehouse_id=self.warehouse.pk)), 'Main - Y')
+
+    def test_missing_references_are_none(self):
+        self.assertIsNone(get_reference(StockLocation, 0))
+        self.assertIsNone(get_serialized_reference(StockLocationSerializer, 0))
+
+    def test_saving_a_location_invalidates_it(self):
+        get_serialized_reference(StockLocationSerializer, self.location.pk)
+        self.location.name = 'A2'
+        self.location.save()
+
+        self.assertEqual(get_serialized_reference(StockLocationSerializer, self.location.pk)['name'], 'A2')
+
+    def test_saving_a_warehouse_invalidates_locations_that_embed_it(self):
+        expanded = get_serialized_reference(StockLocationSerializer, self.location.pk, {'warehouse'})
+        self.assertEqual(expanded['warehouse_details']['name'], 'Main')
+        self.warehouse.name = 'Central'
+        self.warehouse.save()
+
+        expanded = get_serialized_reference(StockLocationSerializer, self.location.pk, {'warehouse'})
+        self.assertEqual(expanded['warehouse_details']['name'], 'Central')
+        self.assertEqual(str(StockLocation.objects.get(pk=self.location.pk)), 'Central - A1')
+
+    def test_expansions_are_cached_separately(self):
+        flat = get_serialized_reference(StockLocationSerializer, self.location.pk)
+        expanded = get_serialized_reference(StockLocationSerializer, self.location.pk, {'warehouse'})
+        self.assertNotIn('warehouse_details', flat)
+        self.assertIn('warehouse_details', expanded)
@@ -0,0 +1,43 @@
+import io
+from decimal import Decimal
+from django.core.management import call_command
+from inventory.models import StockBalance, StockLedgerEntry, StockMovement
+from inventory.processing import process_movements
+from inventory.tests.base import InventoryTestCase
+
+
+class RebuildStockTotalsTests(InventoryTestCase):
+    def test_rebuilds_applied_totals_only(self):
+        process_movements([
+            self.movement('in', [(self.product, 10)]),
+            self.movement('transfer', [(self.product, 4)], location=self.other_location, source_location=self.location),
+        ])
+        self.movement('out', [(self.product, 3)], processing_status='queued')
+        StockBalance.objects.update(in_total=0, out_total=0)
+
+        call_command('rebuild_stock_totals', stdout=io.StringIO())
+
+        balance = self.balance()
+        self.assertEqual((balance.in_total, balance.out_total), (Decimal('10'), Decimal('4')))
+        other = self.balance(location=self.other_location)
+        self.assertEqual((other.in_total, other.out_total), (Decimal('4'), 0))
+
+
+class BenchmarkInventoryTests(InventoryTestCase):
+    def test_repeated_runs_leave_the_dataset_unchanged(self):
+        options = {
+            'products': 4, 'locations': 2, 'lines': 20, 'lines_per_movement': 2, 'iterations': 2, 'warmup': 1,
+            'stdout': io.StringIO(),
+        }
+        call_command('benchmark_inventory', **options)
+        state = (
+            StockMovement.objects.count(), StockLedgerEntry.objects.count(),
+            sorted(StockBalance.objects.values_list('id', 'initial_quantity', 'in_total', 'out_total'))
+        )
+
+        call_command('benchmark_inventory', **options)
+
+        self.assertEqual((
+            StockMovement.objects.count(), StockLedgerEntry.objects.count(),
+            sorted(StockBalance.objects.values_list('id', 'initial_quantity', 'in_total', 'out_total'))
+        ), state)
@@ -0,0 +1,52 @@
+from datetime import date
+from decimal import Decimal
+from rest_framework.test import APIRequestFactory
+from inventory.processing import process_movements
+from inventory.serializers import StockMovementSerializer
+from inventory.tests.base import InventoryTestCase
+from inventory.views import ProductViewSet
+
+
+class HistoricalStockVersionTests(InventoryTestCase):
+    """as_of answers are read from movement lines, so movement writes must change their ETag"""
+
+    stock_status = staticmethod(ProductViewSet.as_view({'get': 'stock_status'}))
+
+    def setUp(self):
+        super().setUp()
+        process_movements([self.movement('in', [(self.product, 10)])])
+        self.path = f'/products/{self.product.pk}/stock_status/?as_of=2026-02-01'
+        self.etag = self.get(self.stock_status, self.path, pk=self.product.pk)['ETag']
+
+    def revalidate(self):
+        request = APIRequestFactory().get(self.path, HTTP_IF_NONE_MATCH=self.etag)
+        return self.request(self.stock_status, request, pk=self.product.pk)
+
+    def save_movement(self, instance=None, day='2026-01-15'):
+        serializer = StockMovementSerializer(instance, data={
+            'reference': instance.reference if instance else 'NEW', 'movement_type': 'in', 'date': day,
+            'destination_location': self.location.pk,
+            'lines': [{'product': self.product.pk, 'quantity': '5', 'unit_cost': '2', 'currency': self.currency.pk}],
+        })
+        serializer.is_valid(raise_exception=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            return serializer.save(performed_by=self.employee)
+
+    def test_unchanged_stock_is_not_modified(self):
+        self.assertEqual(self.revalidate().status_code, 304)
+
+    def test_moving_a_movement_into_the_past_changes_history(self):
+        movement = self.movement('in', [(self.product, 5)], day=date(2026, 3, 1))
+        process_movements([movement])
+        self.etag = self.get(self.stock_status, self.path, pk=self.product.pk)['ETag']
+
+        self.save_movement(movement, day='2026-01-15')
+
+        response = self.revalidate()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_quantity'], Decimal('15'))
+
+    def test_unprocessed_movement_changes_history(self):
+        self.save_movement()
+
+        self.assertEqual(self.revalidate().status_code, 200)
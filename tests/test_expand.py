@@ -0,0 +1,50 @@
+from inventory.processing import process_movements
+from inventory.tests.base import InventoryTestCase
+from inventory.views import StockBalanceViewSet, StockMovementViewSet
+
+
+class ExpandFieldsTests(InventoryTestCase):
+    """Lists return flat ids unless ?expand= asks for nested objects; ?fields= trims the top level"""
+
+    balances_list = staticmethod(StockBalanceViewSet.as_view({'get': 'list'}))
+    movements_list = staticmethod(StockMovementViewSet.as_view({'get': 'list'}))
+
+    def setUp(self):
+        super().setUp()
+        process_movements([self.movement('in', [(self.product, 5)])])
+
+    def first(self, view, path):
+        return self.get(view, path).data['results'][0]
+
+    def test_lists_are_flat_by_default(self):
+        balance = self.first(self.balances_list, '/balances/')
+        self.assertEqual(balance['product'], self.product.pk)
+        self.assertNotIn('product_details', balance)
+        self.assertNotIn('location_details', balance)
+
+    def test_expand_nests_only_the_requested_paths(self):
+        movement = self.first(self.movements_list, '/movements/?expand=lines.product_details,destination_location')
+
+        self.assertEqual(movement['destination_location_details']['name'], 'A1')
+        self.assertNotIn('source_location_details', movement)
+        line = movement['lines'][0]
+        self.assertEqual(line['product_details']['code'], self.product.code)
+        self.assertNotIn('currency_details', line)
+        self.assertNotIn('company_details', line['product_details'])
+
+    def test_nested_expansion_of_cached_references(self):
+        movement = self.first(self.movements_list, '/movements/?expand=destination_location.warehouse')
+        self.assertEqual(movement['destination_location_details']['warehouse_details']['name'], 'Main')
+
+        movement = self.first(self.movements_list, '/movements/?expand=destination_location')
+        self.assertNotIn('warehouse_details', movement['destination_location_details'])
+
+    def test_expand_everything(self):
+        balance = self.first(self.balances_list, '/balances/?expand=*')
+        self.assertIn('company_details', balance['product_details'])
+        self.assertIn('warehouse_details', balance['location_details'])
+
+    def test_fields_limits_the_top_level(self):
+        movement = self.first(self.movements_list, '/movements/?fields=id,reference,lines')
+        self.assertEqual(set(movement), {'id', 'reference', 'lines'})
+        self.assertIn('quantity', movement['lines'][0])
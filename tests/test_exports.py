@@ -0,0 +1,56 @@
+import csv
+import io
+from unittest import skipIf
+from inventory import exports
+from inventory.processing import process_movements
+from inventory.tests.base import InventoryTestCase
+from inventory.views import StockBalanceViewSet, StockMovementViewSet
+
+
+class ExportTests(InventoryTestCase):
+    """Exports stream every filtered row in chunks, as CSV or Parquet"""
+
+    balances_export = staticmethod(StockBalanceViewSet.as_view({'get': 'export'}))
+    movements_export = staticmethod(StockMovementViewSet.as_view({'get': 'export'}))
+
+    def setUp(self):
+        super().setUp()
+        process_movements([
+            self.movement('in', [(product, 5) for product in self.products]),
+            self.movement('in', [(self.product, 2)], location=self.other_location),
+        ])
+
+    def content(self, response):
+        return b''.join(response.streaming_content)
+
+    def csv_rows(self, response):
+        return list(csv.DictReader(io.StringIO(self.content(response).decode())))
+
+    def test_balances_csv(self):
+        response = self.get(self.balances_export, '/balances/export/?chunk_size=2')
+
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="stock_balances.csv"')
+        rows = self.csv_rows(response)
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(list(rows[0]), [column for column, _, _ in exports.BALANCE_EXPORT_COLUMNS])
+        self.assertEqual((rows[0]['product_code'], rows[0]['location_name'], rows[0]['quantity']), (self.product.code, 'A1', '5.000'))
+
+    def test_movements_csv_has_a_row_per_line_of_the_filtered_movements(self):
+        path = '/movements/export/?search=M1'
+        rows = self.csv_rows(self.get(self.movements_export, path))
+
+        self.assertEqual([row['product'] for row in rows], [str(product.pk) for product in self.products])
+        self.assertEqual({row['reference'] for row in rows}, {'M1'})
+
+    @skipIf(exports.pyarrow is None, 'pyarrow is not installed')
+    def test_balances_parquet(self):
+        response = self.get(self.balances_export, '/balances/export/?export_format=parquet&chunk_size=3')
+
+        table = exports.pyarrow.parquet.read_table(io.BytesIO(self.content(response)))
+        self.assertEqual(table.num_rows, 4)
+        self.assertEqual(table.schema.names, [column for column, _, _ in exports.BALANCE_EXPORT_COLUMNS])
+
+    def test_invalid_options_are_rejected(self):
+        for query in ['export_format=xlsx', 'chunk_size=0', 'chunk_size=many']:
+            with self.subTest(query=query):
+                self.assertEqual(self.get(self.balances_export, f'/balances/export/?{query}').status_code, 400)
@@ -0,0 +1,58 @@
+from datetime import date
+from decimal import Decimal
+from unittest import skipIf
+from django.test import override_settings
+from core.models.models import Currency
+from inventory import fx, valuation
+from inventory.models import CurrencyRate
+from inventory.tests.base import InventoryTestCase
+
+
+class RateTableTests(InventoryTestCase):
+    """Rates are looked up in memory from each currency's rate history"""
+
+    def setUp(self):
+        super().setUp()
+        self.usd = Currency.objects.create(code='USD')
+        CurrencyRate.objects.create(currency=self.usd, date=date(2026, 1, 1), rate=Decimal('0.9'))
+        CurrencyRate.objects.create(currency=self.usd, date=date(2026, 2, 1), rate=Decimal('0.8'))
+
+    def test_rate_in_force_on_a_day(self):
+        table = fx.RateTable(self.currency.pk)
+        self.assertEqual(table.rate(self.usd.pk, date(2026, 1, 15)), 0.9)
+        with self.assertNumQueries(0):
+            self.assertEqual(table.rate(self.usd.pk, date(2026, 2, 1)), 0.8)
+            self.assertEqual(table.rate(self.currency.pk, date(2025, 1, 1)), 1.0)
+
+    def test_missing_rate(self):
+        with self.assertRaises(fx.MissingRateError):
+            fx.RateTable(self.currency.pk).rate(self.usd.pk, date(2025, 12, 31))
+
+    @skipIf(fx.numpy is None, 'numpy is not installed')
+    def test_vectorized_rates(self):
+        currencies = fx.numpy.array([self.usd.pk, self.currency.pk, self.usd.pk])
+        days = fx.numpy.array([date(2026, 1, 2).toordinal(), date(2026, 1, 2).toordinal(), date(2026, 3, 1).toordinal()])
+        self.assertEqual(fx.RateTable(self.currency.pk).rates(currencies, days).tolist(), [0.9, 1.0, 0.8])
+
+    def test_least_recently_used_currency_is_dropped(self):
+        gbp = Currency.objects.create(code='GBP')
+        table = fx.RateTable(self.currency.pk, max_currencies=1)
+        table.load([self.usd.pk])
+        table.load([gbp.pk])
+        self.assertEqual(list(table.series), [gbp.pk])
+
+    def test_rate_table_follows_rate_changes(self):
+        with override_settings(INVENTORY_BASE_CURRENCY_ID=self.currency.pk):
+            table = fx.get_rate_table()
+            self.assertIs(fx.get_rate_table(), table)
+            CurrencyRate.objects.create(currency=self.usd, date=date(2026, 1, 10), rate=Decimal('1.1'))
+            self.assertEqual(fx.get_rate_table().rate(self.usd.pk, date(2026, 1, 15)), 1.1)
+        self.assertIsNone(fx.get_rate_table())
+
+    @skipIf(valuation.numpy is None, 'numpy is not installed')
+    def test_valuation_is_converted_at_the_movement_date(self):
+        movement = self.movement('in', [(self.product, 10)], day=date(2026, 2, 10))
+        movement.lines.update(currency=self.usd)
+        with override_settings(INVENTORY_BASE_CURRENCY_ID=self.currency.pk):
+            result = valuation.product_valuation(self.product.pk)
+        self.assertEqual((result['currency'], result['value']), (self.currency.pk, Decimal('16')))
@@ -0,0 +1,88 @@
+import json
+from unittest import mock
+from django.db import DatabaseError
+from rest_framework.test import APIRequestFactory
+from inventory.importers import import_movements, read_ndjson
+from inventory.models import StockMovement
+from inventory.tests.base import InventoryTestCase
+from inventory.views import StockMovementViewSet
+
+
+class BulkImportTests(InventoryTestCase):
+    """Bulk imports insert the valid rows and report the others by row number"""
+
+    bulk = staticmethod(StockMovementViewSet.as_view({'post': 'bulk'}))
+
+    def row(self, reference, quantity='5', **overrides):
+        return {
+            'reference': reference, 'movement_type': 'in', 'date': '2026-01-01',
+            'destination_location': self.location.pk,
+            'lines': [{'product': self.product.pk, 'quantity': quantity, 'unit_cost': '2', 'currency': self.currency.pk}],
+            **overrides,
+        }
+
+    def upload(self, body, content_type, path='/movements/bulk/'):
+        request = APIRequestFactory().generic('POST', path, body, content_type=content_type)
+        return self.request(self.bulk, request)
+
+    def ndjson(self, *rows):
+        return b''.join(row if isinstance(row, bytes) else json.dumps(row).encode() + b'\n' for row in rows)
+
+    def error_rows(self, response):
+        return {error['row']: error for error in response.data['errors']}
+
+    def test_ndjson_imports_valid_rows_and_reports_invalid_ones(self):
+        response = self.upload(self.ndjson(
+            self.row('R1'),
+            b'{not json\n',
+            b'\xff\xfe\n',
+            self.row('R2', destination_location=999999),
+            self.row('R3', quantity='-1'),
+            self.row('R4', quantity='3'),
+        ), 'application/x-ndjson')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['movements'], 2)
+        self.assertEqual(sorted(self.error_rows(response)), [2, 3, 4, 5])
+        self.assertIn('destination_location', self.error_rows(response)[4]['errors'])
+        self.assertEqual(set(StockMovement.objects.values_list('reference', flat=True)), {'R1', 'R4'})
+        self.assertEqual(self.balance().initial_quantity, 8)
+
+    def test_duplicate_references_are_reported(self):
+        taken = self.movement('in', [(self.product, 1)]).reference
+        response = self.upload(self.ndjson(self.row(taken), self.row('NEW'), self.row('NEW')), 'application/x-ndjson')
+
+        errors = self.error_rows(response)
+        self.assertEqual(response.data['movements'], 1)
+        self.assertEqual(sorted(errors), [1, 3])
+        self.assertIn('reference', errors[1]['errors'])
+        self.assertIn('reference', errors[3]['errors'])
+
+    def test_csv_reports_undecodable_and_malformed_lines(self):
+        header = b'reference,movement_type,date,destination_location,product,quantity,unit_cost,currency\n'
+        line = f'{{}},in,2026-01-01,{self.location.pk},{self.product.pk},{{}},2,{self.currency.pk}\n'
+        body = b''.join([
+            header,
+            line.format('C1', 2).encode(),
+            line.format('C1', 3).encode(),
+            b'C2,in,\xff\n',
+            b'C3,in,' + b'x' * 200000 + b'\n',
+            line.format('C4', 4).encode(),
+        ])
+        response = self.upload(body, 'text/csv')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['movements'], 2)
+        self.assertEqual(response.data['lines'], 3)
+        self.assertEqual(sorted(self.error_rows(response)), [4, 5])
+        self.assertEqual(self.balance().initial_quantity, 9)
+
+    def test_failed_chunk_is_rolled_back_alone(self):
+        records = read_ndjson(iter(self.ndjson(self.row('A1'), self.row('A2'), self.row('B1'), self.row('B2')).splitlines()))
+        process = mock.Mock(side_effect=[None, DatabaseError('deadlock detected')])
+        with mock.patch('inventory.importers.process_movements', process):
+            summary = import_movements(records, self.employee, chunk_size=2)
+
+        self.assertEqual(summary['movements'], 2)
+        self.assertEqual([error['reference'] for error in summary['errors']], ['B1', 'B2'])
+        self.assertEqual(set(StockMovement.objects.values_list('reference', flat=True)), {'A1', 'A2'})
@@ -0,0 +1,51 @@
+from unittest import mock
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory, override_settings
+from inventory.instrumentation import RequestStats, metrics, metrics_view
+from inventory.processing import process_movements
+from inventory.tests.base import InventoryTestCase
+from inventory.views import StockBalanceViewSet, StockMovementViewSet
+
+
+class InstrumentationTests(InventoryTestCase):
+    """Instrumented viewsets report their query count and timings per request"""
+
+    balances_list = staticmethod(StockBalanceViewSet.as_view({'get': 'list'}))
+    movements_list = staticmethod(StockMovementViewSet.as_view({'get': 'list'}))
+
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+        process_movements([self.movement('in', [(product, 5)]) for product in self.products])
+
+    def test_server_timing_and_metrics(self):
+        response = self.get(self.balances_list, '/balances/')
+
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('serialize;dur=', response['Server-Timing'])
+        rendered = metrics.render()
+        self.assertIn('inventory_requests_total{view="StockBalanceViewSet",action="list",status="200"} 1', rendered)
+        self.assertIn('inventory_db_queries_total{view="StockBalanceViewSet",action="list"}', rendered)
+
+    def test_serialization_is_timed_once_per_response(self):
+        path = '/movements/?expand=lines.product,destination_location'
+        # Locations missing from the reference cache are serialized (and timed) within the response
+        self.get(self.movements_list, path)
+        serializing = mock.Mock(wraps=RequestStats.serializing)
+        with mock.patch.object(RequestStats, 'serializing', lambda stats: serializing(stats)):
+            self.get(self.movements_list, path)
+        self.assertEqual(serializing.call_count, 1)
+
+    @override_settings(INVENTORY_INSTRUMENTATION=False)
+    def test_disabled_instrumentation_adds_no_header(self):
+        self.assertNotIn('Server-Timing', self.get(self.balances_list, '/balances/'))
+
+    @override_settings(INVENTORY_METRICS_TOKEN='secret')
+    def test_metrics_require_the_token_or_staff(self):
+        request = RequestFactory().get('/metrics/')
+        request.user = AnonymousUser()
+        self.assertEqual(metrics_view(request).status_code, 403)
+
+        request = RequestFactory().get('/metrics/', HTTP_AUTHORIZATION='Bearer secret')
+        request.user = AnonymousUser()
+        self.assertEqual(metrics_view(request).status_code, 200)
@@ -0,0 +1,68 @@
+import io
+from decimal import Decimal
+from django.core.management import call_command
+from inventory import reservations
+from inventory.ledger import replay_location
+from inventory.models import StockBalance, StockLedgerEntry, StockMovement
+from inventory.processing import process_movements
+from inventory.tests.base import InventoryTestCase
+
+BALANCE_FIELDS = ['product_id', 'location_id', 'initial_quantity', 'reserved_quantity', 'in_total', 'out_total']
+
+
+class StockLedgerTests(InventoryTestCase):
+    def balances(self):
+        return sorted(StockBalance.objects.values_list(*BALANCE_FIELDS))
+
+    def record_history(self):
+        process_movements([
+            self.movement('in', [(self.product, 10), (self.products[1], 5)]),
+            self.movement('out', [(self.product, 3)]),
+        ])
+        process_movements([
+            self.movement('transfer', [(self.product, 2)], location=self.other_location, source_location=self.location)
+        ])
+        reservation = reservations.reserve(self.balance(), Decimal('2'))
+        reservations.commit(reservation)
+        balance = self.balance(self.products[1])
+        balance.initial_quantity = Decimal('8')
+        balance.save()
+
+    def test_entries_sum_to_balances(self):
+        self.record_history()
+
+        for balance in StockBalance.objects.all():
+            entries = StockLedgerEntry.objects.filter(product=balance.product_id, location=balance.location_id)
+            for field, delta in StockLedgerEntry.DELTA_FIELDS.items():
+                self.assertEqual(sum(entry[delta] for entry in entries.values(delta)), getattr(balance, field))
+
+    def test_entries_cannot_be_changed(self):
+        self.record_history()
+        entry = StockLedgerEntry.objects.first()
+
+        with self.assertRaises(ValueError):
+            entry.save()
+
+    def test_deleting_a_movement_leaves_its_entries(self):
+        movement = self.movement('in', [(self.product, 10)])
+        process_movements([movement])
+        entries = list(StockLedgerEntry.objects.filter(movement_id=movement.pk).values())
+
+        StockMovement.objects.filter(pk=movement.pk).delete()
+
+        self.assertEqual(list(StockLedgerEntry.objects.filter(movement_id=movement.pk).values()), entries)
+
+    def test_replay_reports_no_drift(self):
+        self.record_history()
+
+        self.assertEqual(replay_location(self.location.pk, dry_run=True)[1:], (0, 0))
+
+    def test_rebuild_restores_corrupted_balances(self):
+        self.record_history()
+        expected = self.balances()
+        StockBalance.objects.filter(location=self.location).update(initial_quantity=99, in_total=0)
+        StockBalance.objects.filter(location=self.other_location).delete()
+
+        call_command('rebuild_balances', processes=1, stdout=io.StringIO())
+
+        self.assertEqual(self.balances(), expected)
@@ -0,0 +1,62 @@
+from datetime import date
+from inventory.models import LotBalance, LotTracking
+from inventory.processing import process_movements
+from inventory.snapshots import stock_as_of
+from inventory.tests.base import InventoryTestCase
+from inventory.valuation import product_valuation
+from inventory.views import LotTrackingViewSet
+
+
+class LotBalanceTests(InventoryTestCase):
+    """Lines carrying a lot keep that lot's balance next to the product's"""
+
+    pick = staticmethod(LotTrackingViewSet.as_view({'get': 'pick'}))
+
+    def setUp(self):
+        super().setUp()
+        self.lot_a = LotTracking.objects.create(product=self.product, lot_number='A')
+        self.lot_b = LotTracking.objects.create(product=self.product, lot_number='B')
+
+    def lot_balance(self, lot, location=None):
+        return LotBalance.objects.get(lot_tracking=lot, location=location or self.location)
+
+    def test_lot_balances_follow_their_lines(self):
+        process_movements([self.movement('in', [(self.product, 5, self.lot_a)], day=date(2026, 1, 2))])
+        process_movements([self.movement('in', [(self.product, 7, self.lot_b)], day=date(2026, 1, 3))])
+        process_movements([self.movement('out', [(self.product, 2, self.lot_a)], day=date(2026, 1, 4))])
+
+        self.assertEqual(self.lot_balance(self.lot_a).quantity, 3)
+        self.assertEqual(self.lot_balance(self.lot_a).received_on, date(2026, 1, 2))
+        self.assertEqual(self.lot_balance(self.lot_b).quantity, 7)
+        self.assertEqual(self.balance().initial_quantity, 10)
+
+    def test_adjustment_sums_the_counts_of_each_lot(self):
+        process_movements([self.movement('in', [(self.product, 20, self.lot_a)])])
+        process_movements([self.movement(
+            'adjustment', [(self.product, 4, self.lot_a), (self.product, 5, self.lot_a), (self.product, 7, self.lot_b)],
+            day=date(2026, 1, 2)
+        )])
+
+        self.assertEqual(self.lot_balance(self.lot_a).quantity, 5)
+        self.assertEqual(self.lot_balance(self.lot_b).quantity, 7)
+        self.assertEqual(self.balance().initial_quantity, 12)
+        self.assertEqual(stock_as_of(date(2026, 1, 2))[(self.product.pk, self.location.pk)]['quantity'], 12)
+        self.assertEqual(product_valuation(self.product.pk)['quantity'], 12)
+
+    def test_pick_allocates_the_earliest_received_lots_first(self):
+        process_movements([self.movement('in', [(self.product, 5, self.lot_b)], day=date(2026, 1, 3))])
+        process_movements([self.movement(
+            'in', [(self.product, 4, self.lot_a)], location=self.other_location, day=date(2026, 1, 2)
+        )])
+
+        path = f'/lots/pick/?product={self.product.pk}&quantity=6'
+        response = self.get(self.pick, path)
+        self.assertEqual(
+            [(pick['lot_number'], pick['location'], pick['quantity']) for pick in response.data['picks']],
+            [('A', self.other_location.pk, 4), ('B', self.location.pk, 2)]
+        )
+        self.assertEqual(response.data['shortfall'], 0)
+
+        response = self.get(self.pick, f'{path}&location={self.location.pk}')
+        self.assertEqual([pick['lot_number'] for pick in response.data['picks']], ['B'])
+        self.assertEqual(response.data['shortfall'], 1)
@@ -0,0 +1,154 @@
+from decimal import Decimal
+from inventory.models import StockBalance, StockLocation, StockMovement, StockMovementApplication
+from inventory.processing import pair_conditions, process_movements
+from inventory.tests.base import InventoryTestCase
+from inventory.views import StockMovementViewSet
+
+
+class ProcessMovementsTests(InventoryTestCase):
+    def test_in_and_out_update_balance_and_totals(self):
+        process_movements([self.movement('in', [(self.product, 10)]), self.movement('out', [(self.product, 4)])])
+
+        balance = self.balance()
+        self.assertEqual(balance.initial_quantity, Decimal('6'))
+        self.assertEqual(balance.in_total, Decimal('10'))
+        self.assertEqual(balance.out_total, Decimal('4'))
+
+    def test_reprocessing_unchanged_movement_is_noop(self):
+        movement = self.movement('in', [(self.product, 10)])
+        process_movements([movement])
+
+        with self.assertNumQueries(5):
+            process_movements([movement])
+        self.assertEqual(self.balance().initial_quantity, Decimal('10'))
+
+    def test_edited_line_applies_only_the_difference(self):
+        movement = self.movement('in', [(self.product, 10)])
+        process_movements([movement])
+        movement.lines.update(quantity=Decimal('7'))
+
+        process_movements([movement])
+
+        balance = self.balance()
+        self.assertEqual(balance.initial_quantity, Decimal('7'))
+        self.assertEqual(balance.in_total, Decimal('7'))
+        self.assertEqual(StockMovementApplication.objects.get(movement=movement).quantity, Decimal('7'))
+
+    def test_removing_an_unfilled_out_adds_no_stock(self):
+        movement = self.movement('out', [(self.product, 5)])
+        process_movements([movement])
+        self.assertEqual(StockMovementApplication.objects.get(movement=movement).shortfall, Decimal('5'))
+
+        movement.lines.all().delete()
+        process_movements([movement])
+
+        balance = self.balance()
+        self.assertEqual(balance.initial_quantity, 0)
+        self.assertEqual(balance.out_total, 0)
+
+    def test_reversing_a_partly_filled_out_returns_what_it_consumed(self):
+        process_movements([self.movement('in', [(self.product, 3)])])
+        movement = self.movement('out', [(self.product, 5)])
+        process_movements([movement])
+
+        movement.lines.update(quantity=Decimal('4'))
+        process_movements([movement])
+        self.assertEqual(self.balance().initial_quantity, 0)
+
+        movement.lines.all().delete()
+        process_movements([movement])
+        self.assertEqual(self.balance().initial_quantity, Decimal('3'))
+
+    def test_patch_without_lines_keeps_the_movement_applied(self):
+        movement = self.movement('in', [(self.product, 10)])
+        process_movements([movement])
+        applications = list(StockMovementApplication.objects.values('id', 'quantity', 'shortfall'))
+
+        response = self.patch(
+            StockMovementViewSet.as_view({'patch': 'partial_update'}), f'/movements/{movement.pk}/',
+            {'notes': 'Checked'}, pk=movement.pk
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(movement.lines.count(), 1)
+        self.assertEqual(self.balance().initial_quantity, Decimal('10'))
+        self.assertEqual(list(StockMovementApplication.objects.values('id', 'quantity', 'shortfall')), applications)
+
+    def test_adjustment_sets_quantity(self):
+        process_movements([self.movement('in', [(self.product, 10)]), self.movement('adjustment', [(self.product, 3)])])
+
+        self.assertEqual(self.balance().initial_quantity, Decimal('3'))
+
+    def test_transfer_moves_stock_between_locations(self):
+        process_movements([self.movement('in', [(self.product, 10)])])
+        transfer = self.movement('transfer', [(self.product, 4)], location=self.other_location, source_location=self.location)
+
+        process_movements([transfer])
+        process_movements([transfer])
+
+        self.assertEqual(self.balance().initial_quantity, Decimal('6'))
+        self.assertEqual(self.balance(location=self.other_location).initial_quantity, Decimal('4'))
+
+    def test_transfer_credits_only_what_the_source_had(self):
+        process_movements([self.movement('in', [(self.product, 3)])])
+        transfer = self.movement('transfer', [(self.product, 10)], location=self.other_location, source_location=self.location)
+
+        process_movements([transfer])
+        process_movements([transfer])
+
+        self.assertEqual(self.balance().initial_quantity, 0)
+        destination = self.balance(location=self.other_location)
+        self.assertEqual((destination.initial_quantity, destination.in_total), (Decimal('3'), Decimal('3')))
+
+    def test_reduced_transfer_moves_back_only_what_it_moved(self):
+        process_movements([self.movement('in', [(self.product, 3)])])
+        transfer = self.movement('transfer', [(self.product, 10)], location=self.other_location, source_location=self.location)
+        process_movements([transfer])
+
+        transfer.lines.update(quantity=Decimal('2'))
+        process_movements([transfer])
+
+        self.assertEqual(self.balance().initial_quantity, Decimal('1'))
+        self.assertEqual(self.balance(location=self.other_location).initial_quantity, Decimal('2'))
+
+        transfer.lines.all().delete()
+        process_movements([transfer])
+
+        self.assertEqual(self.balance().initial_quantity, Decimal('3'))
+        self.assertEqual(self.balance(location=self.other_location).initial_quantity, 0)
+        self.assertFalse(StockMovementApplication.objects.filter(movement=transfer).exists())
+
+    def test_redirected_transfer_moves_the_credit(self):
+        process_movements([self.movement('in', [(self.product, 3)])])
+        third = StockLocation.objects.create(name='C1', warehouse=self.warehouse)
+        transfer = self.movement('transfer', [(self.product, 10)], location=self.other_location, source_location=self.location)
+        process_movements([transfer])
+
+        StockMovement.objects.filter(pk=transfer.pk).update(destination_location=third)
+        process_movements([StockMovement.objects.get(pk=transfer.pk)])
+
+        self.assertEqual(self.balance(location=self.other_location).initial_quantity, 0)
+        self.assertEqual(self.balance(location=third).initial_quantity, Decimal('3'))
+
+    def test_batch_query_count_does_not_grow_with_lines(self):
+        # Counted with the alert refresh and version bumps that run once the batch commits
+        small = self.movement('in', [(self.products[0], 1)])
+        with self.assertNumQueries(17), self.captureOnCommitCallbacks(execute=True):
+            process_movements([small])
+
+        large = self.movement('in', [(product, 1) for product in self.products])
+        with self.assertNumQueries(17), self.captureOnCommitCallbacks(execute=True):
+            process_movements([large])
+
+    def test_locking_reads_only_the_requested_pairs(self):
+        process_movements([
+            self.movement('in', [(product, 1) for product in self.products[:2]], location=location)
+            for location in (self.location, self.other_location)
+        ])
+        keys = {(self.products[0].pk, self.location.pk), (self.products[1].pk, self.other_location.pk)}
+
+        matched = set()
+        for condition in pair_conditions(keys, 'product_id', 'location_id'):
+            matched.update(StockBalance.objects.filter(condition).values_list('product_id', 'location_id'))
+
+        self.assertEqual(matched, keys)
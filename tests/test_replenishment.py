@@ -0,0 +1,52 @@
+import csv
+import io
+import os
+import tempfile
+from datetime import date
+from decimal import Decimal
+from django.core.management import call_command
+from inventory.models import Product
+from inventory.processing import process_movements
+from inventory.replenishment import PLAN_FIELDS, plan_warehouse
+from inventory.tests.base import InventoryTestCase
+
+
+class ReplenishmentTests(InventoryTestCase):
+    """Products are reordered when available stock reaches min_stock plus lead-time outbound"""
+
+    def setUp(self):
+        super().setUp()
+        Product.objects.filter(pk=self.product.pk).update(min_stock=10)
+        Product.objects.filter(pk=self.products[1].pk).update(min_stock=10, max_stock=50)
+        process_movements([self.movement('in', [(self.product, 35), (self.products[1], 100)])])
+        process_movements([self.movement('out', [(self.product, 30)], day=date(2026, 1, 20))])
+
+    def plan(self):
+        return {row[2]: dict(zip(PLAN_FIELDS, row)) for row in plan_warehouse(self.warehouse.pk, date(2026, 1, 30), 30, 7)}
+
+    def test_reorders_up_to_the_reorder_point(self):
+        plan = self.plan()
+
+        self.assertEqual(list(plan), [self.product.code])
+        row = plan[self.product.code]
+        self.assertEqual((row['on_hand'], row['daily_outbound'], row['reorder_point']), (Decimal('5'), Decimal('1'), Decimal('17')))
+        self.assertEqual(row['suggested_quantity'], Decimal('12'))
+
+    def test_reserved_stock_is_not_available(self):
+        balance = self.balance(self.products[1])
+        balance.reserved_quantity = 95
+        balance.save()
+
+        row = self.plan()[self.products[1].code]
+        self.assertEqual((row['target'], row['suggested_quantity']), (Decimal('50'), Decimal('45')))
+
+    def test_command_writes_the_plan(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'plan.csv')
+            call_command(
+                'plan_replenishment', output, as_of='2026-01-30', processes=1, stdout=io.StringIO()
+            )
+            with open(output, newline='') as stream:
+                rows = list(csv.DictReader(stream))
+
+        self.assertEqual([(row['product_code'], row['suggested_quantity']) for row in rows], [(self.product.code, '12.000')])
@@ -0,0 +1,97 @@
+from decimal import Decimal
+from inventory import reservations
+from inventory.models import StockMovementApplication, StockReservation
+from inventory.processing import process_movements
+from inventory.tests.base import InventoryTestCase
+from inventory.views import StockBalanceViewSet
+
+
+class ReservationTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        process_movements([self.movement('in', [(self.product, 10)])])
+
+    def test_reserve_holds_stock(self):
+        reservation = reservations.reserve(self.balance(), Decimal('4'), reference='SO-1')
+
+        self.assertEqual(reservation.status, 'active')
+        self.assertEqual(self.balance().reserved_quantity, Decimal('4'))
+
+    def test_reserve_rejects_more_than_on_hand(self):
+        with self.assertRaises(reservations.InsufficientStockError):
+            reservations.reserve(self.balance(), Decimal('11'))
+        self.assertFalse(StockReservation.objects.exists())
+        self.assertEqual(self.balance().reserved_quantity, 0)
+
+    def test_reserve_counts_processed_receipts_once(self):
+        reservations.reserve(self.balance(), Decimal('10'))
+
+        with self.assertRaises(reservations.InsufficientStockError):
+            reservations.reserve(self.balance(), Decimal('5'))
+        self.assertEqual(self.balance().reserved_quantity, Decimal('10'))
+
+    def test_release_returns_stock(self):
+        reservation = reservations.reserve(self.balance(), Decimal('4'))
+
+        reservations.release(reservation)
+
+        balance = self.balance()
+        self.assertEqual(balance.reserved_quantity, 0)
+        self.assertEqual(balance.initial_quantity, Decimal('10'))
+
+    def test_commit_consumes_held_stock(self):
+        reservation = reservations.reserve(self.balance(), Decimal('4'))
+
+        reservations.commit(reservation)
+
+        balance = self.balance()
+        self.assertEqual(balance.reserved_quantity, 0)
+        self.assertEqual(balance.initial_quantity, Decimal('6'))
+
+    def test_commit_refuses_stock_consumed_meanwhile(self):
+        reservation = reservations.reserve(self.balance(), Decimal('5'))
+        process_movements([self.movement('out', [(self.product, 12)])])
+
+        with self.assertRaises(reservations.InsufficientStockError):
+            reservations.commit(reservation)
+        self.assertEqual(StockReservation.objects.get(pk=reservation.pk).status, 'active')
+        self.assertEqual(self.balance().initial_quantity, 0)
+
+    def test_commit_endpoint_conflicts_when_stock_is_gone(self):
+        balance = self.balance()
+        reservation = reservations.reserve(balance, Decimal('5'))
+        process_movements([self.movement('out', [(self.product, 12)])])
+
+        response = self.post(
+            StockBalanceViewSet.as_view({'post': 'commit'}), f'/balances/{balance.pk}/commit/',
+            {'reservation': reservation.pk}, pk=balance.pk
+        )
+
+        self.assertEqual(response.status_code, 409)
+
+    def test_outbound_stock_never_comes_from_reservations(self):
+        reservations.reserve(self.balance(), Decimal('5'))
+        movement = self.movement('out', [(self.product, 12)])
+
+        process_movements([movement])
+
+        balance = self.balance()
+        self.assertEqual((balance.initial_quantity, balance.reserved_quantity), (0, 0))
+        self.assertEqual(StockMovementApplication.objects.get(movement=movement).shortfall, Decimal('2'))
+
+    def test_available_stock_is_what_reserve_accepts(self):
+        reservations.reserve(self.balance(), Decimal('4'))
+        self.assertEqual(self.balance().available_stock, Decimal('6'))
+
+        reservations.reserve(self.balance(), Decimal('6'))
+        self.assertEqual(self.balance().available_stock, 0)
+        with self.assertRaises(reservations.InsufficientStockError):
+            reservations.reserve(self.balance(), Decimal('0.001'))
+
+    def test_settled_reservation_cannot_be_settled_again(self):
+        reservation = reservations.reserve(self.balance(), Decimal('4'))
+        reservations.commit(reservation)
+
+        with self.assertRaises(reservations.ReservationStateError):
+            reservations.release(StockReservation.objects.get(pk=reservation.pk))
+        self.assertEqual(self.balance().initial_quantity, Decimal('6'))
@@ -0,0 +1,48 @@
+import io
+from datetime import date
+from django.core.management import call_command
+from inventory.models import StockSnapshot
+from inventory.processing import process_movements
+from inventory.snapshots import stock_as_of
+from inventory.tests.base import InventoryTestCase
+from inventory.views import ProductViewSet
+
+
+class SnapshotTests(InventoryTestCase):
+    """Historical stock is served from the nearest snapshot plus the movement lines after it"""
+
+    stock_status = staticmethod(ProductViewSet.as_view({'get': 'stock_status'}))
+
+    def build(self, **options):
+        call_command('build_stock_snapshots', stdout=io.StringIO(), **options)
+
+    def historical_quantity(self, day):
+        path = f'/products/{self.product.pk}/stock_status/?as_of={day}'
+        return self.get(self.stock_status, path, pk=self.product.pk).data['total_quantity']
+
+    def test_snapshot_matches_movement_history(self):
+        process_movements([self.movement('in', [(self.product, 10)])])
+        process_movements([self.movement('out', [(self.product, 4)], day=date(2026, 1, 3))])
+        self.build(date='2026-01-05', since='2026-01-01')
+
+        self.assertEqual(StockSnapshot.objects.filter(date=date(2026, 1, 5)).get().quantity, 6)
+        self.assertEqual(self.historical_quantity('2026-01-02'), 10)
+        self.assertEqual(self.historical_quantity('2026-01-05'), 6)
+
+    def test_rebuild_since_picks_up_back_dated_movements(self):
+        process_movements([self.movement('in', [(self.product, 10)])])
+        self.build(date='2026-01-05', since='2026-01-01')
+
+        process_movements([self.movement('in', [(self.product, 5)], day=date(2026, 1, 3))])
+        self.build(date='2026-01-05', since='2026-01-03')
+
+        self.assertEqual(self.historical_quantity('2026-01-02'), 10)
+        self.assertEqual(self.historical_quantity('2026-01-05'), 15)
+        self.assertEqual(StockSnapshot.objects.get(date=date(2026, 1, 5)).in_total, 15)
+
+    def test_unprocessed_movements_are_left_out(self):
+        process_movements([self.movement('in', [(self.product, 10)])])
+        self.movement('in', [(self.product, 5)], day=date(2026, 1, 2))
+
+        history = stock_as_of(date(2026, 1, 5))
+        self.assertEqual(history[(self.product.pk, self.location.pk)]['quantity'], 10)
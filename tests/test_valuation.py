@@ -0,0 +1,61 @@
+from datetime import date
+from decimal import Decimal
+from unittest import skipIf
+from inventory import valuation
+from inventory.tests.base import InventoryTestCase
+from inventory.views import ProductViewSet
+
+
+@skipIf(valuation.numpy is None, 'numpy is not installed')
+class ValuationTests(InventoryTestCase):
+    """FIFO and moving-average valuation of the stock recorded by movement lines"""
+
+    valuation_view = staticmethod(ProductViewSet.as_view({'get': 'valuation'}))
+
+    def setUp(self):
+        super().setUp()
+        self.line('in', 10, '2', date(2026, 1, 1))
+        self.line('in', 10, '4', date(2026, 1, 2))
+        self.line('out', 15, '0', date(2026, 1, 3))
+
+    def line(self, movement_type, quantity, unit_cost, day, **kwargs):
+        movement = self.movement(movement_type, [(self.product, quantity)], day=day, **kwargs)
+        movement.lines.update(unit_cost=Decimal(unit_cost))
+        return movement
+
+    def location_result(self, result, location):
+        return next(row for row in result['locations'] if row['location'] == location.pk)
+
+    def test_fifo_issues_the_oldest_receipts_first(self):
+        result = valuation.product_valuation(self.product.pk, 'fifo')
+        self.assertEqual((result['quantity'], result['value'], result['cogs']), (Decimal('5'), Decimal('20'), Decimal('40')))
+
+    def test_average_issues_at_the_running_average_cost(self):
+        result = valuation.product_valuation(self.product.pk, 'average')
+        self.assertEqual((result['quantity'], result['value'], result['cogs']), (Decimal('5'), Decimal('15'), Decimal('45')))
+
+    def test_as_of_values_the_stock_at_that_date(self):
+        result = valuation.product_valuation(self.product.pk, 'fifo', as_of=date(2026, 1, 2))
+        self.assertEqual((result['quantity'], result['value'], result['cogs']), (Decimal('20'), Decimal('60'), 0))
+
+    def test_transfers_relocate_stock_without_cost_of_goods_sold(self):
+        self.line('transfer', 5, '4', date(2026, 1, 4), location=self.other_location, source_location=self.location)
+        result = valuation.product_valuation(self.product.pk, 'fifo')
+
+        source = self.location_result(result, self.location)
+        destination = self.location_result(result, self.other_location)
+        self.assertEqual((source['quantity'], source['value'], source['cogs']), (0, 0, Decimal('40')))
+        self.assertEqual((destination['quantity'], destination['value']), (Decimal('5'), Decimal('20')))
+
+    def test_adjustments_move_the_quantity_to_the_counted_level(self):
+        self.line('adjustment', 8, '5', date(2026, 1, 4))
+        result = valuation.product_valuation(self.product.pk, 'fifo')
+        self.assertEqual((result['quantity'], result['value']), (Decimal('8'), Decimal('35')))
+
+    def test_valuation_endpoint(self):
+        path = f'/products/{self.product.pk}/valuation/'
+        response = self.get(self.valuation_view, f'{path}?method=average', pk=self.product.pk)
+        self.assertEqual((response.data['method'], response.data['value']), ('average', Decimal('15')))
+
+        response = self.get(self.valuation_view, f'{path}?method=lifo', pk=self.product.pk)
+        self.assertEqual(response.status_code, 400)
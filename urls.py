@@ -4,6 +4,7 @@ from inventory.views import (
     ProductViewSet, WarehouseViewSet,
     StockLocationViewSet, StockMovementViewSet, StockBalanceViewSet, LotTrackingViewSet
 )
+from inventory.instrumentation import metrics_view
 
 router = DefaultRouter()
 router.register(r'products', ProductViewSet)
@@ -14,5 +15,6 @@ router.register(r'balances', StockBalanceViewSet)
 router.register(r'lots', LotTrackingViewSet)
 
 urlpatterns = [
+    path('metrics/', metrics_view, name='inventory-metrics'),
     path('', include(router.urls)),
 ]
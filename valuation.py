@@ -0,0 +1,206 @@
+from decimal import Decimal
+from inventory.fx import get_rate_table
+from django.db.models import Q
+from inventory.models import StockMovementLine
+from inventory.processing import adjustment_level, movement_legs
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+VALUATION_METHODS = ['fifo', 'average']
+VALUATION_BATCH_SIZE = 1000
+LINE_CHUNK_SIZE = 10000
+
+# Quantities are carried as integer thousandths (the precision of the quantity fields) so running
+# totals stay exact; costs and values are floats and rounded to cents on the way out. Costs are
+# converted to the base currency at the movement date when INVENTORY_BASE_CURRENCY_ID is set.
+# Transfers issue at their source like an out, but the issue is a relocation, not cost of goods sold.
+QUANTITY_SCALE = 1000
+MOVEMENT_KINDS = {'in': 0, 'out': 1, 'adjustment': 2}
+IN, OUT, ADJUSTMENT, TRANSFER_OUT = 0, 1, 2, 3
+
+
+def require_numpy():
+    if numpy is None:
+        raise ValueError('Inventory valuation requires numpy to be installed')
+
+
+def valuation_lines(product_ids=None, location_ids=None, as_of=None):
+    """
+    Lines that affect stock, ordered by product and then the order movements are applied in, as
+    values tuples for valuation_legs()
+    """
+    lines = StockMovementLine.objects.filter(movement__movement_type__in=['in', 'out', 'adjustment', 'transfer'])
+    if product_ids is not None:
+        lines = lines.filter(product_id__in=product_ids)
+    if location_ids is not None:
+        lines = lines.filter(
+            Q(movement__destination_location_id__in=location_ids) | Q(movement__source_location_id__in=location_ids)
+        )
+    if as_of is not None:
+        lines = lines.filter(movement__date__lte=as_of)
+    return lines.order_by('product_id', 'movement__date', 'movement_id', 'id').values_list(
+        'product_id', 'movement_id', 'movement__destination_location_id', 'movement__source_location_id',
+        'movement__movement_type', 'lot_tracking_id', 'quantity', 'unit_cost', 'currency_id', 'movement__date'
+    )
+
+
+def valuation_legs(lines):
+    """
+    (product_id, location_id, kind, quantity, unit_cost, currency_id, date) for every stock effect of
+    valuation_lines() rows; a transfer issues at its source and receives at its destination at the line's
+    cost, and each adjustment line sets the product quantity its movement's lot counts add up to so far
+    """
+    adjusting, adjusted = None, {}
+    for product_id, movement_id, destination_id, source_id, movement_type, lot_id, quantity, unit_cost, currency_id, day in lines:
+        if (product_id, movement_id) != adjusting:
+            adjusting, adjusted = (product_id, movement_id), {}
+        for location_id, effect in movement_legs(movement_type, destination_id, source_id):
+            kind = TRANSFER_OUT if movement_type == 'transfer' and effect == 'out' else MOVEMENT_KINDS[effect]
+            if kind == ADJUSTMENT:
+                quantity = adjustment_level(adjusted, lot_id, quantity)
+            yield product_id, location_id, kind, quantity, unit_cost, currency_id, day
+
+
+def signed_deltas(kinds, quantities):
+    """
+    Stock change of every line: +quantity for in, -quantity for out, and for adjustments (which set
+    the stock) the difference from the stock just before. Each adjustment starts a segment; the stock
+    before adjustment k is adjustment k-1's quantity plus the in/out sum of segment k-1, so all
+    adjustment deltas come from one bincount over the segments.
+    """
+    deltas = numpy.where((kinds == OUT) | (kinds == TRANSFER_OUT), -quantities, quantities)
+    is_adjustment = kinds == ADJUSTMENT
+    if not is_adjustment.any():
+        return deltas
+
+    segments = numpy.cumsum(is_adjustment)
+    flows = numpy.where(is_adjustment, 0, deltas)
+    segment_flows = numpy.bincount(segments, weights=flows).astype(numpy.int64)
+    levels = numpy.concatenate(([0], quantities[is_adjustment]))
+    closing = levels + segment_flows
+    deltas[is_adjustment] = levels[1:] - closing[:-1]
+    return deltas
+
+
+def fifo_valuation(deltas, costs, sold):
+    """
+    Return (quantity, value, cogs) with issues drawing on the oldest receipts first. Cost layers are
+    the cumulative receipt quantities, so the cost of the first x issued units is found for every
+    issue at once with searchsorted. Issues beyond all receipts are costed at the last receipt cost.
+    Only issues flagged in sold count towards cogs.
+    """
+    receipts = deltas > 0
+    received = deltas[receipts]
+    quantity = int(deltas.sum())
+    if not received.size:
+        return quantity, 0.0, 0.0
+
+    layer_costs = costs[receipts]
+    layer_ends = numpy.cumsum(received)
+    layer_values = numpy.cumsum(received * layer_costs)
+
+    def cost_of_first(units):
+        layer = numpy.minimum(numpy.searchsorted(layer_ends, units, side='left'), layer_ends.size - 1)
+        previous_end = numpy.where(layer > 0, layer_ends[layer - 1], 0)
+        previous_value = numpy.where(layer > 0, layer_values[layer - 1], 0.0)
+        return previous_value + (units - previous_end) * layer_costs[layer]
+
+    issues = deltas < 0
+    issued = -deltas[issues]
+    issued_after = numpy.cumsum(issued)
+    total_issued = issued_after[-1] if issued.size else 0
+    issue_costs = cost_of_first(issued_after) - cost_of_first(issued_after - issued)
+    cogs = float(issue_costs[sold[issues]].sum())
+    value = float(layer_values[-1] - cost_of_first(numpy.array([total_issued]))[0])
+    return quantity, value, cogs
+
+
+def moving_average_valuation(deltas, costs, sold):
+    """
+    Return (quantity, value, cogs) with receipts re-averaging the unit cost and issues leaving it
+    unchanged. The running average is sequential, so this is one pass over plain Python numbers.
+    """
+    quantity, average, cogs = 0, 0.0, 0.0
+    for delta, cost, is_sold in zip(deltas.tolist(), costs.tolist(), sold.tolist()):
+        if delta > 0:
+            average = (quantity * average + delta * cost) / (quantity + delta) if quantity > 0 else cost
+        elif is_sold:
+            cogs -= delta * average
+        quantity += delta
+    return quantity, quantity * average, cogs
+
+
+def valuation_result(product_id, location_id, quantity, value, cogs):
+    quantity = (Decimal(quantity) / QUANTITY_SCALE).quantize(Decimal('0.001'))
+    value = Decimal(value / QUANTITY_SCALE).quantize(Decimal('0.01'))
+    return {
+        'product': product_id,
+        'location': location_id,
+        'quantity': quantity,
+        'value': value,
+        'unit_cost': (value / quantity).quantize(Decimal('0.01')) if quantity else None,
+        'cogs': Decimal(cogs / QUANTITY_SCALE).quantize(Decimal('0.01')),
+    }
+
+
+def value_rows(rows, method='fifo', rate_table=None):
+    """
+    Yield a valuation result per (product, location) for valuation_legs() rows in application order,
+    with unit costs converted through rate_table (an fx.RateTable) if given
+    """
+    require_numpy()
+    value = fifo_valuation if method == 'fifo' else moving_average_valuation
+    # Stable sort: groups each product/location's legs and keeps them in application order
+    rows = sorted(rows, key=lambda row: (row[0], row[1]))
+    if not rows:
+        return
+
+    products, locations, kinds, quantities, costs, currencies, dates = zip(*rows)
+    products = numpy.array(products, dtype=numpy.int64)
+    locations = numpy.array(locations, dtype=numpy.int64)
+    kinds = numpy.array(kinds, dtype=numpy.int8)
+    quantities = numpy.rint(numpy.array(quantities, dtype=numpy.float64) * QUANTITY_SCALE).astype(numpy.int64)
+    costs = numpy.array(costs, dtype=numpy.float64)
+    if rate_table is not None:
+        costs *= rate_table.rates(
+            numpy.array(currencies, dtype=numpy.int64),
+            numpy.array([day.toordinal() for day in dates], dtype=numpy.int64)
+        )
+
+    starts = numpy.flatnonzero((products[1:] != products[:-1]) | (locations[1:] != locations[:-1])) + 1
+    bounds = zip(numpy.concatenate(([0], starts)).tolist(), numpy.concatenate((starts, [len(rows)])).tolist())
+    for start, end in bounds:
+        deltas = signed_deltas(kinds[start:end], quantities[start:end])
+        sold = kinds[start:end] != TRANSFER_OUT
+        yield valuation_result(int(products[start]), int(locations[start]), *value(deltas, costs[start:end], sold))
+
+
+def product_valuation(product_id, method='fifo', as_of=None):
+    """Valuation of one product per location, with totals"""
+    rate_table = get_rate_table()
+    lines = valuation_lines(product_ids=[product_id], as_of=as_of)
+    locations = list(value_rows(valuation_legs(lines), method, rate_table))
+    return {
+        'product': product_id,
+        'method': method,
+        'as_of': as_of,
+        'currency': rate_table.base_currency_id if rate_table else None,
+        'quantity': sum(location['quantity'] for location in locations),
+        'value': sum(location['value'] for location in locations),
+        'cogs': sum(location['cogs'] for location in locations),
+        'locations': locations,
+    }
+
+
+def valuation_report(product_ids, method='fifo', as_of=None, batch_size=VALUATION_BATCH_SIZE):
+    """
+    Yield valuation results for every product/location of product_ids, loading the lines of
+    batch_size products per query so memory is bounded by the batch, not the whole history
+    """
+    rate_table = get_rate_table()
+    for index in range(0, len(product_ids), batch_size):
+        lines = valuation_lines(product_ids=product_ids[index:index + batch_size], as_of=as_of)
+        yield from value_rows(valuation_legs(lines.iterator(chunk_size=LINE_CHUNK_SIZE)), method, rate_table)
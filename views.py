@@ -1,3 +1,4 @@
+import hashlib
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -10,16 +11,135 @@ from inventory.models import (
 from inventory.serializers import (
     ProductSerializer, WarehouseSerializer,
     StockLocationSerializer, StockMovementSerializer, StockMovementLineSerializer,
-    StockBalanceSerializer, LotTrackingSerializer
+    StockBalanceSerializer, LotTrackingSerializer, StockReservationSerializer,
+    StockReservationRequestSerializer, StockReservationActionSerializer, LotBalanceSerializer,
+    LotPickRequestSerializer, is_expanded
+)
+from inventory.processing import process_movements
+from inventory.jobs import async_processing_enabled, enqueue_movement
+from inventory.snapshots import stock_as_of
+from inventory.pagination import StockMovementCursorPagination, StockBalanceCursorPagination
+from inventory.importers import read_csv, read_ndjson, import_movements, DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE
+from inventory.exports import (
+    BALANCE_EXPORT_COLUMNS, MOVEMENT_EXPORT_COLUMNS, EXPORT_FORMATS, DEFAULT_EXPORT_CHUNK_SIZE, MAX_EXPORT_CHUNK_SIZE,
+    balance_export_rows, movement_export_rows, export_response
 )
 from rest_framework.permissions import IsAuthenticated
 from authentication.permissions import HasModulePermission
 from hr.models import Employee, Department, JobRole
 from rest_framework import serializers
-from django.db.models import Sum
+from django.db.models import Sum, Prefetch
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from inventory.cache import get_stock_version
+from inventory.valuation import VALUATION_METHODS, product_valuation
+from inventory import reservations
+from inventory.lots import pick_lots
+from inventory.instrumentation import InstrumentedViewSetMixin
+
+
+def stock_balance_queryset(request=None, prefix=''):
+    """
+    Balances with whatever StockBalanceSerializer nests for this request's ?expand= loaded up front;
+    locations come from the reference cache
+    """
+    queryset = StockBalance.objects.select_related('product', 'location')
+    if is_expanded(request, prefix + 'product'):
+        queryset = queryset.select_related('product__company').prefetch_related('product__stockbalance_set')
+    return queryset
+
+
+def get_as_of(request):
+    """Parse the optional as_of=YYYY-MM-DD query parameter for historical stock"""
+    value = request.query_params.get('as_of')
+    if not value:
+        return None
+    try:
+        return serializers.DateField().to_internal_value(value)
+    except serializers.ValidationError as exc:
+        raise serializers.ValidationError({'as_of': exc.detail})
+
+
+def historical_balances(balances, as_of):
+    """Stock of the given balances' product/location pairs at the end of as_of"""
+    history = stock_as_of(
+        as_of,
+        product_ids={balance.product_id for balance in balances},
+        location_ids={balance.location_id for balance in balances}
+    )
+    empty = {'quantity': 0, 'total_in': 0, 'total_out': 0}
+    return [
+        {
+            'id': balance.id,
+            'product': balance.product_id,
+            'location': balance.location_id,
+            'as_of': as_of,
+            **history.get((balance.product_id, balance.location_id), empty)
+        }
+        for balance in balances
+    ]
+
+
+def conditional_stock_response(request, build_response, product_ids=(), location_ids=(), all_balances=False):
+    """
+    Serve a stock view with ETag/Last-Modified validators taken from the stock version stamps, answering
+    304 Not Modified before build_response() runs any aggregate or serializer when the client is current
+    """
+    if is_expanded(request, 'product'):
+        # Expanded products embed their stock at every location
+        all_balances = True
+    token, modified = get_stock_version(product_ids, location_ids, all_balances)
+    fingerprint = f'{token}|{request.get_full_path()}|{request.accepted_renderer.format}'
+    etag = quote_etag(hashlib.md5(fingerprint.encode()).hexdigest())
+    last_modified = -(-modified // 10 ** 9)
 
-class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all()
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = build_response()
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def stream_export(request, columns, rows, filename):
+    """
+    Streaming export for ?export_format=csv|parquet (DRF reserves ?format=) read in ?chunk_size= row chunks
+    """
+    export_format = request.query_params.get('export_format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return Response(
+            {'detail': f"export_format must be one of: {', '.join(EXPORT_FORMATS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        chunk_size = int(request.query_params.get('chunk_size', DEFAULT_EXPORT_CHUNK_SIZE))
+    except ValueError:
+        chunk_size = 0
+    if not 0 < chunk_size <= MAX_EXPORT_CHUNK_SIZE:
+        return Response({'detail': f'chunk_size must be between 1 and {MAX_EXPORT_CHUNK_SIZE}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        return export_response(columns, rows, export_format, filename, chunk_size)
+    except ValueError as exc:
+        return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def stock_movement_line_queryset(request=None, prefix=''):
+    """Movement lines with whatever StockMovementLineSerializer nests for this request's ?expand= loaded up front"""
+    queryset = StockMovementLine.objects.all()
+    if is_expanded(request, prefix + 'product'):
+        queryset = queryset.select_related('product__company').prefetch_related('product__stockbalance_set')
+    if is_expanded(request, prefix + 'currency'):
+        queryset = queryset.select_related('currency')
+    if is_expanded(request, prefix + 'lot_tracking'):
+        queryset = queryset.select_related('lot_tracking__product__company').prefetch_related(
+            'lot_tracking__product__stockbalance_set'
+        )
+    return queryset
+
+
+class ProductViewSet(InstrumentedViewSetMixin, viewsets.ModelViewSet):
+    queryset = Product.objects.select_related('company').with_stock_totals()
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated, HasModulePermission]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -30,15 +150,53 @@ class ProductViewSet(viewsets.ModelViewSet):
     @action(detail=True)
     def stock_status(self, request, pk=None):
         product = self.get_object()
-        balances = StockBalance.objects.filter(product=product)
-        data = {
-            'total_quantity': balances.aggregate(total=Sum('initial_quantity'))['total'] or 0,
-            'total_reserved': balances.aggregate(total=Sum('reserved_quantity'))['total'] or 0,
-            'locations': StockBalanceSerializer(balances, many=True).data
-        }
-        return Response(data)
+        as_of = get_as_of(request)
 
-class WarehouseViewSet(viewsets.ModelViewSet):
+        def build_response():
+            balances = stock_balance_queryset(request).filter(product=product)
+            if as_of is not None:
+                locations = historical_balances(list(balances), as_of)
+                return Response({
+                    'as_of': as_of,
+                    'total_quantity': sum(location['quantity'] for location in locations),
+                    'locations': locations
+                })
+
+            totals = balances.aggregate(total_quantity=Sum('initial_quantity'), total_reserved=Sum('reserved_quantity'))
+            data = {
+                'total_quantity': totals['total_quantity'] or 0,
+                'total_reserved': totals['total_reserved'] or 0,
+                'locations': StockBalanceSerializer(balances, many=True, context=self.get_serializer_context()).data
+            }
+            return Response(data)
+
+        return conditional_stock_response(request, build_response, product_ids=[product.pk])
+
+    @action(detail=False)
+    def below_min(self, request):
+        """Products whose total stock is under min_stock, read from the StockAlert index"""
+        queryset = self.filter_queryset(self.get_queryset()).filter(stock_alerts__kind='below_min')
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(queryset, many=True).data)
+
+    @action(detail=True)
+    def valuation(self, request, pk=None):
+        """Inventory value per location by ?method=fifo|average, optionally ?as_of= a date"""
+        product = self.get_object()
+        method = request.query_params.get('method', 'fifo')
+        if method not in VALUATION_METHODS:
+            return Response(
+                {'detail': f"method must be one of: {', '.join(VALUATION_METHODS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            return Response(product_valuation(product.pk, method, get_as_of(request)))
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+class WarehouseViewSet(InstrumentedViewSetMixin, viewsets.ModelViewSet):
     queryset = Warehouse.objects.all()
     serializer_class = WarehouseSerializer
     permission_classes = [IsAuthenticated, HasModulePermission]
@@ -46,7 +204,7 @@ class WarehouseViewSet(viewsets.ModelViewSet):
     search_fields = ['name']
     ordering_fields = ['name']
 
-class StockLocationViewSet(viewsets.ModelViewSet):
+class StockLocationViewSet(InstrumentedViewSetMixin, viewsets.ModelViewSet):
     queryset = StockLocation.objects.all()
     serializer_class = StockLocationSerializer
     permission_classes = [IsAuthenticated, HasModulePermission]
@@ -58,81 +216,69 @@ class StockLocationViewSet(viewsets.ModelViewSet):
     @action(detail=True)
     def stock_balance(self, request, pk=None):
         location = self.get_object()
-        balances = StockBalance.objects.filter(location=location)
-        serializer = StockBalanceSerializer(balances, many=True)
-        return Response(serializer.data)
 
-class StockMovementViewSet(viewsets.ModelViewSet):
+        def build_response():
+            balances = stock_balance_queryset(request).filter(location=location)
+            serializer = StockBalanceSerializer(balances, many=True, context=self.get_serializer_context())
+            return Response(serializer.data)
+
+        return conditional_stock_response(request, build_response, location_ids=[location.pk])
+
+class StockMovementViewSet(InstrumentedViewSetMixin, viewsets.ModelViewSet):
     queryset = StockMovement.objects.all()
     serializer_class = StockMovementSerializer
     permission_classes = [IsAuthenticated, HasModulePermission]
+    pagination_class = StockMovementCursorPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['movement_type', 'destination_location__warehouse']
+    filterset_fields = ['movement_type', 'processing_status', 'source_location', 'destination_location__warehouse']
     search_fields = ['reference', 'notes']
     ordering_fields = ['date', 'reference']
 
-    def perform_create(self, serializer):
+    def get_queryset(self):
+        lines = stock_movement_line_queryset(self.request, 'lines.')
+        queryset = StockMovement.objects.prefetch_related(Prefetch('lines', queryset=lines))
+        if is_expanded(self.request, 'performed_by'):
+            queryset = queryset.select_related('performed_by')
+        return queryset
+
+    def get_performing_employee(self):
         # Find the employee by username or create a default one
         try:
-            employee = Employee.objects.get(employee_code__iexact=self.request.user.username)
+            return Employee.objects.get(employee_code__iexact=self.request.user.username)
         except Employee.DoesNotExist:
             # For now, just use the first available employee or create a system employee
             employee = Employee.objects.first()
             if not employee:
                 raise serializers.ValidationError("No employee records found. Please create at least one employee record first.")
-        
-        movement = serializer.save(performed_by=employee)
+            return employee
+
+    def perform_create(self, serializer):
+        movement = serializer.save(performed_by=self.get_performing_employee())
         
         # Automatically process the movement to update stock balances
-        self.process_movement_automatically(movement)
+        self.schedule_processing(movement)
 
     def perform_update(self, serializer):
-        # Find the employee by username or create a default one
-        try:
-            employee = Employee.objects.get(employee_code__iexact=self.request.user.username)
-        except Employee.DoesNotExist:
-            # For now, just use the first available employee or create a system employee
-            employee = Employee.objects.first()
-            if not employee:
-                raise serializers.ValidationError("No employee records found. Please create at least one employee record first.")
-        
-        movement = serializer.save(performed_by=employee)
+        movement = serializer.save(performed_by=self.get_performing_employee())
         
         # Automatically process the movement to update stock balances
-        self.process_movement_automatically(movement)
+        self.schedule_processing(movement)
+
+    def schedule_processing(self, movement):
+        """
+        Queue the movement for the process_stock_movements worker when INVENTORY_ASYNC_PROCESSING
+        is on, otherwise process it within the request
+        """
+        if async_processing_enabled():
+            enqueue_movement(movement)
+        else:
+            self.process_movement_automatically(movement)
 
     def process_movement_automatically(self, movement):
         """
         Automatically process movement to update stock balances
         """
-        with transaction.atomic():
-            for line in movement.lines.all():
-                # Get or create stock balance for this product and location
-                stock_balance, created = StockBalance.objects.get_or_create(
-                    product=line.product,
-                    location=movement.destination_location,
-                    defaults={'initial_quantity': 0, 'reserved_quantity': 0}
-                )
-                
-                # Store original reserved quantity for replenishment logic
-                original_reserved_quantity = stock_balance.reserved_quantity
-                
-                # Update stock balance based on movement type
-                if movement.movement_type == 'in':
-                    # For inbound movements, add stock following the priority logic
-                    stock_balance.add_stock(line.quantity, original_reserved_quantity)
-                elif movement.movement_type == 'out':
-                    # For outbound movements, consume stock following the priority logic
-                    remaining = stock_balance.consume_stock(line.quantity)
-                    if remaining > 0:
-                        # If we couldn't fulfill the entire order, log it or handle it
-                        print(f"Warning: Could not fulfill {remaining} units for {line.product.code}")
-                elif movement.movement_type == 'adjustment':
-                    # For adjustments, set the initial_quantity directly
-                    stock_balance.initial_quantity = line.quantity
-                    stock_balance.save()
-                # Note: Transfer movements don't change the base quantity
-                # They are calculated in the available_stock property
+        process_movements([movement])
 
     @action(detail=True, methods=['post'])
     def process_movement(self, request, pk=None):
@@ -141,7 +287,44 @@ class StockMovementViewSet(viewsets.ModelViewSet):
             self.process_movement_automatically(movement)
             return Response({'status': 'Movement processed successfully'})
 
-class LotTrackingViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Import movements streamed as NDJSON (one movement with its lines per line) or CSV
+        (one line per row, consecutive rows sharing a reference form one movement).
+        Rows are validated and inserted in chunks; invalid rows are reported without aborting the file.
+        """
+        readers = {
+            'application/x-ndjson': read_ndjson,
+            'application/ndjson': read_ndjson,
+            'text/csv': read_csv,
+        }
+        reader = readers.get(request.content_type.split(';')[0].strip())
+        if reader is None:
+            return Response(
+                {'detail': f"Unsupported content type. Use one of: {', '.join(readers)}"},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+        if request.stream is None:
+            return Response({'detail': 'Request body is empty'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            chunk_size = int(request.query_params.get('chunk_size', DEFAULT_CHUNK_SIZE))
+        except ValueError:
+            chunk_size = 0
+        if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+            return Response({'detail': f'chunk_size must be between 1 and {MAX_CHUNK_SIZE}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        summary = import_movements(reader(request.stream), self.get_performing_employee(), chunk_size)
+        return Response(summary)
+
+    @action(detail=False)
+    def export(self, request):
+        """Stream every line of the filtered movements, one row per line"""
+        rows = movement_export_rows(self.filter_queryset(self.get_queryset()))
+        return stream_export(request, MOVEMENT_EXPORT_COLUMNS, rows, 'stock_movements')
+
+class LotTrackingViewSet(InstrumentedViewSetMixin, viewsets.ModelViewSet):
     queryset = LotTracking.objects.all()
     serializer_class = LotTrackingSerializer
     permission_classes = [IsAuthenticated, HasModulePermission]
@@ -150,20 +333,107 @@ class LotTrackingViewSet(viewsets.ModelViewSet):
     search_fields = ['lot_number']
     ordering_fields = ['expiry_date', 'manufacturer_date']
 
+    def get_queryset(self):
+        queryset = LotTracking.objects.all()
+        if is_expanded(self.request, 'product'):
+            queryset = queryset.select_related('product__company').prefetch_related('product__stockbalance_set')
+        return queryset
+
     @action(detail=True)
     def movements(self, request, pk=None):
         lot = self.get_object()
-        movements = StockMovementLine.objects.filter(
+        movements = stock_movement_line_queryset(request).filter(
             lot_tracking=lot
         )
-        serializer = StockMovementLineSerializer(movements, many=True)
+        serializer = StockMovementLineSerializer(movements, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
 
-class StockBalanceViewSet(viewsets.ModelViewSet):
-    queryset = StockBalance.objects.all()
+    @action(detail=True)
+    def balances(self, request, pk=None):
+        """Where this lot is and how much of it, from the maintained lot balances"""
+        lot = self.get_object()
+        balances = lot.balances.filter(quantity__gt=0).order_by('location_id')
+        serializer = LotBalanceSerializer(balances, many=True, context=self.get_serializer_context())
+        return Response(serializer.data)
+
+    @action(detail=False)
+    def pick(self, request):
+        """FIFO allocation of ?quantity= of ?product= across lots, optionally at one ?location="""
+        serializer = LotPickRequestSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        picks, shortfall = pick_lots(data['product'], data['quantity'], data.get('location'))
+        return Response({
+            'product': data['product'],
+            'quantity': data['quantity'],
+            'shortfall': shortfall,
+            'picks': picks,
+        })
+
+class StockBalanceViewSet(InstrumentedViewSetMixin, viewsets.ModelViewSet):
+    queryset = stock_balance_queryset()
     serializer_class = StockBalanceSerializer
     permission_classes = [IsAuthenticated, HasModulePermission]
+    pagination_class = StockBalanceCursorPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['product', 'location', 'location__warehouse']
     search_fields = ['product__code', 'product__name', 'location__name']
     ordering_fields = ['product__code', 'location__name', 'initial_quantity']
+
+    def get_queryset(self):
+        return stock_balance_queryset(self.request)
+
+    def list(self, request, *args, **kwargs):
+        as_of = get_as_of(request)
+
+        def build_response():
+            if as_of is None:
+                return super(StockBalanceViewSet, self).list(request, *args, **kwargs)
+
+            queryset = self.filter_queryset(self.get_queryset())
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                return self.get_paginated_response(historical_balances(page, as_of))
+            return Response(historical_balances(list(queryset), as_of))
+
+        return conditional_stock_response(request, build_response, all_balances=True)
+
+    @action(detail=False)
+    def export(self, request):
+        """Stream the filtered balances"""
+        rows = balance_export_rows(self.filter_queryset(self.get_queryset()))
+        return stream_export(request, BALANCE_EXPORT_COLUMNS, rows, 'stock_balances')
+
+    @action(detail=True, methods=['post'])
+    def reserve(self, request, pk=None):
+        """Hold quantity of this balance's available stock; 409 if not enough is available"""
+        balance = self.get_object()
+        serializer = StockReservationRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            reservation = reservations.reserve(balance, **serializer.validated_data)
+        except reservations.InsufficientStockError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_409_CONFLICT)
+        return Response(StockReservationSerializer(reservation).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'])
+    def release(self, request, pk=None):
+        return self.settle_reservation(request, reservations.release)
+
+    @action(detail=True, methods=['post'])
+    def commit(self, request, pk=None):
+        return self.settle_reservation(request, reservations.commit)
+
+    def settle_reservation(self, request, settle):
+        balance = self.get_object()
+        serializer = StockReservationActionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        reservation = balance.reservations.filter(pk=serializer.validated_data['reservation']).first()
+        if reservation is None:
+            return Response({'detail': 'Reservation not found for this balance'}, status=status.HTTP_404_NOT_FOUND)
+        reservation.balance = balance
+        try:
+            settle(reservation)
+        except (reservations.ReservationStateError, reservations.InsufficientStockError) as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_409_CONFLICT)
+        return Response(StockReservationSerializer(reservation).data)